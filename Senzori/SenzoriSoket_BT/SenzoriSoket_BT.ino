@@ -11,6 +11,13 @@
 #define TX_PIN       17  // TX ESP32 -> RX MH-Z19B
 #define BME680_CS    5
 
+// --- FORMAT TRANSMISIE ---
+// 0 = text (ca până acum), 1 = cadre binare de 42 octeți pe Bluetooth (format în protocol.py)
+#define BINARY_FRAMES       0
+// Perioada de eșantionare; în modul binar poate coborî mult sub 2000 ms
+// (MH-Z19B răspunde cel mult o dată pe secundă, între timp se retrimite ultima valoare)
+#define SAMPLE_INTERVAL_MS  2000
+
 // --- INSTANȚIERI SENZORI ---
 Adafruit_SGP30 sgp;
 Adafruit_BME680 bme(BME680_CS);
@@ -53,6 +60,47 @@ int readCO2Once(int timeoutMs=200){
   return -1;
 }
 
+// --- CADRE BINARE ---
+// magic A5 5A | version | flags | seq u32 | millis u32 | eCO2 u16 | TVOC u16 |
+// temp f32 | hum f32 | press f32 | gas f32 | MQ-3 u16 | MQ-136 u16 | CO2 raw u16 | CO2 avg u16 | CRC16
+const uint8_t FRAME_VERSION = 1;
+const int FRAME_SIZE = 42;
+const uint8_t FLAG_SGP30 = 0x01, FLAG_BME688 = 0x02, FLAG_CO2 = 0x04;
+uint32_t frameSeq = 0;
+
+// CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF), identic cu binascii.crc_hqx(data, 0xFFFF)
+uint16_t crc16(const uint8_t *data, int len){
+  uint16_t crc = 0xFFFF;
+  for(int i=0;i<len;i++){
+    crc ^= (uint16_t)data[i] << 8;
+    for(int b=0;b<8;b++) crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : (crc << 1);
+  }
+  return crc;
+}
+
+// ESP32 e little-endian: memcpy scrie direct ordinea din protocol
+void put16(uint8_t *buf, int off, uint16_t v){ memcpy(buf + off, &v, 2); }
+void put32(uint8_t *buf, int off, uint32_t v){ memcpy(buf + off, &v, 4); }
+void putF(uint8_t *buf, int off, float v){ memcpy(buf + off, &v, 4); }
+
+void sendBinaryFrame(uint8_t flags, uint16_t eco2, uint16_t tvoc,
+                     float temp, float hum, float press, float gas,
+                     uint16_t mq3, uint16_t mq136, uint16_t co2Raw, uint16_t co2Avg){
+  uint8_t buf[FRAME_SIZE];
+  buf[0] = 0xA5; buf[1] = 0x5A;
+  buf[2] = FRAME_VERSION;
+  buf[3] = flags;
+  put32(buf, 4, frameSeq++);
+  put32(buf, 8, millis());
+  put16(buf, 12, eco2);  put16(buf, 14, tvoc);
+  putF(buf, 16, temp);   putF(buf, 20, hum);
+  putF(buf, 24, press);  putF(buf, 28, gas);
+  put16(buf, 32, mq3);   put16(buf, 34, mq136);
+  put16(buf, 36, co2Raw); put16(buf, 38, co2Avg);
+  put16(buf, 40, crc16(buf + 2, FRAME_SIZE - 4));
+  SerialBT.write(buf, FRAME_SIZE);
+}
+
 void setup() {
   Serial.begin(115200);
   SerialBT.begin("ESP32_Senzori"); // Nume dispozitiv Bluetooth
@@ -93,6 +141,49 @@ void setup() {
 }
 
 void loop() {
+  unsigned long loopStart = millis();
+
+#if BINARY_FRAMES
+  // --- Mod binar: fără String-uri, un singur write de 42 octeți ---
+  static int lastPpm = -1, lastAvg = 0;
+  static unsigned long lastCo2Read = 0;
+  uint8_t flags = 0;
+  uint16_t eco2 = 0, tvoc = 0;
+  float temp = 0, hum = 0, press = 0, gas = 0;
+
+  if (sgp.IAQmeasure()) {
+    flags |= FLAG_SGP30;
+    eco2 = sgp.eCO2;
+    tvoc = sgp.TVOC;
+  }
+  if (bme.performReading()) {
+    flags |= FLAG_BME688;
+    temp = bme.temperature;
+    hum = bme.humidity;
+    press = bme.pressure / 100.0;
+    gas = bme.gas_resistance / 1000.0;
+  }
+  uint16_t mq3 = analogRead(MQ3_PIN);
+  uint16_t mq136 = analogRead(MQ136_PIN);
+
+  if (lastPpm < 0 || millis() - lastCo2Read >= 1000) {
+    lastCo2Read = millis();
+    int ppm = readCO2Once(200);
+    if (ppm >= 0){
+      readings[readIndex] = ppm;
+      readIndex = (readIndex + 1) % AVG_SIZE;
+      if (readCount < AVG_SIZE) readCount++;
+      long sum = 0;
+      for(int i=0;i<readCount;i++) sum += readings[i];
+      lastAvg = sum / readCount;
+    }
+    lastPpm = ppm;
+  }
+  if (lastPpm >= 0) flags |= FLAG_CO2;
+
+  sendBinaryFrame(flags, eco2, tvoc, temp, hum, press, gas, mq3, mq136,
+                  lastPpm >= 0 ? lastPpm : 0, lastAvg);
+#else
   String data = ""; // Vom construi aici mesajul pentru BT
 
   // --- SGP30 ---
@@ -134,6 +225,9 @@ void loop() {
 
   Serial.println("----------------------------\n");
   SerialBT.println("----------------------------\n");
+#endif
 
-  delay(2000);
+  // Perioadă fixă: timpul de citire al senzorilor e scăzut din pauză
+  unsigned long elapsed = millis() - loopStart;
+  if (elapsed < SAMPLE_INTERVAL_MS) delay(SAMPLE_INTERVAL_MS - elapsed);
 }
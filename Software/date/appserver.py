@@ -1,208 +1,355 @@
 import os
-import json
+import math
 import time
+import atexit
 import threading
-from queue import Queue
-from datetime import datetime
-from collections import deque
-from flask import Flask, Response, render_template, jsonify, request
+from datetime import datetime, timezone
+from flask import Flask, Response, render_template, jsonify, request, g
 from flask_cors import CORS
-import serial
-import serial.tools.list_ports
 import numpy as np
-import tensorflow as tf
-import joblib
+from inference import BatchInferenceEngine
+from broadcast import BroadcastHub, DeltaEncoder, gzip_stream, sse_frame
+from ingest import IngestManager, PortCache, list_all_ports, parse_port_list
+from protocol import parse_calibration
+from timeseries import TimeSeriesStore, pick_resolution
+from model_registry import BackendPool
+import model_bundles
+import dsp
+from prediction_cache import PredictionCache
+from streaming_inference import StreamingInference, normalize_profile
+import shared_state
+import features
+import sampling_profiler
+from logs import setup_logging, get_logger
+from metrics import REGISTRY, REQUEST_SECONDS, stage
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# LOG_LEVEL=DEBUG afișează și fiecare linie primită de la ESP32 (limitat de LOG_RATE_BURST/LOG_RATE_PERIOD_S)
+setup_logging()
+log = get_logger("server")
+
+_FEATURES = stage("features")
+
+# ------------------ Process Role ------------------
+# python appserver.py = un singur proces. serve.py pornește un proces de ingest (porturile seriale,
+# istoricul, predicțiile continue) și mai mulți workeri HTTP care citesc starea din memoria partajată.
+SHARED = shared_state.current()
+ROLE = SHARED.role if SHARED is not None else "single"
 
 # ------------------ Flask ------------------
 app = Flask(__name__)
 CORS(app)
 
 # ------------------ AI Model ------------------
-model = tf.keras.models.load_model('airnalyzer_best_model.keras')
-scaler = joblib.load('scaler.save')
-classes = ['Normal', 'Diabetes', 'Lung Infection', 'Asthma', 'Liver Dysfunction', 'COPD', 'Unclear']
+# Fiecare model e un bundle (model_bundles.py): manifestul are artefactul, scaler-ul, ordinea
+# features și etichetele claselor, în ordinea ieșirilor modelului. MODEL_BACKEND alege bundle-ul
+# implicit (keras, numpy, tflite-int8, ...); o cerere /predict poate alege altul cu
+# "backend" în corp sau ?backend=. Bundle-ul xgboost apare doar după `model_bundles.py xgboost`,
+# care refuză modelul dacă nu bate clasa majoritară pe un set etichetat. Un bundle ensemble se scrie cu bench_models.py --ensemble,
+# cu ponderi din câștigul de F1 macro al membrilor față de clasa majoritară, pe split-ul de test.
+MODEL_BUNDLE_DIR = os.environ.get("MODEL_BUNDLE_DIR", BASE_DIR)
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "keras").strip().lower()
+MODEL_BACKEND = model_bundles.ALIASES.get(MODEL_BACKEND, MODEL_BACKEND)
+bundle_paths = model_bundles.discover(MODEL_BUNDLE_DIR)
+
+def bundle_loader(name):
+    def load():
+        if name not in bundle_paths:
+            raise FileNotFoundError(f"No bundle named {name} in {MODEL_BUNDLE_DIR} (available: {sorted(bundle_paths)})")
+        return model_bundles.load_bundle(bundle_paths[name])
+    return load
+
+# ------------------ Config Inference ------------------
+INFER_MAX_BATCH = int(os.environ.get("INFER_MAX_BATCH", "64"))
+INFER_WINDOW_MS = float(os.environ.get("INFER_WINDOW_MS", "5"))
+PREDICT_BATCH_MAX = int(os.environ.get("PREDICT_BATCH_MAX", "20000"))
+
+# Câte un registry + motor de micro-batching per backend, încărcat la prima cerere care îl folosește
+model_pool = BackendPool(
+    {name: bundle_loader(name) for name in set(bundle_paths) | {MODEL_BACKEND}},
+    lambda predict_fn: BatchInferenceEngine(predict_fn, max_batch=INFER_MAX_BATCH, window_ms=INFER_WINDOW_MS),
+)
+model_registry, inference_engine = model_pool.get(MODEL_BACKEND)
+
+def resolve_backend(name=None):
+    """(nume, registry, engine) pentru backend-ul cerut sau cel implicit; KeyError dacă nu există."""
+    name = str(name).strip().lower() if name else MODEL_BACKEND
+    name = model_bundles.ALIASES.get(name, name)
+    registry, engine = model_pool.get(name)
+    return name, registry, engine
+
+def unknown_backend_response(name):
+    return jsonify({"error": f"Unknown backend {name}", "backends": model_pool.names()}), 400
+
+# Cache pentru /predict: același cadru de senzori + aceleași date ale pacientului -> același rezultat
+PREDICT_CACHE_SIZE = int(os.environ.get("PREDICT_CACHE_SIZE", "1024"))  # 0 = dezactivat
+PREDICT_CACHE_TTL_S = float(os.environ.get("PREDICT_CACHE_TTL_S", "30"))
+prediction_cache = PredictionCache(PREDICT_CACHE_SIZE, PREDICT_CACHE_TTL_S) if PREDICT_CACHE_SIZE > 0 else None
 
 # ------------------ Config Serial ------------------
 BAUD_RATE = int(os.environ.get("BT_BAUD", "115200"))
 COM_PORT_ENV = os.environ.get("BT_COM_PORT", "").strip()
-AUTO_DETECT_HINTS = ["Bluetooth", "Standard Serial over Bluetooth", "SPP", "RFCOMM", "BT"]
+# BT_COM_PORTS="COM5,COM7" sau "ward1=COM5,ward2=COM7": câte un cititor pentru fiecare analizor
+COM_PORTS_ENV = os.environ.get("BT_COM_PORTS", "").strip() or COM_PORT_ENV
+BT_MAX_DEVICES = int(os.environ.get("BT_MAX_DEVICES", "1"))
+BT_RESCAN_S = float(os.environ.get("BT_RESCAN_S", "1"))
+BT_FULL_RESCAN_S = float(os.environ.get("BT_FULL_RESCAN_S", "30"))
+BT_IDLE_TIMEOUT_S = float(os.environ.get("BT_IDLE_TIMEOUT_S", "10"))
+BT_PORT_CACHE = os.environ.get("BT_PORT_CACHE", os.path.join(BASE_DIR, "last_port.json"))
+# BT_FRAMING=auto|text|binary: formatul trimis de firmware (auto = detectat la conectare)
+BT_FRAMING = os.environ.get("BT_FRAMING", "auto").strip().lower()
+# SENSOR_CALIBRATION='{"Acetone": [scale, offset], "H2S": [...]}': conversie ADC -> ppm pentru canalele MQ
+SENSOR_CALIBRATION = parse_calibration(os.environ.get("SENSOR_CALIBRATION", "").strip())
+# DSP_MODE=off|filtered|plateau: ce primește modelul (valori brute, filtrate, sau media platoului de expir)
+DSP_MODE = os.environ.get("DSP_MODE", "plateau").strip().lower()
+# DSP_CONFIG='{"window": 9, "breath": {"start_delta": 300}, "channels": {"CO2": {"window": 5}}}' peste dsp.DEFAULTS
+DSP_CONFIG = dsp.parse_dsp_config(os.environ.get("DSP_CONFIG", "").strip())
+if DSP_MODE not in dsp.MODES:
+    raise ValueError(f"DSP_MODE must be one of {dsp.MODES}")
 
 # ------------------ SSE & State ------------------
-subscribers = set()
-sub_lock = threading.Lock()
-latest_snapshot = {}
-latest_raw_lines = deque(maxlen=300)
-
-# ------------------ Sensor Data ------------------
-sensor_data = {
-    'Temperature': 0.0,
-    'Humidity': 0.0,
-    'Acetone': 0.0,
-    'Ammonia': 0.0,
-    'CO': 0.0,
-    'CO2': 0.0,
-    'H2S': 0.0
-}
-last_sensor_update = 0
-serial_lock = threading.Lock()
-
-# ------------------ SSE Helper ------------------
-def publish(message: dict):
-    """Trimite mesajul către toți abonații SSE."""
-    with sub_lock:
-        dead = []
-        for q in subscribers:
-            try:
-                q.put_nowait(message)
-            except Exception:
-                dead.append(q)
-        for q in dead:
-            subscribers.discard(q)
-
-def add_raw_line(line: str):
-    latest_raw_lines.append(line)
-
-# ------------------ Parsing Line ------------------
-def parse_metric_line(line: str):
-    """Încearcă să parseze JSON, altfel trimite raw line."""
-    try:
-        data = json.loads(line)
-        with serial_lock:
-            for k in sensor_data:
-                if k in data:
-                    sensor_data[k] = float(data[k])
-        return data
-    except json.JSONDecodeError:
-        return {"raw_line": line}
-
-# ------------------ Serial Port Detection ------------------
-def list_all_ports():
-    return list(serial.tools.list_ports.comports())
-
-def try_peek_data(port_name: str, peek_seconds: float = 3.5) -> bool:
-    try:
-        with serial.Serial(port=port_name, baudrate=BAUD_RATE, timeout=1) as ser:
-            start = time.time()
-            while time.time() - start < peek_seconds:
-                raw = ser.readline()
-                if raw:
-                    return True
-    except Exception:
-        return False
-    return False
-
-def find_esp_port_loop() -> str:
-    """Caută ESP32 automat și loghează fiecare încercare."""
-    while True:
-        if COM_PORT_ENV:
-            print(f"[Detect] Trying forced port {COM_PORT_ENV} ...")
-            if try_peek_data(COM_PORT_ENV):
-                print(f"[Detect] OK on {COM_PORT_ENV}")
-                return COM_PORT_ENV
-            print(f"[Detect] No data on {COM_PORT_ENV}. Retrying in 3s.")
-            time.sleep(3)
-            continue
-
-        ports = list_all_ports()
-        if not ports:
-            print("[Detect] No serial ports found. Retrying in 3s...")
-            time.sleep(3)
-            continue
-
-        bt_ports = []
-        other_ports = []
-        for p in ports:
-            desc = f"{p.description or ''} {p.hwid or ''} {p.name or ''}"
-            if any(h.lower() in desc.lower() for h in AUTO_DETECT_HINTS):
-                bt_ports.append(p.device)
-            else:
-                other_ports.append(p.device)
-
-        candidates = bt_ports + other_ports
-        print("[Detect] Candidates:", candidates or "[]")
-
-        for dev in candidates:
-            print(f"[Detect] Probing {dev} ...")
-            if try_peek_data(dev):
-                print(f"[Detect] Found data on {dev}")
-                return dev
-
-        print("[Detect] No data detected on any port. Retrying in 3s...")
-        time.sleep(3)
-
-# ------------------ Serial Reader ------------------
-def serial_reader_forever():
-    global latest_snapshot
-    while True:
-        port = find_esp_port_loop()
-        print(f"[Serial] Connecting to {port} @ {BAUD_RATE}")
-        try:
-            with serial.Serial(port=port, baudrate=BAUD_RATE, timeout=1) as ser:
-                print(f"[Serial] Connected to {port}. Reading data...")
-                while True:
-                    raw = ser.readline()
-                    if not raw:
-                        continue
-                    try:
-                        line = raw.decode("utf-8", errors="ignore").strip()
-                    except Exception:
-                        line = str(raw).strip()
-                    if not line:
-                        continue
-                    print(f"[ESP32] {line}")  # afișăm tot ce vine
-
-                    add_raw_line(line)
-                    parsed = parse_metric_line(line)
-                    if parsed:
-                        latest_snapshot.update(parsed)
-
-                    publish({
-                        "ts": datetime.utcnow().isoformat() + "Z",
-                        "line": line,
-                        "parsed": parsed,
-                        "snapshot": latest_snapshot,
-                    })
-        except serial.SerialException as e:
-            print(f"[Serial] Lost connection on {port}: {e}. Reconnecting...")
-            time.sleep(1)
-        except Exception as e:
-            print(f"[Serial] Unexpected error on {port}: {e}. Reconnecting...")
-            time.sleep(1)
+SSE_BUFFER_SIZE = int(os.environ.get("SSE_BUFFER_SIZE", "1024"))
+SSE_LAG_POLICY = os.environ.get("SSE_LAG_POLICY", "skip").strip().lower()  # skip | disconnect
+SSE_HEARTBEAT_S = float(os.environ.get("SSE_HEARTBEAT_S", "15"))
+# Modul delta (/stream?mode=delta): un eveniment per tick cu câmpurile schimbate + keyframe periodic
+SSE_TICK_S = float(os.environ.get("SSE_TICK_MS", "100")) / 1000.0
+SSE_KEYFRAME_S = float(os.environ.get("SSE_KEYFRAME_S", "10"))
+# SSE_COMPRESS=0 dezactivează gzip pe /stream chiar dacă clientul îl acceptă
+SSE_COMPRESS = os.environ.get("SSE_COMPRESS", "1").strip().lower() not in ("0", "false", "no", "off")
+# /api/latest?wait_for_version=N: cât ține maxim un long-poll (clientul poate cere mai puțin cu ?timeout=)
+LONG_POLL_MAX_S = float(os.environ.get("LONG_POLL_MAX_S", "30"))
+
+# ------------------ History ------------------
+# HISTORY_DIR=off dezactivează istoricul pe disc
+HISTORY_DIR = os.environ.get("HISTORY_DIR", os.path.join(BASE_DIR, "history")).strip()
+HISTORY_SEGMENT_ROWS = int(os.environ.get("HISTORY_SEGMENT_ROWS", "65536"))
+HISTORY_MAX_POINTS = int(os.environ.get("HISTORY_MAX_POINTS", "2000"))
+
+history_store = (TimeSeriesStore(HISTORY_DIR, features.SENSOR_KEYS, segment_rows=HISTORY_SEGMENT_ROWS,
+                                 reader=ROLE == "worker")
+                 if HISTORY_DIR.lower() not in ("", "off", "0") else None)
+
+def make_hub():
+    return BroadcastHub(capacity=SSE_BUFFER_SIZE, lag_policy=SSE_LAG_POLICY, heartbeat_s=SSE_HEARTBEAT_S)
+
+ingest_options = dict(
+    ports=parse_port_list(COM_PORTS_ENV),
+    max_devices=BT_MAX_DEVICES,
+    rescan_seconds=BT_RESCAN_S,
+    full_rescan_seconds=BT_FULL_RESCAN_S,
+    idle_timeout=BT_IDLE_TIMEOUT_S,
+    port_cache=PortCache(BT_PORT_CACHE),
+    calibration=SENSOR_CALIBRATION,
+    store=history_store,
+    framing=BT_FRAMING,
+    dsp_factory=None if DSP_MODE == "off" else (lambda: dsp.SignalProcessor(DSP_CONFIG, DSP_MODE)),
+)
+if ROLE == "worker":
+    ingest_manager = shared_state.SharedIngestView(SHARED.state, make_hub)
+elif ROLE == "ingest":
+    ingest_manager = shared_state.SharedMemoryIngest(SHARED.state, BAUD_RATE, make_hub, **ingest_options)
+else:
+    ingest_manager = IngestManager(BAUD_RATE, make_hub, **ingest_options)
+
+# ------------------ Streaming Inference ------------------
+# O predicție per cadru nou pentru profilul pacientului din sesiunea dispozitivului,
+# publicată ca eveniment SSE `prediction` (N dashboard-uri = o singură inferență)
+STREAM_INFER_INTERVAL_S = float(os.environ.get("STREAM_INFER_INTERVAL_S", "1"))
+STREAM_INFER_DEBOUNCE_S = float(os.environ.get("STREAM_INFER_DEBOUNCE_S", "0.2"))
+STREAM_INFER_REL_TOL = float(os.environ.get("STREAM_INFER_REL_TOL", "0.01"))
+
+def stream_score(input_array):
+    model_registry.start()
+    model_registry.wait_ready(30)
+    return inference_engine.submit(input_array)
+
+def publish_prediction(dev, result):
+    probs = result["probabilities"]
+    classes = model_registry.model.classes
+    pred_class = int(np.argmax(probs))
+    message = {
+        "ts": datetime.utcnow().isoformat() + "Z",
+        "diagnosis": classes[pred_class],
+        "confidence": float(probs[pred_class]),
+        "probabilities": {c: float(p) for c, p in zip(classes, probs)},
+        "version": result["version"],
+        "patient": result["profile"],
+        "backend": MODEL_BACKEND,
+    }
+    ingest_manager.publish(dev, message, event="prediction")
+    if prediction_cache is not None:
+        # Un /predict cu același profil pe același cadru e servit din cache
+        prediction_cache.put(dev.device_id, result["version"],
+                             (MODEL_BACKEND,) + features.patient_key(result["profile"]),
+                             {"diagnosis": message["diagnosis"], "confidence": message["confidence"],
+                              "device_id": dev.device_id, "backend": MODEL_BACKEND})
+
+if ROLE == "worker":
+    # Profilurile ajung la procesul de ingest, care rulează predicțiile continue
+    streaming_inference = shared_state.SessionProxy(SHARED.queue, normalize_profile, ingest_manager)
+else:
+    streaming_inference = StreamingInference(
+        stream_score, publish_prediction,
+        min_interval_s=STREAM_INFER_INTERVAL_S,
+        debounce_s=STREAM_INFER_DEBOUNCE_S,
+        rel_tolerance=STREAM_INFER_REL_TOL,
+    )
+ingest_manager.add_frame_listener(streaming_inference.on_frame)
 
 # ------------------ Flask Routes ------------------
 @app.route("/")
 def index():
     return render_template("index.html")
 
+_delta_encoders = {}
+_delta_lock = threading.Lock()
+
+def delta_encoder(hub, seed: dict) -> DeltaEncoder:
+    """Encoder-ul delta al unui hub, creat la primul client în modul delta (seed = snapshot-urile curente)."""
+    with _delta_lock:
+        enc = _delta_encoders.get(hub)
+        if enc is None:
+            enc = _delta_encoders[hub] = DeltaEncoder(hub, make_hub, SSE_TICK_S, SSE_KEYFRAME_S, seed)
+        return enc
+
+def flag_arg(name: str, default: bool = False) -> bool:
+    value = request.args.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() not in ("0", "false", "no", "off", "")
+
+def sse_response(hub, snapshot: dict, seed: dict):
+    """?mode=delta: evenimente keyframe/delta comasate (+ ?raw=1 pentru liniile brute); altfel un mesaj per cadru.
+    Răspunsul e comprimat gzip când clientul trimite Accept-Encoding: gzip (?compress=0 dezactivează)."""
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if request.args.get("mode", "full") == "delta":
+        hub, cursor, first = delta_encoder(hub, seed).connect(raw=flag_arg("raw"))
+    else:
+        # Reconectare: EventSource trimite Last-Event-ID; clienții manuali pot folosi ?last_event_id=
+        last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+        cursor = hub.resume_cursor(last_event_id)
+        first = sse_frame({
+            "ts": datetime.utcnow().isoformat() + "Z",
+            "line": "*** connected to server ***",
+            "parsed": {},
+            "snapshot": snapshot,
+        })
+
+    body = hub.stream(cursor, first_frame=first)
+    if SSE_COMPRESS and flag_arg("compress", True) and "gzip" in request.headers.get("Accept-Encoding", ""):
+        body = gzip_stream(body)
+        headers.update({"Content-Encoding": "gzip", "Vary": "Accept-Encoding"})
+    return Response(body, mimetype="text/event-stream", headers=headers)
+
+def device_or_404(device_id):
+    dev = ingest_manager.get_device(device_id)
+    if dev is None:
+        return None, (jsonify({"error": f"Unknown device {device_id}",
+                               "devices": [d.device_id for d in ingest_manager.devices()]}), 404)
+    return dev, None
+
 @app.route("/stream")
 def stream():
-    def gen(q: Queue):
-        try:
-            while True:
-                msg = q.get()
-                yield f"data: {json.dumps(msg)}\n\n"
-        except GeneratorExit:
-            pass
-
-    q = Queue(maxsize=1000)
-    with sub_lock:
-        subscribers.add(q)
-
-    q.put({
-        "ts": datetime.utcnow().isoformat() + "Z",
-        "line": "*** connected to server ***",
-        "parsed": {},
-        "snapshot": latest_snapshot,
+    """Canalul agregat: mesajele tuturor analizoarelor, fiecare cu device_id."""
+    dev = ingest_manager.get_device()
+    seed = {d.device_id: dict(d.latest_snapshot) for d in ingest_manager.devices()}
+    return sse_response(ingest_manager.all_hub, dict(dev.latest_snapshot), seed)
+
+@app.route("/stream/<device_id>")
+def stream_device(device_id):
+    dev, err = device_or_404(device_id)
+    if err:
+        return err
+    snapshot = dict(dev.latest_snapshot)
+    return sse_response(dev.hub, snapshot, {None: snapshot})
+
+@app.route("/api/stream/stats")
+def api_stream_stats():
+    return jsonify({
+        "all": ingest_manager.all_hub.stats(),
+        "devices": {d.device_id: d.hub.stats() for d in ingest_manager.devices()},
+        "delta": [enc.stats() for enc in list(_delta_encoders.values())],
     })
 
-    return Response(gen(q), mimetype="text/event-stream")
+@app.route("/api/devices")
+def api_devices():
+    return jsonify({"devices": [d.info() for d in ingest_manager.devices()]})
 
 @app.route("/api/latest")
-def api_latest():
+@app.route("/api/latest/<device_id>")
+def api_latest(device_id=None):
+    """Ultimul snapshot, cu ETag per versiune (304 la If-None-Match) și long-poll ?wait_for_version=N."""
+    dev, err = device_or_404(device_id)
+    if err:
+        return err
+    wait_for = request.args.get("wait_for_version", type=int)
+    if wait_for is not None:
+        timeout = min(max(request.args.get("timeout", LONG_POLL_MAX_S, type=float), 0.0), LONG_POLL_MAX_S)
+        snap = dev.wait_for(wait_for, timeout)
+    else:
+        snap = dev.snapshot
+    tag = f"{dev.epoch}-{snap.version}"
+    headers = {"ETag": f'"{tag}"', "Cache-Control": "no-cache", "X-Snapshot-Version": str(snap.version)}
+    if request.if_none_match.contains(tag):
+        return Response(status=304, headers=headers)
+    return Response(snap.body(), mimetype="application/json", headers=headers)
+
+def parse_time_arg(value, default: float) -> float:
+    """Secunde Unix sau ISO 8601 (ex. 2025-01-31T12:00:00Z)."""
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+def json_column(arr) -> list:
+    # NaN nu e JSON valid: devine null
+    values = arr.tolist()
+    for i in np.flatnonzero(np.isnan(arr)):
+        values[i] = None
+    return values
+
+@app.route("/api/history")
+@app.route("/api/history/<device_id>")
+def api_history(device_id=None):
+    """Istoric pe interval: ?from=&to=&resolution=raw|1s|1m|1h|auto&keys=CO2,Acetone"""
+    if history_store is None:
+        return jsonify({"error": "History store disabled (HISTORY_DIR=off)"}), 404
+    device_id = device_id or request.args.get("device_id") or ingest_manager.get_device().device_id
+    hist = history_store.device(device_id, create=False)
+    if hist is None:
+        return jsonify({"error": f"No history for device {device_id}",
+                        "devices": history_store.device_ids()}), 404
+
+    now = time.time()
+    try:
+        t1 = parse_time_arg(request.args.get("to"), now)
+        t0 = parse_time_arg(request.args.get("from"), t1 - 3600)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid time range: {e}"}), 400
+    resolution = request.args.get("resolution", "auto")
+    if resolution == "auto":
+        resolution = pick_resolution(t0, t1, HISTORY_MAX_POINTS)
+    if resolution != "raw" and resolution not in hist.levels:
+        return jsonify({"error": f"Unknown resolution {resolution}",
+                        "resolutions": ["raw", "auto"] + list(hist.levels)}), 400
+    keys = [k for k in request.args.get("keys", "").split(",") if k] or None
+
+    data = hist.query(resolution, t0, t1, keys)
     return jsonify({
-        "snapshot": latest_snapshot,
-        "raw": list(latest_raw_lines)[-100:],
-        "time": datetime.utcnow().isoformat() + "Z",
+        "device_id": device_id,
+        "from": t0,
+        "to": t1,
+        "resolution": resolution,
+        "points": int(len(data["ts"])),
+        "ts": data["ts"].tolist(),
+        "columns": {k: json_column(v) for k, v in data.items() if k != "ts"},
     })
 
 @app.route("/api/ports")
@@ -213,69 +360,106 @@ def api_ports():
     ]
     return jsonify({"ports": ports})
 
+@app.route("/api/session/patient", methods=["GET", "PUT", "POST", "DELETE"])
+@app.route("/api/session/<device_id>/patient", methods=["GET", "PUT", "POST", "DELETE"])
+def api_session_patient(device_id=None):
+    """Profilul pacientului pentru predicțiile continue ale unui dispozitiv."""
+    dev, err = device_or_404(device_id)
+    if err:
+        return err
+    if request.method == "GET":
+        return jsonify({"device_id": dev.device_id, "patient": streaming_inference.get_profile(dev.device_id)})
+    if request.method == "DELETE":
+        return jsonify({"device_id": dev.device_id, "removed": streaming_inference.clear_profile(dev.device_id)})
+    data = request.get_json(force=True, silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object with the patient fields"}), 400
+    try:
+        if not any(d is dev for d in ingest_manager.devices()):
+            # Niciun analizor conectat: nu există cadre de urmărit, deci nici canal SSE (device_id null)
+            return jsonify({"device_id": None, "patient": normalize_profile(data),
+                            "message": "No analyzer connected; predictions will not stream"})
+        profile = streaming_inference.set_profile(dev, data)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid patient data: {e}"}), 400
+    return jsonify({"device_id": dev.device_id, "patient": profile})
+
 # ------------------ AI Prediction with Valid Data Check ------------------
+def model_not_ready_response(registry=None):
+    """Pornește încărcarea dacă e nevoie; 503 cât timp modelul se încarcă, 500 cu eroarea dacă a eșuat."""
+    registry = registry or model_registry
+    registry.start()
+    if registry.ready:
+        return None
+    if registry.state == "failed":
+        return jsonify({
+            "error": "Model failed to load",
+            "details": registry.error,
+            "model": registry.status(),
+        }), 500, {"Retry-After": str(max(1, math.ceil(registry.retry_in())))}
+    return jsonify({
+        "error": "Model not ready",
+        "message": "Modelul se încarcă încă. Reîncercați în câteva secunde.",
+        "model": registry.status(),
+    }), 503, {"Retry-After": "2"}
+
 @app.route('/predict', methods=['POST'])
 def predict():
+    # --- Citire date de la frontend ---
+    data = request.get_json(force=True, silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object with the patient fields"}), 400
+    requested = data.get("backend") or request.args.get("backend")
+    try:
+        backend, registry, engine = resolve_backend(requested)
+    except KeyError:
+        return unknown_backend_response(requested)
+    not_ready = model_not_ready_response(registry)
+    if not_ready:
+        return not_ready
+
     try:
-        # --- Citire date de la frontend ---
-        data = request.get_json(force=True)
-        s = sensor_data.copy()
-
-        # --- Verificare valori valide ---
-        essential_keys = ['Temperature', 'Humidity', 'Acetone', 'Ammonia', 'CO', 'CO2', 'H2S']
-        for k in essential_keys:
-            val = s.get(k, None)
-            if val is None or np.isnan(val) or np.isinf(val):
-                return jsonify({
-                    "error": f"Invalid sensor data for {k}",
-                    "message": "Predicția nu se poate face până când toți senzorii au valori valide.",
-                    "sensor_data": s
-                }), 400
-
-        # --- Calcule suplimentare ---
-        eps = 1e-6
-        acetone_ammonia_ratio = np.float32(s['Acetone'] / (s['Ammonia'] + eps))
-        co_co2_ratio = np.float32(s['CO'] / (s['CO2'] + eps))
-        h2s_ammonia_ratio = np.float32(s['H2S'] / (s['Ammonia'] + eps))
-        total_voc = np.float32(s['Acetone'] + s['Ammonia'] + s['CO'] + s['H2S'])
-        mean_gases = np.float32(np.mean([s['Acetone'], s['Ammonia'], s['CO'], s['CO2'], s['H2S']]))
-        std_gases = np.float32(np.std([s['Acetone'], s['Ammonia'], s['CO'], s['CO2'], s['H2S']]))
-
-        # --- Pregătire input pentru model ---
-        input_values = [
-            np.float32(data.get('Age', 0)),
-            np.float32(data.get('Sex', 0)),
-            np.float32(data.get('Smoker', 0)),
-            1.0 if data.get('Cough', False) else 0.0,
-            1.0 if data.get('Fatigue', False) else 0.0,
-            1.0 if data.get('Fever', False) else 0.0,
-            1.0 if data.get('Shortness_of_breath', False) else 0.0,
-            np.float32(s['Temperature']),
-            np.float32(s['Humidity']),
-            np.float32(s['Acetone']),
-            np.float32(s['Ammonia']),
-            np.float32(s['CO']),
-            np.float32(s['CO2']),
-            np.float32(s['H2S']),
-            acetone_ammonia_ratio,
-            co_co2_ratio,
-            h2s_ammonia_ratio,
-            total_voc,
-            mean_gases,
-            std_gases,
-            np.float32(data.get('Hour_Of_Day', 12))
-        ]
-
-        input_array = np.array([input_values], dtype=np.float32)
-        input_scaled = scaler.transform(input_array)
-
-        # --- Predictie ---
-        pred_probs = model.predict(input_scaled, verbose=0)
+        dev, err = device_or_404(data.get('device_id'))
+        if err:
+            return err
+        version, s = dev.versioned_sensors()
+
+        # --- Senzori: cei trimiși în cerere îi înlocuiesc pe cei live; se verifică valorile combinate ---
+        try:
+            sensors = features.sensor_columns([data], s)
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": "Invalid record values", "details": str(e)}), 400
+        if features.invalid_sensor_mask(sensors)[0]:
+            bad = [k for k in features.SENSOR_KEYS if not np.isfinite(sensors[k][0])]
+            return jsonify({
+                "error": f"Invalid sensor data for {', '.join(bad)}",
+                "message": "Predicția nu se poate face până când toți senzorii au valori valide.",
+                "sensor_data": {k: (float(v[0]) if np.isfinite(v[0]) else None) for k, v in sensors.items()}
+            }), 400
+
+        # --- Cache: senzorii nu s-au schimbat de la ultima cerere identică ---
+        cache_key = (backend,) + features.patient_key(data) if prediction_cache is not None else None
+        if cache_key is not None:
+            cached = prediction_cache.get(dev.device_id, version, cache_key)
+            if cached is not None:
+                return jsonify(dict(cached, cached=True))
+
+        # --- Features derivate + input pentru model (modul comun features.py) ---
+        with _FEATURES.time():
+            cols = features.patient_columns([data])
+            cols.update(sensors)
+            input_array = features.build_feature_matrix(cols)
+
+        # --- Predictie (grupată cu alte cereri concurente) ---
+        pred_probs = engine.submit(input_array)
         pred_class = int(np.argmax(pred_probs, axis=1)[0])
-        diagnosis = classes[pred_class]
+        diagnosis = registry.model.classes[pred_class]
         confidence = float(pred_probs[0][pred_class])
 
-        return jsonify({'diagnosis': diagnosis, 'confidence': confidence})
+        result = {'diagnosis': diagnosis, 'confidence': confidence, 'device_id': dev.device_id, 'backend': backend}
+        if cache_key is not None:
+            prediction_cache.put(dev.device_id, version, cache_key, result)
+        return jsonify(dict(result, cached=False))
 
     except Exception as e:
         import traceback
@@ -285,10 +469,188 @@ def predict():
             "trace": traceback.format_exc()
         }), 400
 
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch_route():
+    """Scorează mii de înregistrări într-o singură trecere.
+
+    Corp: {"records": [{Age, Sex, Smoker, simptome, Hour_Of_Day, [senzori opționali]}, ...]}.
+    Senzorii lipsă dintr-o înregistrare se iau de la ESP32 `device_id` (valorile live).
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    requested = data.get("backend") or request.args.get("backend")
+    try:
+        backend, registry, engine = resolve_backend(requested)
+    except KeyError:
+        return unknown_backend_response(requested)
+    not_ready = model_not_ready_response(registry)
+    if not_ready:
+        return not_ready
+
+    records = data.get("records")
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        return jsonify({"error": "Body must be {\"records\": [ {...}, ... ]}"}), 400
+    if len(records) > PREDICT_BATCH_MAX:
+        return jsonify({"error": f"Too many records ({len(records)} > {PREDICT_BATCH_MAX})"}), 413
+    if not records:
+        return jsonify({"results": [], "count": 0})
+
+    dev, err = device_or_404(data.get("device_id"))
+    if err:
+        return err
+
+    try:
+        t0 = time.perf_counter()
+        live = dev.sensors()
+        cols = features.patient_columns(records)
+        sensors = features.sensor_columns(records, live)
+        invalid = features.invalid_sensor_mask(sensors)
+        cols.update(sensors)
+        X = features.build_feature_matrix(cols)
+        _FEATURES.observe(time.perf_counter() - t0)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": "Invalid record values", "details": str(e)}), 400
+
+    results = [None] * len(records)
+    valid_idx = np.flatnonzero(~invalid)
+    if valid_idx.size:
+        probs = engine.submit(X[valid_idx])
+        pred = probs.argmax(axis=1)
+        conf = probs[np.arange(len(pred)), pred]
+        classes = registry.model.classes
+        for i, c, p in zip(valid_idx.tolist(), pred.tolist(), conf.tolist()):
+            results[i] = {"diagnosis": classes[c], "confidence": p}
+    for i in np.flatnonzero(invalid).tolist():
+        results[i] = {"error": "Invalid sensor data"}
+
+    return jsonify({"results": results, "count": len(results), "scored": int(valid_idx.size), "backend": backend})
+
+@app.route("/healthz")
+def healthz():
+    """Liveness: procesul răspunde, indiferent de starea modelului."""
+    return jsonify({"status": "ok", "time": datetime.utcnow().isoformat() + "Z"})
+
+@app.route("/readyz")
+def readyz():
+    """Readiness: 200 doar după ce modelul e încărcat și încălzit."""
+    model_registry.start()
+    status = model_registry.status()
+    return jsonify(status), (200 if status["ready"] else 503)
+
+@app.route("/api/models")
+def api_models():
+    """Bundle-urile disponibile, cu starea celor încărcate; `default` e MODEL_BACKEND."""
+    return jsonify({"default": MODEL_BACKEND, "models": model_pool.status()})
+
+@app.route("/api/inference/stats")
+def api_inference_stats():
+    stats = inference_engine.stats()
+    stats["cache"] = prediction_cache.stats() if prediction_cache is not None else None
+    stats["streaming"] = streaming_inference.stats()
+    return jsonify(stats)
+
+# ------------------ Metrics & Profiling ------------------
+@app.before_request
+def _request_timer():
+    g.request_t0 = time.perf_counter()
+
+@app.after_request
+def _request_observe(response):
+    t0 = g.get("request_t0")
+    if t0 is not None:
+        rule = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        REQUEST_SECONDS.labels(rule, response.status_code).observe(time.perf_counter() - t0)
+    return response
+
+def _hubs():
+    yield "all", ingest_manager.all_hub
+    for d in ingest_manager.devices():
+        yield d.device_id, d.hub
+
+def _per_device(fn):
+    return lambda: [((d.device_id,), fn(d)) for d in ingest_manager.devices()]
+
+def _binary_stat(key):
+    return _per_device(lambda d: (d.info()["binary"] or {}).get(key, 0))
+
+REGISTRY.gauge("airnalyzer_sse_subscribers", "Connected SSE subscribers per hub.",
+               lambda: [((name,), h.stats()["subscribers"]) for name, h in _hubs()], ("hub",))
+REGISTRY.counter("airnalyzer_sse_published_total", "Messages published per hub.",
+                 lambda: [((name,), h.stats()["published"]) for name, h in _hubs()], ("hub",))
+REGISTRY.counter("airnalyzer_sse_lag_skips_total", "Slow subscribers moved to the newest message.",
+                 lambda: [((name,), h.stats()["lag_skips"]) for name, h in _hubs()], ("hub",))
+REGISTRY.counter("airnalyzer_sse_lag_disconnects_total", "Slow subscribers disconnected.",
+                 lambda: [((name,), h.stats()["lag_disconnects"]) for name, h in _hubs()], ("hub",))
+REGISTRY.gauge("airnalyzer_devices_connected", "Connected ESP32 analyzers.", ingest_manager.connected_count)
+REGISTRY.counter("airnalyzer_serial_lines_total", "Text lines read per device.",
+                 _per_device(lambda d: d.info()["lines_read"]), ("device",))
+REGISTRY.counter("airnalyzer_frames_total", "Sensor frames parsed per device.",
+                 _per_device(lambda d: d.info()["frames_read"]), ("device",))
+REGISTRY.counter("airnalyzer_unknown_lines_total", "Lines the frame parser did not recognize.",
+                 _per_device(lambda d: d.info()["unknown_lines"]), ("device",))
+REGISTRY.counter("airnalyzer_binary_crc_errors_total", "Binary frames with a bad CRC.",
+                 _binary_stat("crc_errors"), ("device",))
+REGISTRY.counter("airnalyzer_binary_dropped_frames_total", "Binary frames missing from the sequence.",
+                 _binary_stat("dropped_frames"), ("device",))
+REGISTRY.gauge("airnalyzer_inference_queue_depth", "Prediction requests waiting for a batch.",
+               lambda: inference_engine.stats()["queued_requests"])
+REGISTRY.counter("airnalyzer_inference_batches_total", "Model forward passes.",
+                 lambda: inference_engine.stats()["batches"])
+REGISTRY.counter("airnalyzer_inference_rows_total", "Rows scored by the model.",
+                 lambda: inference_engine.stats()["rows"])
+REGISTRY.counter("airnalyzer_inference_errors_total", "Failed forward passes.",
+                 lambda: inference_engine.stats()["errors"])
+REGISTRY.gauge("airnalyzer_model_ready", "1 when the model is loaded and warmed up.",
+               lambda: 1 if model_registry.ready else 0)
+REGISTRY.counter("airnalyzer_predict_cache_hits_total", "Prediction cache hits.",
+                 lambda: prediction_cache.hits if prediction_cache is not None else 0)
+REGISTRY.counter("airnalyzer_predict_cache_misses_total", "Prediction cache misses.",
+                 lambda: prediction_cache.misses if prediction_cache is not None else 0)
+REGISTRY.counter("airnalyzer_stream_inferences_total", "Background inferences published over SSE.",
+                 lambda: streaming_inference.inferences)
+
+@app.route("/metrics")
+def metrics():
+    """Metrici în formatul text Prometheus."""
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+PROFILE_MAX_S = float(os.environ.get("PROFILE_MAX_S", "60"))
+
+@app.route("/debug/profile")
+def debug_profile():
+    """Profil prin eșantionare la cerere: ?seconds=5&interval_ms=5&idle=0 -> stive în format collapsed."""
+    try:
+        seconds = min(float(request.args.get("seconds", "5")), PROFILE_MAX_S)
+        interval_s = max(float(request.args.get("interval_ms", "5")), 0.5) / 1000.0
+    except ValueError:
+        return jsonify({"error": "seconds and interval_ms must be numbers"}), 400
+    idle = request.args.get("idle", "0") in ("1", "true", "yes")
+    try:
+        result = sampling_profiler.sample(seconds, interval_s, idle=idle)
+    except sampling_profiler.ProfilerBusy as e:
+        return jsonify({"error": str(e)}), 409
+    log.info("[Profile] %d samples over %.1fs", result["samples"], seconds)
+    header = f"# samples={result['samples']} seconds={seconds} interval_ms={interval_s * 1000:g}\n"
+    return Response(header + sampling_profiler.collapsed(result), mimetype="text/plain")
+
 # ------------------ Main ------------------
+def start_background():
+    """Pornește cititoarele seriale și încărcarea modelului, fără să blocheze serverul.
+
+    Într-un worker, ingest_manager doar urmărește memoria partajată scrisă de procesul de ingest.
+    """
+    ingest_manager.start()
+    model_registry.start()
+    if history_store is not None and ROLE != "worker":
+        atexit.register(history_store.flush)
+    if ROLE == "ingest":
+        threading.Thread(target=shared_state.control_loop, args=(SHARED.queue, ingest_manager, streaming_inference),
+                         name="shm-control", daemon=True).start()
+
 def main():
-    t = threading.Thread(target=serial_reader_forever, daemon=True)
-    t.start()
+    # Cu reloader-ul Flask, procesul părinte doar supraveghează fișierele;
+    # portul serial și modelul le deschide numai procesul copil care servește cererile.
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background()
     app.run(host="127.0.0.1", port=5000, debug=True, threaded=True)
 
 if __name__ == "__main__":
@@ -0,0 +1,408 @@
+import os
+import sys
+import pty
+import tty
+import json
+import time
+import socket
+import argparse
+import platform
+import threading
+import subprocess
+import http.client
+import zlib
+
+import numpy as np
+
+from bench_parser import synthetic_lines, read_capture
+from protocol import encode_binary_frame
+
+# Benchmark end-to-end cu un ESP32 simulat: un pty pe care serverul îl deschide ca port serial,
+# cadre trimise la o rată fixă, N clienți SSE pe /stream și M apelanți /predict în paralel.
+# Latența măsurată: scrierea cadrului în pty -> mesajul SSE primit de client (același ceas).
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVICE_ID = "bench"
+SEQ_PREFIX = "SEQ: "
+
+
+# ------------------ Fake ESP32 ------------------
+def text_frames(lines):
+    """Împarte liniile unei capturi în cadre, la separator."""
+    frames, cur = [], []
+    for line in lines:
+        if line.startswith("-----") or line.startswith("====="):
+            if cur:
+                frames.append(cur)
+            cur = []
+        else:
+            cur.append(line)
+    return frames
+
+
+def binary_fields(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        yield {
+            "eco2_ppm": int(rng.integers(400, 600)), "tvoc_ppb": int(rng.integers(0, 200)),
+            "temp_c": float(rng.normal(24, 1)), "hum_pct": float(rng.normal(40, 5)),
+            "press_hpa": float(rng.normal(1008, 3)), "gas_kohm": float(rng.normal(80, 10)),
+            "mq3_raw": int(rng.integers(0, 4096)), "mq136_raw": int(rng.integers(0, 4096)),
+            "co2_raw_ppm": int(rng.integers(400, 500)), "co2_avg_ppm": int(rng.integers(400, 500)),
+        }
+
+
+class FakeESP32:
+    """Un pty: serverul deschide capătul slave ca port serial, noi scriem cadre în master."""
+
+    def __init__(self, framing: str, rate_hz: float, captures=None):
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.framing = framing
+        self.rate_hz = rate_hz
+        self.captures = captures or []
+        self.send_times = {}  # seq -> time.time() la scriere
+        self.sent = 0
+        self._thread = None
+
+    def _payloads(self, n: int):
+        if self.framing == "binary":
+            for seq, fields in enumerate(binary_fields(n)):
+                yield seq, encode_binary_frame(seq, seq, fields)
+            return
+        lines = []
+        for path in self.captures:
+            lines += read_capture(path)
+        frames = text_frames(lines or synthetic_lines(min(n, 10_000)))
+        for seq in range(n):
+            body = frames[seq % len(frames)] + [f"{SEQ_PREFIX}{seq}", "----------------------------"]
+            yield seq, ("\r\n".join(body) + "\r\n").encode("utf-8")
+
+    def _run(self, n: int):
+        period = 1.0 / self.rate_hz
+        start = time.perf_counter()
+        for seq, payload in self._payloads(n):
+            delay = start + seq * period - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self.send_times[seq] = time.time()
+            os.write(self.master, payload)
+            self.sent += 1
+
+    def start(self, duration_s: float):
+        n = max(1, int(self.rate_hz * duration_s))
+        self._thread = threading.Thread(target=self._run, args=(n,), name="fake-esp32", daemon=True)
+        self._thread.start()
+
+    def join(self):
+        self._thread.join()
+
+    def drain(self):
+        """Citește din master ce ar scrie serverul (nimic, de obicei), ca pty-ul să nu se blocheze."""
+        try:
+            os.set_blocking(self.master, False)
+            while os.read(self.master, 65536):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+
+# ------------------ Server ------------------
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, device_port: str, backend: str, extra_env=None, workers: int = 0):
+    """appserver într-un proces separat (fără reloader), cu dispozitivul fix pe pty.
+
+    Cu workers > 0 pornește serve.py (un proces de ingest + `workers` procese HTTP).
+    """
+    env = dict(os.environ, BT_COM_PORTS=f"{DEVICE_ID}={device_port}", MODEL_BACKEND=backend,
+               HISTORY_DIR=os.environ.get("HISTORY_DIR", "off"), PYTHONUNBUFFERED="1")
+    env.update(extra_env or {})
+    if workers:
+        cmd = [sys.executable, "serve.py", "--port", str(port), "--workers", str(workers)]
+    else:
+        cmd = [sys.executable, "-c", "import appserver; appserver.start_background(); "
+               f"appserver.app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    return subprocess.Popen(cmd, cwd=BASE_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def get_json(port: int, path: str):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        conn.request("GET", path)
+        resp = conn.getresponse()
+        return resp.status, json.loads(resp.read() or b"null")
+    finally:
+        conn.close()
+
+
+def wait_ready(port: int, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            status, _ = get_json(port, "/readyz")
+            if status == 200:
+                return True
+        except (OSError, ValueError):
+            pass
+        time.sleep(0.2)
+    return False
+
+
+# ------------------ Clients ------------------
+def message_seq(msg: dict):
+    frame = msg.get("frame") or msg.get("changed") or {}  # "changed": evenimentele delta
+    if "seq" in frame:
+        return int(frame["seq"])
+    for line in reversed(msg.get("lines") or ()):  # delta comasat: ultimul cadru din lot
+        if line.startswith(SEQ_PREFIX):
+            return int(line[len(SEQ_PREFIX):])
+    return None
+
+
+class SSEClient(threading.Thread):
+    """Client SSE care măsoară latența per cadru și octeții primiți (pe fir, deci după gzip)."""
+
+    def __init__(self, port: int, send_times: dict, mode: str = "full", gzip: bool = False, raw: bool = False):
+        super().__init__(daemon=True)
+        self.port = port
+        self.send_times = send_times
+        self.mode = mode
+        self.gzip = gzip
+        self.raw = raw
+        self.latencies = []
+        self.seqs = set()
+        self.events = 0
+        self.bytes = 0
+        self.connected = threading.Event()
+        self.error = None
+
+    def run(self):
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+            path = f"/stream/{DEVICE_ID}"
+            if self.mode == "delta":
+                path += "?mode=delta" + ("&raw=1" if self.raw else "")
+            conn.request("GET", path, headers={"Accept-Encoding": "gzip"} if self.gzip else {})
+            resp = conn.getresponse()
+            gz = zlib.decompressobj(16 + zlib.MAX_WBITS) if resp.getheader("Content-Encoding") == "gzip" else None
+            self.connected.set()
+            buf = b""
+            while True:
+                chunk = resp.read1(65536)
+                if not chunk:
+                    return
+                self.bytes += len(chunk)
+                buf += gz.decompress(chunk) if gz else chunk
+                *events, buf = buf.split(b"\n\n")
+                now = time.time()
+                for event in events:
+                    data = [line[6:] for line in event.split(b"\n") if line.startswith(b"data: ")]
+                    if not data:
+                        continue
+                    self.events += 1
+                    seq = message_seq(json.loads(b"\n".join(data)))
+                    if seq is not None and seq in self.send_times:
+                        self.seqs.add(seq)
+                        self.latencies.append(now - self.send_times[seq])
+        except Exception as e:
+            self.error = repr(e)
+            self.connected.set()
+
+
+class PredictCaller(threading.Thread):
+    def __init__(self, port: int, stop: threading.Event):
+        super().__init__(daemon=True)
+        self.port = port
+        self.stop = stop
+        self.latencies = []
+        self.ok = 0
+        self.errors = 0
+        self.not_ready = 0
+
+    def run(self):
+        body = json.dumps({"device_id": DEVICE_ID, "Age": 45, "Sex": 1, "Smoker": 0,
+                           "Cough": 1, "Fatigue": 0, "Fever": 0, "Shortness_of_breath": 0})
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+        while not self.stop.is_set():
+            t0 = time.perf_counter()
+            try:
+                conn.request("POST", "/predict", body=body, headers={"Content-Type": "application/json"})
+                resp = conn.getresponse()
+                resp.read()
+            except (OSError, http.client.HTTPException):
+                self.errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+                continue
+            if resp.status == 200:
+                self.ok += 1
+                self.latencies.append(time.perf_counter() - t0)
+            elif resp.status == 503:
+                self.not_ready += 1
+            else:
+                self.errors += 1
+        conn.close()
+
+
+def percentiles_ms(values) -> dict:
+    if not values:
+        return {"count": 0}
+    a = np.asarray(values) * 1000.0
+    return {
+        "count": int(a.size),
+        "mean": round(float(a.mean()), 3),
+        "p50": round(float(np.percentile(a, 50)), 3),
+        "p90": round(float(np.percentile(a, 90)), 3),
+        "p99": round(float(np.percentile(a, 99)), 3),
+        "max": round(float(a.max()), 3),
+    }
+
+
+# ------------------ Run ------------------
+def run_benchmark(args) -> dict:
+    device = FakeESP32(args.framing, args.rate, args.capture)
+    port = args.port or free_port()
+    server = start_server(port, device.port, args.backend, workers=args.workers)
+    try:
+        if not wait_ready(port):
+            raise RuntimeError("server did not become ready")
+        device.drain()
+
+        # În modul text numărul de secvență e doar în liniile brute, deci clienții delta cer ?raw=1
+        raw = args.sse_raw or args.framing == "text"
+        sse_clients = [SSEClient(port, device.send_times, args.sse_mode, args.gzip, raw)
+                       for _ in range(args.sse_clients)]
+        for c in sse_clients:
+            c.start()
+        for c in sse_clients:
+            c.connected.wait(10)
+
+        stop = threading.Event()
+        callers = [PredictCaller(port, stop) for _ in range(args.predict_callers)]
+        t0 = time.perf_counter()
+        device.start(args.duration)
+        for c in callers:
+            c.start()
+        device.join()
+        time.sleep(args.drain)  # ultimele cadre ajung la clienți
+        stop.set()
+        elapsed = time.perf_counter() - t0
+        for c in callers:
+            c.join(5)
+
+        _, devices = get_json(port, "/api/devices")
+        _, hub_stats = get_json(port, "/api/stream/stats")
+        _, infer_stats = get_json(port, "/api/inference/stats")
+    finally:
+        server.terminate()
+        server.wait(10)
+
+    latencies = [x for c in sse_clients for x in c.latencies]
+    received = [len(c.seqs) for c in sse_clients]
+    if args.sse_mode == "delta":
+        # Cadrele sunt comasate: contează doar ca fiecare client să ajungă la ultimul cadru trimis
+        last = max(device.send_times, default=None)
+        dropped = sum(1 for c in sse_clients if last is not None and last not in c.seqs)
+    else:
+        dropped = int(sum(device.sent - r for r in received))
+    ok = sum(c.ok for c in callers)
+    return {
+        "benchmark": "e2e",
+        "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "framing": args.framing, "rate_hz": args.rate, "duration_s": args.duration,
+            "sse_clients": args.sse_clients, "predict_callers": args.predict_callers,
+            "backend": args.backend, "captures": args.capture, "workers": args.workers,
+            "sse_mode": args.sse_mode, "gzip": args.gzip,
+        },
+        "frames_sent": device.sent,
+        "achieved_rate_hz": round(device.sent / args.duration, 2),
+        "sse": {
+            "received_per_client": received,
+            "events_per_client": [c.events for c in sse_clients],
+            "bytes_per_client": [c.bytes for c in sse_clients],
+            "dropped_total": dropped,
+            "client_errors": [c.error for c in sse_clients if c.error],
+            "latency_ms": percentiles_ms(latencies),
+        },
+        "predict": {
+            "ok": ok,
+            "not_ready": sum(c.not_ready for c in callers),
+            "errors": sum(c.errors for c in callers),
+            "per_s": round(ok / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": percentiles_ms([x for c in callers for x in c.latencies]),
+        },
+        "server": {"devices": devices, "stream": hub_stats, "inference": infer_stats},
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float):
+    """Regresii față de un rezultat anterior: latență p99 mai mare / predicții/s mai mici cu > tolerance."""
+    problems = []
+    old = baseline["sse"]["latency_ms"].get("p99")
+    new = result["sse"]["latency_ms"].get("p99")
+    if old and new and new > old * (1 + tolerance):
+        problems.append(f"SSE p99 latency {new:.2f} ms vs {old:.2f} ms")
+    old, new = baseline["predict"]["per_s"], result["predict"]["per_s"]
+    if old and new < old * (1 - tolerance):
+        problems.append(f"predictions/s {new:.1f} vs {old:.1f}")
+    if result["sse"]["dropped_total"] > baseline["sse"]["dropped_total"]:
+        problems.append(f"dropped {result['sse']['dropped_total']} vs {baseline['sse']['dropped_total']}")
+    return problems
+
+
+def main():
+    ap = argparse.ArgumentParser(description="End-to-end benchmark with a simulated ESP32 on a pty.")
+    ap.add_argument("--rate", type=float, default=10.0, help="frames per second (1..1000)")
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds of streaming")
+    ap.add_argument("--framing", choices=["text", "binary"], default="text")
+    ap.add_argument("--capture", action="append", default=[], help="replay a recorded serial capture (text)")
+    ap.add_argument("--sse-clients", type=int, default=4)
+    ap.add_argument("--predict-callers", type=int, default=2)
+    ap.add_argument("--backend", default="numpy", help="MODEL_BACKEND for the server")
+    ap.add_argument("--workers", type=int, default=0, help="serve with serve.py and N worker processes")
+    ap.add_argument("--sse-mode", choices=["full", "delta"], default="full", help="SSE protocol mode of the clients")
+    ap.add_argument("--gzip", action="store_true", help="SSE clients accept gzip-compressed streams")
+    ap.add_argument("--sse-raw", action="store_true", help="delta clients also ask for raw lines (always on for text framing)")
+    ap.add_argument("--port", type=int, default=0, help="HTTP port (default: a free one)")
+    ap.add_argument("--drain", type=float, default=1.0, help="seconds to wait for in-flight frames")
+    ap.add_argument("--json", metavar="PATH", help="write results as JSON ('-' for stdout)")
+    ap.add_argument("--baseline", metavar="PATH", help="exit 1 if results regress against this JSON")
+    ap.add_argument("--tolerance", type=float, default=0.2)
+    args = ap.parse_args()
+
+    result = run_benchmark(args)
+    sse, pred = result["sse"], result["predict"]
+    print(f"[Bench] {result['frames_sent']} frames @ {result['achieved_rate_hz']} Hz ({args.framing}), "
+          f"{args.sse_clients} SSE clients, {args.predict_callers} /predict callers", file=sys.stderr)
+    print(f"[Bench] SSE latency ms: {sse['latency_ms']}  dropped: {sse['dropped_total']}", file=sys.stderr)
+    print(f"[Bench] SSE per client: {int(np.mean(sse['events_per_client'] or [0]))} events, "
+          f"{int(np.mean(sse['bytes_per_client'] or [0]))} bytes", file=sys.stderr)
+    print(f"[Bench] /predict: {pred['per_s']} req/s, latency ms: {pred['latency_ms']}", file=sys.stderr)
+
+    if args.json == "-":
+        print(json.dumps(result, indent=2))
+    elif args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(result, json.load(f), args.tolerance)
+        for p in problems:
+            print(f"[Bench] REGRESSION: {p}", file=sys.stderr)
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
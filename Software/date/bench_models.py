@@ -0,0 +1,155 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+
+import numpy as np
+
+import model_bundles
+from features import FEATURE_COLUMNS
+from export_tflite import load_split, _latency_us
+
+# Compară bundle-urile de model pe același set de test (split-ul stratificat din train_model):
+# acuratețe, F1 macro, latența pe un rând și pe lot; clasamentul e după acuratețe, apoi latență.
+# Cu --ensemble, scrie un bundle ensemble peste --backends cu ponderi din câștigul de F1 macro
+# față de clasa majoritară, pe același split.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def bench_bundle(path, X_test, y_names, batch_rows=1024, repeat=200):
+    from sklearn.metrics import f1_score
+
+    t0 = time.perf_counter()
+    bundle = model_bundles.load_bundle(path)
+    load_s = time.perf_counter() - t0
+
+    probs = bundle.predict(X_test)
+    pred = np.asarray(bundle.classes)[probs.argmax(axis=1)]
+    row, batch = X_test[:1], X_test[:batch_rows]
+    bundle.predict(row)  # încălzire
+    single = _latency_us(lambda: bundle.predict(row), repeat)
+    per_batch = _latency_us(lambda: bundle.predict(batch), max(5, repeat // 20))
+    return {
+        "backend": bundle.backend,
+        "accuracy": round(float(np.mean(pred == y_names)), 6),
+        "f1_macro": round(float(f1_score(y_names, pred, average="macro", zero_division=0)), 6),
+        "load_s": round(load_s, 3),
+        "single_row_us": single,
+        "batch_us_per_row": round(per_batch["p50"] / len(batch), 3),
+    }
+
+
+def build_ensemble(members, bundles, X_test, y_names):
+    """Ponderi ∝ câștigul de F1 macro față de un model care prezice mereu clasa majoritară.
+
+    Membrii care nu bat clasa majoritară (la acuratețe sau F1 macro) sunt scoși. Întoarce
+    (membrii păstrați, ponderile lor, scorurile fiecărui membru, scorul ensemble-ului), pe split-ul de test.
+    """
+    loaded = {m: model_bundles.load_bundle(bundles[m]) for m in members}
+    classes = loaded[members[0]].classes
+    names = np.asarray(classes)
+    probs, scores = {}, {}
+    for m, b in loaded.items():
+        probs[m] = b.predict(X_test)[:, [b.classes.index(c) for c in classes]]
+        scores[m] = model_bundles.score_predictions(names[probs[m].argmax(axis=1)], y_names)
+    kept = [m for m in members if scores[m]["accuracy"] > scores[m]["baseline_accuracy"]
+            and scores[m]["f1_macro"] > scores[m]["baseline_f1_macro"]]
+    if len(kept) < 2:
+        raise ValueError(f"Only {kept or 'no members'} beat the majority class on the test split; nothing to ensemble")
+    raw = np.array([scores[m]["f1_macro"] - scores[m]["baseline_f1_macro"] for m in kept])
+    weights = raw / raw.sum()
+    mixed = sum(w * probs[m] for m, w in zip(kept, weights))
+    ensemble = model_bundles.score_predictions(names[mixed.argmax(axis=1)], y_names)
+    return kept, [round(float(w), 6) for w in weights], scores, ensemble
+
+
+def rank(results: dict):
+    ok = [(name, r) for name, r in results.items() if "error" not in r]
+    return sorted(ok, key=lambda item: (-item[1]["accuracy"], item[1]["single_row_us"]["p50"]))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Rank model bundles by accuracy and latency on the held-out split.")
+    ap.add_argument("--dir", default=BASE_DIR, help="directory with *.bundle.json manifests")
+    ap.add_argument("--data", default=os.path.join(BASE_DIR, "airnalyzer_simulated_data_realistic_full_correlated.csv"))
+    ap.add_argument("--backends", default="", help="comma-separated bundle names (default: all)")
+    ap.add_argument("--limit", type=int, default=None, help="only read the first N dataset rows")
+    ap.add_argument("--repeat", type=int, default=200, help="single-row timing iterations")
+    ap.add_argument("--json", metavar="PATH", help="write results as JSON ('-' for stdout)")
+    ap.add_argument("--ensemble", metavar="NAME",
+                    help="write NAME.bundle.json averaging --backends, weighted by macro F1 above the majority class")
+    args = ap.parse_args()
+
+    bundles = model_bundles.discover(args.dir)
+    wanted = [b.strip() for b in args.backends.split(",") if b.strip()] or list(bundles)
+    unknown = [b for b in wanted if b not in bundles]
+    if unknown:
+        print(f"Unknown bundles: {unknown} (available: {sorted(bundles)})", file=sys.stderr)
+        sys.exit(2)
+
+    _, X_test, _, y_test, classes = load_split(args.data, args.limit)
+    y_names = np.asarray(classes)[y_test]
+
+    if args.ensemble:
+        if len(wanted) < 2:
+            print("--ensemble needs at least two --backends", file=sys.stderr)
+            sys.exit(2)
+        try:
+            kept, weights, scores, ensemble = build_ensemble(wanted, bundles, X_test, y_names)
+        except ValueError as e:
+            print(f"[Bench] Not writing {args.ensemble}: {e}", file=sys.stderr)
+            sys.exit(1)
+        dropped = [m for m in wanted if m not in kept]
+        if dropped:
+            print(f"[Bench] dropping {dropped}: no better than the majority class")
+        best = max(kept, key=lambda m: scores[m]["f1_macro"])
+        print(f"[Bench] ensemble {args.ensemble}: weights {dict(zip(kept, weights))}, "
+              f"F1 macro {ensemble['f1_macro']:.4f} (best member {best}: {scores[best]['f1_macro']:.4f})")
+        if ensemble["f1_macro"] < scores[best]["f1_macro"]:
+            print(f"[Bench] Not writing {args.ensemble}: it is worse than {best} alone", file=sys.stderr)
+            sys.exit(1)
+        first = model_bundles.read_manifest(bundles[kept[0]])
+        path = os.path.join(args.dir, args.ensemble + model_bundles.BUNDLE_SUFFIX)
+        model_bundles.write_manifest(
+            path, args.ensemble, "ensemble", None, FEATURE_COLUMNS, first["classes"],
+            members=kept, weights=weights,
+            weights_source={"metric": "macro F1 above the majority class", "rows_test": int(len(X_test)),
+                            "dropped": dropped, "member_scores": scores, "ensemble_score": ensemble})
+        print(f"[Bench] Ensemble bundle written to {path}")
+        return
+
+    results = {}
+    for name in wanted:
+        try:
+            results[name] = bench_bundle(bundles[name], X_test, y_names, repeat=args.repeat)
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {str(e)[:200]}"}
+            print(f"[Bench] {name}: failed to load ({results[name]['error']})", file=sys.stderr)
+
+    print(f"{'#':<3}{'bundle':<16}{'backend':<10}{'accuracy':>10}{'F1 macro':>10}{'row p50 us':>12}"
+          f"{'row p99 us':>12}{'batch us/row':>14}{'load s':>8}")
+    for i, (name, r) in enumerate(rank(results), 1):
+        print(f"{i:<3}{name:<16}{r['backend']:<10}{r['accuracy']:>10.4f}{r['f1_macro']:>10.4f}"
+              f"{r['single_row_us']['p50']:>12}{r['single_row_us']['p99']:>12}{r['batch_us_per_row']:>14}{r['load_s']:>8}")
+
+    if args.json:
+        out = {
+            "benchmark": "models",
+            "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "rows_test": int(len(X_test)),
+            "ranking": [name for name, _ in rank(results)],
+            "results": results,
+        }
+        if args.json == "-":
+            print(json.dumps(out, indent=2))
+        else:
+            with open(args.json, "w") as f:
+                json.dump(out, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
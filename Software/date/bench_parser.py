@@ -0,0 +1,86 @@
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+from protocol import FrameParser
+
+# Benchmark pentru parserul de cadre: linii/s și cadre/s pe capturi reale de la ESP32
+# sau pe cadre sintetice în formatul firmware-ului, comparat cu vechiul json.loads per linie.
+
+
+def synthetic_lines(n_frames: int, seed: int = 0):
+    """Cadre în formatul SenzoriSoket_BT.ino (cu banner-ul de pornire la început)."""
+    rng = np.random.default_rng(seed)
+    lines = ["=== ESP32 Sensor Monitor ===", "SGP30 init OK", "============================"]
+    for _ in range(n_frames):
+        lines.append(f"SGP30 → eCO2: {rng.integers(400, 600)} ppm, TVOC: {rng.integers(0, 200)} ppb")
+        lines.append(f"BME688 → Temp: {rng.normal(24, 1):.2f} °C, Hum: {rng.normal(40, 5):.2f} %, "
+                     f"Press: {rng.normal(1008, 3):.2f} hPa, Gas: {rng.normal(80, 10):.2f} KΩ")
+        lines.append(f"MQ-3 analog: {rng.integers(0, 4096)}")
+        lines.append(f"MQ-136 analog: {rng.integers(0, 4096)}")
+        if rng.random() < 0.05:
+            lines.append("MH-Z19B → Eroare citire CO2")
+        else:
+            lines.append(f"MH-Z19B → CO2 raw: {rng.integers(400, 500)} ppm | avg: {rng.integers(400, 500)} ppm")
+        lines.append("----------------------------")
+    return lines
+
+
+def read_capture(path: str):
+    with open(path, "rb") as f:
+        return [ln.decode("utf-8", errors="ignore").strip() for ln in f if ln.strip()]
+
+
+def bench_legacy(lines):
+    """Calea veche: json.loads cu try/except pe fiecare linie."""
+    parsed = 0
+    t0 = time.perf_counter()
+    for line in lines:
+        try:
+            json.loads(line)
+            parsed += 1
+        except json.JSONDecodeError:
+            pass
+    return time.perf_counter() - t0, parsed
+
+
+def bench_frames(lines):
+    parser = FrameParser()
+    frames = 0
+    t0 = time.perf_counter()
+    for line in lines:
+        if parser.feed_line(line) is not None:
+            frames += 1
+    return time.perf_counter() - t0, frames, parser.unknown_lines
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Throughput benchmark for the ESP32 frame parser.")
+    ap.add_argument("captures", nargs="*", help="raw serial captures (one line per reading)")
+    ap.add_argument("--synthetic", type=int, default=0, metavar="N", help="also run on N synthetic frames")
+    ap.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    args = ap.parse_args()
+
+    inputs = [(p, read_capture(p)) for p in args.captures]
+    if args.synthetic or not inputs:
+        n = args.synthetic or 100_000
+        inputs.append((f"synthetic({n})", synthetic_lines(n)))
+
+    for name, lines in inputs:
+        if not lines:
+            print(f"[Bench] {name}: empty, skipped")
+            continue
+        legacy_dt, legacy_ok = min(bench_legacy(lines) for _ in range(args.repeat))
+        frame_dt, frames, unknown = min(bench_frames(lines) for _ in range(args.repeat))
+        print(f"[Bench] {name}: {len(lines)} lines")
+        print(f"  legacy json : {len(lines) / legacy_dt:>12,.0f} lines/s  ({legacy_ok} lines parsed)")
+        print(f"  frame parser: {len(lines) / frame_dt:>12,.0f} lines/s  "
+              f"{frames / frame_dt:>10,.0f} frames/s  ({frames} frames, {unknown} unknown lines)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+import json
+import time
+import zlib
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+LAG_SKIP = "skip"
+LAG_DISCONNECT = "disconnect"
+
+
+# ------------------ Broadcast Hub ------------------
+class BroadcastHub:
+    """Fan-out SSE: fiecare mesaj e serializat o singură dată într-un ring buffer comun.
+
+    Abonații nu au cozi proprii, doar un cursor (ultimul număr de secvență trimis).
+    Un abonat rămas în urmă cu mai mult decât capacitatea buffer-ului fie sare la
+    ultimul mesaj (LAG_SKIP), fie e deconectat (LAG_DISCONNECT).
+    """
+
+    def __init__(self, capacity: int = 1024, lag_policy: str = LAG_SKIP, heartbeat_s: float = 15.0):
+        if lag_policy not in (LAG_SKIP, LAG_DISCONNECT):
+            raise ValueError(f"Unknown lag policy: {lag_policy}")
+        self.capacity = max(2, int(capacity))
+        self.lag_policy = lag_policy
+        self.heartbeat_s = heartbeat_s
+
+        self._frames = [None] * self.capacity
+        self._last_seq = 0  # ultimul număr de secvență publicat (0 = nimic încă)
+        self._cond = threading.Condition()
+
+        self.subscribers = 0
+        self.published = 0
+        self.lag_skips = 0
+        self.lag_disconnects = 0
+        self._taps = []
+
+    # ------------------ Publish ------------------
+    def publish(self, message: dict, event: str = None, seq: int = None) -> int:
+        """Serializează mesajul o dată și îl pune în buffer; întoarce numărul de secvență.
+
+        `seq` impune numărul (ex. cel din memoria partajată, comun tuturor workerilor); trebuie să
+        crească, iar numerele sărite rămân goale în buffer.
+        """
+        payload = json.dumps(message)
+        prefix = f"event: {event}\n" if event else ""
+        with self._cond:
+            if seq is None:
+                seq = self._last_seq + 1
+            elif seq <= self._last_seq:
+                raise ValueError(f"Sequence {seq} is not after {self._last_seq}")
+            for skipped in range(max(self._last_seq + 1, seq - self.capacity + 1), seq):
+                self._frames[skipped % self.capacity] = None
+            self._frames[seq % self.capacity] = f"id: {seq}\n{prefix}data: {payload}\n\n".encode("utf-8")
+            self._last_seq = seq
+            self.published += 1
+            self._cond.notify_all()
+        for fn in self._taps:
+            fn(message, event)
+        return seq
+
+    def add_tap(self, fn):
+        """fn(message, event) e apelat după fiecare publish, în thread-ul care publică (ex. DeltaEncoder)."""
+        self._taps.append(fn)
+
+    @property
+    def last_seq(self) -> int:
+        return self._last_seq
+
+    def _oldest_seq(self) -> int:
+        return max(1, self._last_seq - self.capacity + 1)
+
+    # ------------------ Subscribe ------------------
+    def resume_cursor(self, last_event_id) -> int:
+        """Cursorul de pornire: de la Last-Event-ID dacă e încă în buffer, altfel doar mesajele noi."""
+        with self._cond:
+            try:
+                last_id = int(last_event_id)
+            except (TypeError, ValueError):
+                return self._last_seq
+            if last_id > self._last_seq + self.capacity:
+                return self._last_seq  # id de la o instanță anterioară a serverului
+            if last_id > self._last_seq:
+                return last_id  # alt worker a trimis deja mesajele pe care acesta nu le-a citit încă
+            return max(last_id, self._oldest_seq() - 1)
+
+    def stream(self, cursor: int, first_frame: bytes = None):
+        """Generator de bytes SSE pentru un abonat, pornind după `cursor`."""
+        with self._cond:
+            self.subscribers += 1
+        try:
+            if first_frame:
+                yield first_frame
+            while True:
+                with self._cond:
+                    if self._last_seq <= cursor:
+                        self._cond.wait(self.heartbeat_s)
+                    last = self._last_seq
+                    if last <= cursor:
+                        frames = None
+                    else:
+                        if cursor < self._oldest_seq() - 1:
+                            if self.lag_policy == LAG_DISCONNECT:
+                                self.lag_disconnects += 1
+                                return
+                            self.lag_skips += 1
+                            cursor = last - 1
+                        frames = [f for f in (self._frames[s % self.capacity] for s in range(cursor + 1, last + 1)) if f]
+                        cursor = last
+                # yield în afara lock-ului: un client lent nu blochează publicarea
+                yield b"".join(frames) if frames else b": keep-alive\n\n"
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "subscribers": self.subscribers,
+                "last_seq": self._last_seq,
+                "buffered": min(self._last_seq, self.capacity),
+                "capacity": self.capacity,
+                "published": self.published,
+                "lag_policy": self.lag_policy,
+                "lag_skips": self.lag_skips,
+                "lag_disconnects": self.lag_disconnects,
+            }
+
+
+# ------------------ Delta Protocol ------------------
+class DeltaEncoder:
+    """Modul SSE delta (/stream?mode=delta) peste un BroadcastHub existent.
+
+    Mesajele publicate în hub-ul sursă sunt comasate: cel mult un eveniment `delta` per dispozitiv
+    la fiecare `tick_s`, cu doar câmpurile din snapshot schimbate față de ultimul eveniment trimis.
+    Un eveniment `keyframe` cu snapshot-ul complet vine la conectare și apoi la fiecare `keyframe_s`
+    (resincronizează clienții care au sărit peste mesaje). Predicțiile rămân evenimente `prediction`,
+    doar ultima din fiecare tick. Liniile brute merg doar în `raw_hub` (clienții cu ?raw=1).
+    Primul mesaj după o pauză mai lungă de un tick pleacă imediat, deci latența nu crește când
+    cadrele vin rar.
+    """
+
+    def __init__(self, source: BroadcastHub, hub_factory, tick_s: float = 0.1, keyframe_s: float = 10.0,
+                 seed: dict = None, max_lines: int = 300):
+        self.tick_s = tick_s
+        self.keyframe_s = keyframe_s
+        self.hub = hub_factory()
+        self.raw_hub = hub_factory()
+        self._cond = threading.Condition()
+        self._current = dict(seed or {})  # device_id (None pe canalul unui dispozitiv) -> ultimul snapshot
+        self._sent = {k: dict(v) for k, v in self._current.items()}
+        self._pending = {}
+        self._last_flush = 0.0
+        self._last_keyframe = time.monotonic()
+        self.max_lines = max_lines
+        self.messages_in = 0
+        self.deltas = 0
+        self.keyframes = 0
+        source.add_tap(self.offer)
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def offer(self, message: dict, event: str = None):
+        key = message.get("device_id")
+        with self._cond:
+            self.messages_in += 1
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = {"frames": 0, "lines": deque(maxlen=self.max_lines)}
+            if event == "prediction":
+                pending["prediction"] = message
+            elif event is None and "snapshot" in message:
+                self._current[key] = message["snapshot"]
+                pending["frames"] += 1
+                pending["lines"].extend(message.get("lines") or ())
+                if "dsp" in message:
+                    pending["dsp"] = message["dsp"]
+            else:
+                pending.setdefault("other", []).append((message, event))
+            now = time.monotonic()
+            if now - self._last_flush >= self.tick_s:
+                self._flush(now)
+            else:
+                self._cond.notify()
+
+    def _flush(self, now):
+        ts = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        raw = self.raw_hub.subscribers > 0
+        for key, pending in self._pending.items():
+            if pending["frames"]:
+                current, sent = self._current.get(key, {}), self._sent.setdefault(key, {})
+                changed = {k: v for k, v in current.items() if k not in sent or sent[k] != v}
+                sent.update(changed)
+                msg = {"ts": ts, "frames": pending["frames"], "changed": changed}
+                if key is not None:
+                    msg["device_id"] = key
+                if "dsp" in pending:
+                    msg["dsp"] = pending["dsp"]
+                self.hub.publish(msg, event="delta")
+                if raw:
+                    self.raw_hub.publish(dict(msg, lines=list(pending["lines"])), event="delta")
+                self.deltas += 1
+            if "prediction" in pending:
+                self.hub.publish(pending["prediction"], event="prediction")
+                if raw:
+                    self.raw_hub.publish(pending["prediction"], event="prediction")
+            for message, event in pending.get("other", ()):
+                self.hub.publish(message, event=event)
+                if raw:
+                    self.raw_hub.publish(message, event=event)
+        self._pending = {}
+        self._last_flush = now
+
+    def _keyframe_messages(self):
+        ts = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        messages = []
+        for key, snapshot in self._sent.items():
+            msg = {"ts": ts, "snapshot": dict(snapshot)}
+            if key is not None:
+                msg["device_id"] = key
+            messages.append(msg)
+        return messages or [{"ts": ts, "snapshot": {}}]
+
+    def _run(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self._pending and now >= self._last_flush + self.tick_s:
+                    self._flush(now)
+                if now >= self._last_keyframe + self.keyframe_s:
+                    if self.hub.subscribers or self.raw_hub.subscribers:
+                        self._flush(now)  # keyframe-ul include tot ce era în așteptare
+                        for msg in self._keyframe_messages():
+                            self.hub.publish(msg, event="keyframe")
+                            self.raw_hub.publish(msg, event="keyframe")
+                        self.keyframes += 1
+                    self._last_keyframe = now
+                due = self._last_keyframe + self.keyframe_s
+                if self._pending:
+                    due = min(due, self._last_flush + self.tick_s)
+                self._cond.wait(max(0.0, due - time.monotonic()))
+
+    def connect(self, raw: bool = False):
+        """(hub, cursor, primul cadru): keyframe-urile stării trimise + cursorul de la care urmează delta-urile."""
+        with self._cond:
+            hub = self.raw_hub if raw else self.hub
+            first = b"".join(sse_frame(msg, event="keyframe") for msg in self._keyframe_messages())
+            return hub, hub.last_seq, first
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "tick_s": self.tick_s,
+                "keyframe_s": self.keyframe_s,
+                "messages_in": self.messages_in,
+                "deltas": self.deltas,
+                "keyframes": self.keyframes,
+                "subscribers": self.hub.subscribers,
+                "raw_subscribers": self.raw_hub.subscribers,
+            }
+
+
+def gzip_stream(chunks, level: int = 6):
+    """Comprimă un flux SSE; Z_SYNC_FLUSH după fiecare bucată, ca evenimentele să nu rămână în buffer."""
+    z = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    try:
+        for chunk in chunks:
+            yield z.compress(chunk) + z.flush(zlib.Z_SYNC_FLUSH)
+    finally:
+        chunks.close()
+
+
+def sse_frame(message: dict, event: str = None) -> bytes:
+    """Un cadru SSE fără id (ex. salutul de conectare, care nu intră în buffer)."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(message)}\n\n".encode("utf-8")
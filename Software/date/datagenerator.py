@@ -1,180 +1,239 @@
+import os
+import time
+import argparse
+from collections import deque
+from multiprocessing import Pool
+
 import pandas as pd
 import numpy as np
 
-np.random.seed(42)
-N = 50000
+from features import derived_features
 
-# --- 1. ID-uri și demografice ---
-ids = np.arange(1, N+1)
-age = np.random.randint(20, 80, size=N)  # vârste între 20-80 ani
-sex = np.random.choice([0,1], size=N)    # 0=fem,1=masc
-smoker = np.array([np.random.choice([0,1], p=[0.7,0.3]) if a < 60 else np.random.choice([0,1], p=[0.6,0.4]) for a in age])
+DEFAULT_OUT = "airnalyzer_simulated_data_realistic_full_correlated.csv"
 
-# --- 2. Diagnostice ---
 diagnoses = ['Normal', 'Diabetes', 'Lung Infection', 'Asthma', 'Liver Dysfunction', 'COPD', 'Unclear']
 diagnosis_probs = [0.65, 0.10, 0.07, 0.05, 0.05, 0.05, 0.03]
-diagnosis = np.random.choice(diagnoses, size=N, p=diagnosis_probs)
-
-# --- 3. Variabile clinice și simptome corelate ---
-cough = np.zeros(N, dtype=int)
-fatigue = np.zeros(N, dtype=int)
-fever = np.zeros(N, dtype=int)
-shortness_of_breath = np.zeros(N, dtype=int)
-temp = np.zeros(N)
-humidity = np.zeros(N)
-hour_of_day = np.random.randint(0,24,size=N)
-
-acetone = np.zeros(N)
-ammonia = np.zeros(N)
-co = np.zeros(N)
-co2 = np.zeros(N)
-h2s = np.zeros(N)
-
-for i in range(N):
-    d = diagnosis[i]
-    a = age[i]
-    s = sex[i]
-    sm = smoker[i]
-    
-    # --- Temperatura și umiditatea ---
-    base_temp = 36.7 + np.random.normal(0,0.2)
-    base_hum = 30 + np.random.normal(0,5)
-    
-    # --- VOC-uri de bază ---
-    base_acetone = 0.3 + np.random.normal(0,0.05)
-    base_ammonia = 0.02 + np.random.normal(0,0.005)
-    base_co = 0.5 + np.random.normal(0,0.1)
-    base_co2 = 400 + np.random.normal(0,10)
-    base_h2s = 0.004 + np.random.normal(0,0.001)
-
-    # Setare valori în funcție de diagnostic (corelate cu simptomele)
-    if d == 'Normal':
-        temp[i] = base_temp
-        humidity[i] = base_hum
-        cough[i] = 0
-        fatigue[i] = np.random.choice([0,1], p=[0.9,0.1])
-        fever[i] = 0
-        shortness_of_breath[i] = 0
-        acetone[i] = base_acetone
-        ammonia[i] = base_ammonia
-        co[i] = base_co
-        co2[i] = base_co2
-        h2s[i] = base_h2s
-    elif d == 'Diabetes':
-        temp[i] = base_temp
-        humidity[i] = base_hum
-        cough[i] = 0
-        fatigue[i] = 1
-        fever[i] = 0
-        shortness_of_breath[i] = 0
-        acetone[i] = 1.5 + np.random.normal(0,0.1)
-        ammonia[i] = base_ammonia
-        co[i] = base_co
-        co2[i] = base_co2
-        h2s[i] = base_h2s
-    elif d == 'Lung Infection':
-        temp[i] = base_temp + np.random.uniform(0.5,2.0)
-        humidity[i] = base_hum + np.random.uniform(-5,5)
-        cough[i] = 1
-        fatigue[i] = 1
-        fever[i] = 1
-        shortness_of_breath[i] = np.random.choice([0,1], p=[0.3,0.7])
-        acetone[i] = base_acetone
-        ammonia[i] = 0.05 + np.random.normal(0,0.01)
-        co[i] = 2.0 + np.random.normal(0,0.3)
-        co2[i] = 450 + np.random.normal(0,15)
-        h2s[i] = base_h2s
-    elif d == 'Asthma':
-        temp[i] = base_temp
-        humidity[i] = base_hum + np.random.uniform(-5,5)
-        cough[i] = np.random.choice([0,1], p=[0.3,0.7])
-        fatigue[i] = np.random.choice([0,1], p=[0.6,0.4])
-        fever[i] = 0
-        shortness_of_breath[i] = 1
-        acetone[i] = base_acetone
-        ammonia[i] = base_ammonia
-        co[i] = 1.3 + np.random.normal(0,0.15)
-        co2[i] = 430 + np.random.normal(0,10)
-        h2s[i] = base_h2s
-    elif d == 'Liver Dysfunction':
-        temp[i] = base_temp
-        humidity[i] = base_hum
-        cough[i] = 0
-        fatigue[i] = 1
-        fever[i] = 0
-        shortness_of_breath[i] = 0
-        acetone[i] = base_acetone
-        ammonia[i] = 0.2 + np.random.normal(0,0.02)
-        co[i] = base_co
-        co2[i] = base_co2
-        h2s[i] = 0.015 + np.random.normal(0,0.004)
-    elif d == 'COPD':
-        temp[i] = base_temp + np.random.uniform(0,0.5)
-        humidity[i] = base_hum + np.random.uniform(-5,5)
-        cough[i] = 1
-        fatigue[i] = 1
-        fever[i] = 0
-        shortness_of_breath[i] = 1
-        acetone[i] = base_acetone
-        ammonia[i] = base_ammonia
-        co[i] = 1.8 + np.random.normal(0,0.2)
-        co2[i] = 440 + np.random.normal(0,12)
-        h2s[i] = base_h2s
-    else:  # Unclear
-        temp[i] = base_temp + np.random.uniform(0,1)
-        humidity[i] = base_hum + np.random.uniform(-5,5)
-        cough[i] = np.random.choice([0,1])
-        fatigue[i] = np.random.choice([0,1])
-        fever[i] = np.random.choice([0,1])
-        shortness_of_breath[i] = np.random.choice([0,1])
-        acetone[i] = base_acetone + np.random.uniform(0,0.2)
-        ammonia[i] = base_ammonia + np.random.uniform(0,0.05)
-        co[i] = base_co + np.random.uniform(0,0.5)
-        co2[i] = base_co2 + np.random.uniform(0,20)
-        h2s[i] = base_h2s + np.random.uniform(0,0.002)
-
-# --- Clip valori negative ---
-acetone = np.clip(acetone,0,None)
-ammonia = np.clip(ammonia,0,None)
-co = np.clip(co,0,None)
-co2 = np.clip(co2,350,None)
-h2s = np.clip(h2s,0,None)
-
-# --- Feature engineering ---
-eps = 1e-6
-acetone_ammonia_ratio = acetone / (ammonia + eps)
-co_co2_ratio = co / (co2 + eps)
-h2s_ammonia_ratio = h2s / (ammonia + eps)
-total_voc = acetone + ammonia + co + h2s
-mean_gases = (acetone + ammonia + co + co2 + h2s)/5
-std_gases = np.std(np.vstack([acetone, ammonia, co, co2, h2s]), axis=0)
-
-# --- Creează DataFrame ---
-df = pd.DataFrame({
-    "ID": ids,
-    "Age": age,
-    "Sex": sex,
-    "Smoker": smoker,
-    "Cough": cough,
-    "Fatigue": fatigue,
-    "Fever": fever,
-    "Shortness_of_breath": shortness_of_breath,
-    "Temperature": temp.round(1),
-    "Humidity": humidity.round(1),
-    "Acetone": acetone.round(3),
-    "Ammonia": ammonia.round(3),
-    "CO": co.round(3),
-    "CO2": co2.round(1),
-    "H2S": h2s.round(4),
-    "Acetone_Ammonia_Ratio": acetone_ammonia_ratio.round(3),
-    "CO_CO2_Ratio": co_co2_ratio.round(3),
-    "H2S_Ammonia_Ratio": h2s_ammonia_ratio.round(4),
-    "Total_VOC": total_voc.round(3),
-    "Mean_Gases": mean_gases.round(3),
-    "Std_Gases": std_gases.round(4),
-    "Hour_Of_Day": hour_of_day,
-    "Diagnosis": diagnosis
-})
-
-df.to_csv("airnalyzer_simulated_data_realistic_full_correlated.csv", index=False)
-print("File 'airnalyzer_simulated_data_realistic_full_correlated.csv' generated successfully!")
+
+
+# ------------------ Generare shard ------------------
+def generate_shard(n: int, rng: np.random.Generator, first_id: int = 1) -> pd.DataFrame:
+    """Generează n pacienți sintetici cu operații pe vectori întregi (fără buclă pe rânduri)."""
+    # --- 1. ID-uri și demografice ---
+    ids = np.arange(first_id, first_id + n)
+    age = rng.integers(20, 80, size=n)  # vârste între 20-80 ani
+    sex = rng.integers(0, 2, size=n)    # 0=fem,1=masc
+    smoker = (rng.random(n) < np.where(age < 60, 0.3, 0.4)).astype(int)
+
+    # --- 2. Diagnostice ---
+    diag_idx = rng.choice(len(diagnoses), size=n, p=diagnosis_probs)
+    diagnosis = np.asarray(diagnoses)[diag_idx]
+    hour_of_day = rng.integers(0, 24, size=n)
+
+    # --- 3. Valori de bază (temperatură, umiditate, VOC-uri) pentru toți pacienții ---
+    temp = 36.7 + rng.normal(0, 0.2, n)
+    humidity = 30 + rng.normal(0, 5, n)
+    acetone = 0.3 + rng.normal(0, 0.05, n)
+    ammonia = 0.02 + rng.normal(0, 0.005, n)
+    co = 0.5 + rng.normal(0, 0.1, n)
+    co2 = 400 + rng.normal(0, 10, n)
+    h2s = 0.004 + rng.normal(0, 0.001, n)
+
+    cough = np.zeros(n, dtype=int)
+    fatigue = np.zeros(n, dtype=int)
+    fever = np.zeros(n, dtype=int)
+    shortness_of_breath = np.zeros(n, dtype=int)
+
+    def bernoulli(m, p):
+        return (rng.random(m) < p).astype(int)
+
+    # --- 4. Ajustări pe grupe de diagnostic (corelate cu simptomele) ---
+    for k, d in enumerate(diagnoses):
+        idx = np.flatnonzero(diag_idx == k)
+        m = idx.size
+        if m == 0:
+            continue
+        if d == 'Normal':
+            fatigue[idx] = bernoulli(m, 0.1)
+        elif d == 'Diabetes':
+            fatigue[idx] = 1
+            acetone[idx] = 1.5 + rng.normal(0, 0.1, m)
+        elif d == 'Lung Infection':
+            temp[idx] += rng.uniform(0.5, 2.0, m)
+            humidity[idx] += rng.uniform(-5, 5, m)
+            cough[idx] = 1
+            fatigue[idx] = 1
+            fever[idx] = 1
+            shortness_of_breath[idx] = bernoulli(m, 0.7)
+            ammonia[idx] = 0.05 + rng.normal(0, 0.01, m)
+            co[idx] = 2.0 + rng.normal(0, 0.3, m)
+            co2[idx] = 450 + rng.normal(0, 15, m)
+        elif d == 'Asthma':
+            humidity[idx] += rng.uniform(-5, 5, m)
+            cough[idx] = bernoulli(m, 0.7)
+            fatigue[idx] = bernoulli(m, 0.4)
+            shortness_of_breath[idx] = 1
+            co[idx] = 1.3 + rng.normal(0, 0.15, m)
+            co2[idx] = 430 + rng.normal(0, 10, m)
+        elif d == 'Liver Dysfunction':
+            fatigue[idx] = 1
+            ammonia[idx] = 0.2 + rng.normal(0, 0.02, m)
+            h2s[idx] = 0.015 + rng.normal(0, 0.004, m)
+        elif d == 'COPD':
+            temp[idx] += rng.uniform(0, 0.5, m)
+            humidity[idx] += rng.uniform(-5, 5, m)
+            cough[idx] = 1
+            fatigue[idx] = 1
+            shortness_of_breath[idx] = 1
+            co[idx] = 1.8 + rng.normal(0, 0.2, m)
+            co2[idx] = 440 + rng.normal(0, 12, m)
+        else:  # Unclear
+            temp[idx] += rng.uniform(0, 1, m)
+            humidity[idx] += rng.uniform(-5, 5, m)
+            cough[idx] = rng.integers(0, 2, m)
+            fatigue[idx] = rng.integers(0, 2, m)
+            fever[idx] = rng.integers(0, 2, m)
+            shortness_of_breath[idx] = rng.integers(0, 2, m)
+            acetone[idx] += rng.uniform(0, 0.2, m)
+            ammonia[idx] += rng.uniform(0, 0.05, m)
+            co[idx] += rng.uniform(0, 0.5, m)
+            co2[idx] += rng.uniform(0, 20, m)
+            h2s[idx] += rng.uniform(0, 0.002, m)
+
+    # --- Clip valori negative ---
+    acetone = np.clip(acetone, 0, None)
+    ammonia = np.clip(ammonia, 0, None)
+    co = np.clip(co, 0, None)
+    co2 = np.clip(co2, 350, None)
+    h2s = np.clip(h2s, 0, None)
+
+    # --- Feature engineering ---
+    derived = derived_features(acetone, ammonia, co, co2, h2s)
+
+    # --- Creează DataFrame ---
+    return pd.DataFrame({
+        "ID": ids,
+        "Age": age,
+        "Sex": sex,
+        "Smoker": smoker,
+        "Cough": cough,
+        "Fatigue": fatigue,
+        "Fever": fever,
+        "Shortness_of_breath": shortness_of_breath,
+        "Temperature": temp.round(1),
+        "Humidity": humidity.round(1),
+        "Acetone": acetone.round(3),
+        "Ammonia": ammonia.round(3),
+        "CO": co.round(3),
+        "CO2": co2.round(1),
+        "H2S": h2s.round(4),
+        "Acetone_Ammonia_Ratio": derived["Acetone_Ammonia_Ratio"].round(3),
+        "CO_CO2_Ratio": derived["CO_CO2_Ratio"].round(3),
+        "H2S_Ammonia_Ratio": derived["H2S_Ammonia_Ratio"].round(4),
+        "Total_VOC": derived["Total_VOC"].round(3),
+        "Mean_Gases": derived["Mean_Gases"].round(3),
+        "Std_Gases": derived["Std_Gases"].round(4),
+        "Hour_Of_Day": hour_of_day,
+        "Diagnosis": diagnosis
+    })
+
+
+def _shard_task(task):
+    first_id, n, seed_seq = task
+    return generate_shard(n, np.random.default_rng(seed_seq), first_id)
+
+
+def plan_shards(n_rows: int, shard_size: int, seed: int):
+    """Împarte N în shard-uri cu seed-uri derivate determinist din seed-ul global.
+
+    Același (N, shard_size, seed) produce aceleași date indiferent de numărul de procese.
+    """
+    n_shards = max(1, -(-n_rows // shard_size))
+    seeds = np.random.SeedSequence(seed).spawn(n_shards)
+    tasks = []
+    for i, seed_seq in enumerate(seeds):
+        start = i * shard_size
+        tasks.append((start + 1, min(shard_size, n_rows - start), seed_seq))
+    return tasks
+
+
+# ------------------ Scriere incrementală ------------------
+class _CsvSink:
+    def __init__(self, path):
+        self.path = path
+        self.first = True
+
+    def write(self, df):
+        df.to_csv(self.path, mode="w" if self.first else "a", header=self.first, index=False)
+        self.first = False
+
+    def close(self):
+        pass
+
+
+class _ParquetSink:
+    def __init__(self, path):
+        import pyarrow.parquet as pq  # dependință opțională, doar pentru --format parquet
+        self.pq = pq
+        self.path = path
+        self.writer = None
+
+    def write(self, df):
+        import pyarrow as pa
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, table.schema, compression="snappy")
+        self.writer.write_table(table)  # un row group per shard
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def generate(n_rows: int, out_path: str, seed: int = 42, shard_size: int = 250_000,
+             workers: int = None, fmt: str = None):
+    """Generează shard-urile în paralel și le scrie în ordine, fără să țină tot setul în memorie."""
+    fmt = fmt or ("parquet" if out_path.endswith(".parquet") else "csv")
+    sink = _ParquetSink(out_path) if fmt == "parquet" else _CsvSink(out_path)
+    tasks = plan_shards(n_rows, shard_size, seed)
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+
+    try:
+        if workers <= 1:
+            for task in tasks:
+                sink.write(_shard_task(task))
+        else:
+            # Cel mult 2 * workers shard-uri în lucru sau așteptând scrierea: imap ar continua să
+            # genereze și ar ține în memorie tot ce sink-ul (CSV, mai lent) n-a apucat să scrie
+            with Pool(workers) as pool:
+                inflight = deque()
+                for task in tasks:
+                    inflight.append(pool.apply_async(_shard_task, (task,)))
+                    while len(inflight) >= 2 * workers:
+                        sink.write(inflight.popleft().get())
+                while inflight:
+                    sink.write(inflight.popleft().get())
+    finally:
+        sink.close()
+    return len(tasks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the synthetic Airnalyzer dataset.")
+    parser.add_argument("-n", "--rows", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--shard-size", type=int, default=250_000)
+    parser.add_argument("--workers", type=int, default=None, help="default: all cores")
+    parser.add_argument("--format", choices=["csv", "parquet"], default=None, help="default: from --out extension")
+    parser.add_argument("-o", "--out", default=DEFAULT_OUT)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    n_shards = generate(args.rows, args.out, seed=args.seed, shard_size=args.shard_size,
+                        workers=args.workers, fmt=args.format)
+    dt = time.perf_counter() - t0
+    print(f"File '{args.out}' generated successfully! "
+          f"({args.rows} rows, {n_shards} shards, {dt:.1f}s, {args.rows / dt:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+import json
+import bisect
+from collections import deque
+
+import numpy as np
+
+from features import SENSOR_KEYS
+
+# Procesare incrementală a semnalelor, între parser și sensor_data (câte o instanță per dispozitiv).
+# Pentru fiecare canal, la fiecare eșantion nou:
+#   - respingerea valorilor aberante: |x - mediana| > k * dispersie -> ieșirea folosește mediana
+#     (valoarea brută intră totuși în fereastră, deci o treaptă reală e acceptată după ~w/2 eșantioane);
+#   - medie și mediană pe fereastra glisantă (buffer circular NumPy prealocat, sumă actualizată în O(1),
+#     listă sortată cu căutare binară pentru mediană);
+#   - EWMA peste valorile acceptate;
+#   - linia de bază lentă (EWMA), actualizată doar între respirații; detectorul măsoară expirul față de ea;
+#   - compensarea derivei (opțională, per canal, oprită implicit): ieșirea e corectată cu un offset care
+#     urmărește diferența linie de bază - referință cu cel mult `drift_rate` (relativ) per eșantion, deci
+#     doar deriva lentă e scăzută; o schimbare reală de nivel (alt pacient, altă cameră) ajunge la model.
+# Detectorul de respirație urmărește un canal (CO2 implicit): început de expir, platou, sfârșit.
+# La sfârșitul expirului, media fiecărui canal pe durata platoului devine valoarea trimisă modelului,
+# cel mult `plateau_max_frames` cadre (sau până la schimbarea pacientului); apoi, fără un expir nou,
+# modelul primește din nou valorile filtrate.
+# Nimic nu se recalculează peste tot istoricul.
+
+MODES = ("off", "filtered", "plateau")
+
+DEFAULTS = {
+    "window": 9,             # eșantioane în fereastra glisantă (medie, mediană)
+    "ewma_alpha": 0.3,
+    "baseline_alpha": 0.02,  # cât de repede urmărește linia de bază deriva senzorului
+    "outlier_k": 4.0,
+    "outlier_floor": 0.01,   # dispersia minimă, relativ la |mediana|, ca să nu respingem zgomotul de cuantizare
+    "drift": False,          # compensarea derivei; se activează per canal: {"channels": {"CO2": {"drift": true}}}
+    "drift_rate": 1e-5,      # corecția maximă per eșantion, relativ la nivelul de referință
+    "channels": {},          # suprascrieri per canal: {"CO2": {"window": 5, "drift": true}, ...}
+    "plateau_max_frames": 600,  # cât rămâne valabilă media ultimului platou (~30 s la 20 Hz)
+    "breath": {
+        "channel": "CO2",
+        "start_delta": 300.0,     # ppm peste linia de bază: începe expirul
+        "end_delta": 150.0,       # sub atât peste linia de bază: expirul s-a terminat (histerezis)
+        "plateau_window": 5,      # eșantioane în care semnalul trebuie să fie stabil
+        "plateau_tolerance": 0.05,  # (max - min) / amplitudine pe fereastra de platou
+        "max_samples": 120,       # un expir mai lung e abandonat și linia de bază e resetată
+    },
+}
+
+
+def parse_dsp_config(value: str) -> dict:
+    """DSP_CONFIG (JSON) peste DEFAULTS; cheile necunoscute sunt o eroare de configurare."""
+    config = json.loads(json.dumps(DEFAULTS))
+    if not value:
+        return config
+    data = json.loads(value)
+    unknown = set(data) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown DSP_CONFIG keys: {sorted(unknown)}")
+    breath = data.pop("breath", {})
+    config.update(data)
+    config["breath"].update(breath)
+    return config
+
+
+# ------------------ Rolling Windows ------------------
+class RingBuffer:
+    """Buffer circular float64 de dimensiune fixă; push întoarce valoarea ieșită din fereastră."""
+
+    def __init__(self, size: int):
+        self.size = max(1, int(size))
+        self.data = np.zeros(self.size, dtype=np.float64)
+        self.count = 0
+        self._pos = 0
+
+    def push(self, x: float):
+        old = self.data[self._pos] if self.count == self.size else None
+        self.data[self._pos] = x
+        self._pos = (self._pos + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+        return old
+
+    def values(self) -> np.ndarray:
+        """Conținutul în ordine cronologică (copie; doar pentru depanare și rapoarte)."""
+        if self.count < self.size:
+            return self.data[:self.count].copy()
+        return np.roll(self.data, -self._pos)
+
+
+class RollingStats:
+    """Medie și mediană pe ultimele `window` valori.
+
+    Suma e actualizată în O(1) (și recalculată din buffer o dată la `window` eșantioane, ca eroarea
+    de rotunjire să nu se acumuleze); mediana vine dintr-o listă sortată: căutare O(log w),
+    inserarea/ștergerea sunt o mutare de memorie de cel mult w elemente.
+    """
+
+    def __init__(self, window: int):
+        self.buf = RingBuffer(window)
+        self._sorted = []
+        self._sum = 0.0
+        self._since_resync = 0
+
+    def push(self, x: float):
+        old = self.buf.push(x)
+        if old is not None:
+            del self._sorted[bisect.bisect_left(self._sorted, old)]
+            self._sum -= old
+        bisect.insort(self._sorted, x)
+        self._sum += x
+        self._since_resync += 1
+        if self._since_resync >= self.buf.size:
+            self._sum = float(self.buf.data[:self.buf.count].sum())
+            self._since_resync = 0
+
+    @property
+    def count(self) -> int:
+        return self.buf.count
+
+    def mean(self) -> float:
+        return self._sum / self.buf.count if self.buf.count else 0.0
+
+    def median(self) -> float:
+        n = len(self._sorted)
+        if not n:
+            return 0.0
+        mid = n // 2
+        return self._sorted[mid] if n % 2 else 0.5 * (self._sorted[mid - 1] + self._sorted[mid])
+
+
+class RollingRange:
+    """Minim și maxim pe fereastră cu cozi monotone (O(1) amortizat per eșantion)."""
+
+    def __init__(self, window: int):
+        self.window = max(1, int(window))
+        self._min = deque()
+        self._max = deque()
+        self._i = 0
+
+    def push(self, x: float):
+        i = self._i
+        self._i += 1
+        while self._min and self._min[-1][1] >= x:
+            self._min.pop()
+        while self._max and self._max[-1][1] <= x:
+            self._max.pop()
+        self._min.append((i, x))
+        self._max.append((i, x))
+        while self._min[0][0] <= i - self.window:
+            self._min.popleft()
+        while self._max[0][0] <= i - self.window:
+            self._max.popleft()
+
+    def reset(self):
+        self._min.clear()
+        self._max.clear()
+        self._i = 0
+
+    @property
+    def full(self) -> bool:
+        return self._i >= self.window
+
+    def span(self) -> float:
+        return self._max[0][1] - self._min[0][1] if self._min else 0.0
+
+
+# ------------------ Channel Filter ------------------
+class ChannelFilter:
+    """Lanțul de filtre pentru un canal; update() e O(log w) per eșantion."""
+
+    def __init__(self, window=9, ewma_alpha=0.3, baseline_alpha=0.02, outlier_k=4.0, outlier_floor=0.01,
+                 drift=False, drift_rate=1e-5):
+        self.stats = RollingStats(window)
+        self.ewma_alpha = float(ewma_alpha)
+        self.baseline_alpha = float(baseline_alpha)
+        self.outlier_k = float(outlier_k)
+        self.outlier_floor = float(outlier_floor)
+        self.drift = bool(drift)
+        self.drift_rate = float(drift_rate)
+        self.offset = 0.0      # deriva compensată până acum (doar cu drift=True)
+        self.min_samples = max(3, self.stats.buf.size // 2)
+        self.ewma = None
+        self.spread = 0.0      # EWMA a |x - mediana|, scara pentru respingere
+        self.baseline = None
+        self.reference = None  # linia de bază la sfârșitul încălzirii; deriva se măsoară față de ea
+        self.raw = None
+        self.accepted = None
+        self.samples = 0
+        self.rejected = 0
+
+    def update(self, x: float, track_baseline: bool = True) -> float:
+        """Adaugă un eșantion și întoarce valoarea filtrată (și compensată pentru derivă)."""
+        x = float(x)
+        self.raw = x
+        self.samples += 1
+        value = x
+        if self.stats.count >= self.min_samples:
+            med = self.stats.median()
+            dev = abs(x - med)
+            scale = max(self.spread, self.outlier_floor * abs(med), 1e-9)
+            if dev > self.outlier_k * scale:
+                value = med
+                self.rejected += 1
+            # Scara nu crește cu mai mult de k * scale dintr-un singur eșantion aberant
+            self.spread += self.ewma_alpha * (min(dev, self.outlier_k * scale) - self.spread)
+        self.stats.push(x)
+        self.accepted = value
+
+        self.ewma = value if self.ewma is None else self.ewma + self.ewma_alpha * (value - self.ewma)
+        if self.baseline is None:
+            self.baseline = self.ewma
+        elif track_baseline:
+            self.baseline += self.baseline_alpha * (self.ewma - self.baseline)
+            if self.drift and self.reference is not None:
+                step = self.drift_rate * max(abs(self.reference), 1e-9)
+                target = self.baseline - self.reference
+                self.offset += min(max(target - self.offset, -step), step)
+        if self.reference is None and self.samples >= self.stats.buf.size:
+            self.reference = self.baseline
+        return self.filtered()
+
+    def filtered(self) -> float:
+        if self.ewma is None:
+            return 0.0
+        return self.ewma - self.offset
+
+    def reset_baseline(self):
+        """După o schimbare persistentă de nivel (expir abandonat), linia de bază pornește de la nivelul curent."""
+        if self.ewma is not None:
+            self.baseline = self.ewma
+            if self.reference is not None:
+                self.reference = self.ewma - self.offset
+
+    def state(self) -> dict:
+        return {
+            "raw": self.raw,
+            "filtered": self.filtered(),
+            "mean": self.stats.mean(),
+            "median": self.stats.median(),
+            "ewma": self.ewma,
+            "baseline": self.baseline,
+            "drift": self.offset,
+            "rejected": self.rejected,
+        }
+
+
+# ------------------ Breath Detection ------------------
+IDLE, EXHALE, PLATEAU = "idle", "exhale", "plateau"
+
+
+class BreathDetector:
+    """Mașină de stări pe canalul de referință: idle -> exhale -> plateau -> idle.
+
+    Evenimente: exhale_start, plateau_start, exhale_end (cu valorile de platou) și exhale_abort
+    (expirul n-a ajuns la platou sau a depășit `max_samples`). Se mediază doar eșantioanele din
+    platou; coborârea de la sfârșitul expirului nu intră în medie.
+    """
+
+    def __init__(self, channel="CO2", start_delta=300.0, end_delta=150.0, plateau_window=5,
+                 plateau_tolerance=0.05, max_samples=120):
+        self.channel = channel
+        self.start_delta = float(start_delta)
+        self.end_delta = float(end_delta)
+        self.plateau_tolerance = float(plateau_tolerance)
+        self.max_samples = int(max_samples)
+        self.range = RollingRange(plateau_window)
+        self.state = IDLE
+        self.samples = 0
+        self._sums = {}
+        self._n = 0
+        self.last_plateau = None
+        self.breaths = 0
+        self.aborted = 0
+
+    def update(self, level: float, baseline: float, values: dict):
+        """`level` e valoarea filtrată a canalului de referință; întoarce evenimentul sau None."""
+        excess = level - baseline
+        if self.state == IDLE:
+            if excess > self.start_delta:
+                self.state, self.samples = EXHALE, 0
+                self.range.reset()
+                self._sums, self._n = {}, 0
+                return "exhale_start"
+            return None
+
+        self.samples += 1
+        self.range.push(level)
+        if excess < self.end_delta:
+            self.state = IDLE
+            if self._n:
+                self.last_plateau = {k: s / self._n for k, s in self._sums.items()}
+                self.last_plateau["samples"] = self._n
+                self.breaths += 1
+                return "exhale_end"
+            self.aborted += 1
+            return "exhale_abort"
+        if self.samples > self.max_samples:
+            self.state = IDLE
+            self.aborted += 1
+            return "exhale_abort"
+
+        stable = self.range.span() <= self.plateau_tolerance * max(excess, self.start_delta)
+        if self.state == EXHALE:
+            if self.range.full and stable and not self._n:
+                self.state = PLATEAU
+                self._accumulate(values)
+                return "plateau_start"
+        elif stable:
+            self._accumulate(values)
+        else:
+            # Semnalul a ieșit din bandă (începe coborârea): media platoului e fixată
+            self.state = EXHALE
+        return None
+
+    def _accumulate(self, values: dict):
+        for k, v in values.items():
+            self._sums[k] = self._sums.get(k, 0.0) + v
+        self._n += 1
+
+
+# ------------------ Signal Processor ------------------
+class SignalProcessor:
+    """Filtrele tuturor canalelor + detectorul de respirație pentru un dispozitiv.
+
+    mode="filtered": sensor_data primește valorile filtrate;
+    mode="plateau": după un expir complet, sensor_data păstrează media platoului până la următorul
+    expir, dar cel mult `plateau_max_frames` cadre; înainte de primul expir, după expirare sau după
+    reset_plateau() (pacient nou), valorile filtrate.
+    """
+
+    def __init__(self, config: dict = None, mode: str = "plateau", keys=SENSOR_KEYS):
+        if mode not in MODES or mode == "off":
+            raise ValueError(f"Unknown DSP mode: {mode}")
+        config = config or parse_dsp_config("")
+        self.mode = mode
+        self.filters = {}
+        for k in keys:
+            opts = {name: config[name] for name in ("window", "ewma_alpha", "baseline_alpha",
+                                                     "outlier_k", "outlier_floor", "drift", "drift_rate")}
+            opts.update(config["channels"].get(k, {}))
+            self.filters[k] = ChannelFilter(**opts)
+        breath = dict(config["breath"])
+        self.detector = BreathDetector(**breath) if breath.get("channel") in self.filters else None
+        self.plateau_max_frames = int(config["plateau_max_frames"])
+        self.plateau_age = None  # cadre de la ultimul exhale_end; None = niciun platou valabil
+        self.last_event = None
+
+    def reset_plateau(self):
+        """Platoul anterior nu mai e folosit (alt pacient); următoarele valori sunt cele filtrate."""
+        self.plateau_age = None
+
+    def process(self, sensors: dict) -> dict:
+        """Un cadru: actualizează canalele prezente; întoarce valorile pentru sensor_data + starea DSP."""
+        d = self.detector
+        track = d is None or d.state == IDLE
+        filtered = {k: f.update(sensors[k], track) for k, f in self.filters.items() if k in sensors}
+        event = None
+        if d is not None and d.channel in filtered:
+            ref = self.filters[d.channel]
+            event = d.update(ref.ewma, ref.baseline, {k: f.filtered() for k, f in self.filters.items()
+                                                      if f.ewma is not None})
+            if event == "exhale_abort" and d.samples > d.max_samples:
+                for f in self.filters.values():
+                    f.reset_baseline()
+            if event == "exhale_end":
+                self.plateau_age = 0
+            elif self.plateau_age is not None:
+                self.plateau_age += 1
+                if self.plateau_age > self.plateau_max_frames:
+                    self.plateau_age = None
+                    event = "plateau_expired"
+            if event:
+                self.last_event = event
+
+        plateau = d.last_plateau if d is not None and self.plateau_age is not None else None
+        values = dict(filtered)
+        if self.mode == "plateau" and plateau is not None:
+            values = {k: plateau.get(k, v) for k, v in filtered.items()}
+        return {
+            "values": values,
+            "filtered": filtered,
+            "breath": None if d is None else {"state": d.state, "event": event, "plateau": plateau},
+        }
+
+    def stats(self) -> dict:
+        d = self.detector
+        return {
+            "mode": self.mode,
+            "rejected": {k: f.rejected for k, f in self.filters.items() if f.rejected},
+            "breath_state": d.state if d else None,
+            "breaths": d.breaths if d else 0,
+            "aborted": d.aborted if d else 0,
+            "last_event": self.last_event,
+            "last_plateau": d.last_plateau if d else None,
+            "plateau_age": self.plateau_age,
+        }
+
+
+# ------------------ Self-check ------------------
+STEP_BEFORE = {"Temperature": 36.0, "Humidity": 45.0, "Acetone": 1.0, "Ammonia": 0.5, "CO": 2.0,
+               "CO2": 400.0, "H2S": 0.05}
+STEP_AFTER = dict(STEP_BEFORE, Temperature=38.0, Acetone=3.0)
+
+
+def check_step_response(config: dict = None, warmup=100, frames=400, tol=0.02) -> dict:
+    """O treaptă persistentă (Acetone 1 -> 3, Temperature 36 -> 38) trebuie să ajungă în `values`.
+
+    Întoarce {canal: (așteptat, obținut)} pentru canalele care nu s-au apropiat de noul nivel.
+    """
+    failures = {}
+    for mode in ("filtered", "plateau"):
+        proc = SignalProcessor(config, mode=mode)
+        for _ in range(warmup):
+            proc.process(STEP_BEFORE)
+        for _ in range(frames):
+            out = proc.process(STEP_AFTER)
+        for k in ("Acetone", "Temperature"):
+            got = out["values"][k]
+            if abs(got - STEP_AFTER[k]) > tol * abs(STEP_AFTER[k]):
+                failures[f"{mode}:{k}"] = (STEP_AFTER[k], round(got, 4))
+    return failures
+
+
+def check_plateau_expiry(config: dict = None, breath_acetone=5.0, after=0.2) -> dict:
+    """După un expir cu Acetone = 5, fără alt expir, `values` trebuie să revină la nivelul filtrat (0.2)
+    după `plateau_max_frames` cadre, și imediat după reset_plateau()."""
+    config = config or parse_dsp_config("")
+    failures = {}
+    for reset in (False, True):
+        proc = SignalProcessor(config, mode="plateau")
+        for i in range(100):
+            breath = 20 <= i < 60
+            proc.process(dict(STEP_BEFORE, CO2=2400.0 if breath else 400.0, Acetone=breath_acetone if breath else 1.0))
+        if reset:
+            proc.reset_plateau()
+        frames = 20 if reset else config["plateau_max_frames"] + 50
+        for _ in range(frames):
+            out = proc.process(dict(STEP_BEFORE, Acetone=after))
+        got = out["values"]["Acetone"]
+        if abs(got - after) > 0.05 * breath_acetone:
+            failures["reset" if reset else "expiry"] = (after, round(got, 4))
+    return failures
+
+
+def main():
+    import sys
+    import argparse
+
+    ap = argparse.ArgumentParser(description="DSP self-check: a sustained level change must reach sensor_data "
+                                             "and a stale breath plateau must expire.")
+    ap.add_argument("--config", default="", help="DSP_CONFIG JSON to check (default: DEFAULTS)")
+    ap.add_argument("--drift-all", action="store_true", help="also check with drift compensation on every channel")
+    args = ap.parse_args()
+
+    configs = {"config": parse_dsp_config(args.config)}
+    if args.drift_all:
+        configs["drift-all"] = dict(configs["config"], drift=True)
+    ok = True
+    for name, config in configs.items():
+        failures = dict(check_step_response(config), **check_plateau_expiry(config))
+        print(f"[DSP] {name}: " + ("OK" if not failures else f"FAILED {failures}"))
+        ok = ok and not failures
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
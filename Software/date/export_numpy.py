@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import joblib
+
+from features import FEATURE_COLUMNS
+from numpy_model import NumpyMLP, fold_keras_model, save_npz
+from model_bundles import manifest_path, read_manifest, write_manifest
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Eșantion mic, versionat (datagenerator.py -n 2000 --seed 7), pentru verificări fără setul complet
+SAMPLE_CSV = os.path.join(BASE_DIR, "airnalyzer_sample_2k.csv")
+
+
+def export(model, scaler, out_path):
+    """Împăturește scaler-ul și BatchNorm-urile în Dense și scrie artefactul .npz."""
+    layers = fold_keras_model(model, scaler)
+    save_npz(out_path, layers, FEATURE_COLUMNS)
+    return NumpyMLP.load(out_path)
+
+
+def check_parity(model, scaler, np_model, csv_path, tol=1e-4, limit=None):
+    """Compară probabilitățile Keras cu cele NumPy pe un set generat. Întoarce True dacă sunt în toleranță."""
+    import pandas as pd
+
+    df = pd.read_csv(csv_path, nrows=limit)
+    X = df[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+
+    t0 = time.perf_counter()
+    keras_probs = np.asarray(model.predict(scaler.transform(X), batch_size=4096, verbose=0))
+    t1 = time.perf_counter()
+    numpy_probs = np_model.predict(X)
+    t2 = time.perf_counter()
+
+    max_diff = float(np.max(np.abs(keras_probs - numpy_probs)))
+    agreement = float(np.mean(keras_probs.argmax(axis=1) == numpy_probs.argmax(axis=1)))
+    print(f"[Parity] rows={len(X)} max|Δp|={max_diff:.2e} argmax agreement={agreement:.6f}")
+    print(f"[Parity] keras {1e6 * (t1 - t0) / len(X):.2f} us/row, numpy {1e6 * (t2 - t1) / len(X):.2f} us/row")
+    return max_diff <= tol
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the Keras model + scaler to a pure-NumPy .npz artifact.")
+    parser.add_argument("--model", default=os.path.join(BASE_DIR, "airnalyzer_best_model.keras"))
+    parser.add_argument("--scaler", default=os.path.join(BASE_DIR, "scaler.save"))
+    parser.add_argument("--out", default=os.path.join(BASE_DIR, "airnalyzer_model.npz"))
+    parser.add_argument("--check", metavar="CSV", nargs="?",
+                        const=SAMPLE_CSV,
+                        help="verify Keras/NumPy parity on a generated CSV (default: the committed 2k-row sample)")
+    parser.add_argument("--tol", type=float, default=1e-4, help="max allowed probability difference")
+    parser.add_argument("--limit", type=int, default=None, help="only check the first N rows")
+    args = parser.parse_args()
+
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(args.model)
+    scaler = joblib.load(args.scaler)
+    np_model = export(model, scaler, args.out)
+    print(f"NumPy model written to {args.out} ({os.path.getsize(args.out) / 1024:.1f} KB)")
+    # Etichetele vin din bundle-ul modelului Keras (scris de train_model.py)
+    classes = read_manifest(manifest_path(args.model))["classes"]
+    write_manifest(manifest_path(args.out), "numpy", "numpy", os.path.basename(args.out), FEATURE_COLUMNS, classes)
+
+    if args.check:
+        if not check_parity(model, scaler, np_model, args.check, tol=args.tol, limit=args.limit):
+            print("[Parity] FAILED: NumPy backend differs from Keras beyond tolerance")
+            sys.exit(1)
+        print("[Parity] OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import argparse
+
+import numpy as np
+import joblib
+
+from features import FEATURE_COLUMNS, add_derived_features
+from model_bundles import load_bundle, manifest_path, write_manifest
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+VARIANTS = ("float32", "float16", "int8")
+
+# Export TFLite în trei variante, cu raport de acuratețe și latență pentru fiecare:
+#   float32 - conversie directă;
+#   float16 - greutăți în float16 (fișier ~1/2), calculul rămâne float32;
+#   int8    - greutăți și activări int8, calibrate pe un set reprezentativ din datele de antrenare.
+# Intrarea/ieșirea rămân float32 în toate variantele, deci backend-ul le tratează la fel.
+
+
+# ------------------ Data ------------------
+def load_split(csv_path, limit=None, test_size=0.2, seed=42):
+    """Același split stratificat ca train_model.load_in_memory; întoarce features brute."""
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import LabelEncoder
+
+    df = add_derived_features(pd.read_csv(csv_path, nrows=limit))
+    X = df[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+    le = LabelEncoder()
+    y = le.fit_transform(df["Diagnosis"])
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=seed, stratify=y)
+    return X_train, X_test, y_train, y_test, le.classes_
+
+
+def representative_rows(X_train_scaled, n=500, seed=42):
+    """Eșantion aleator din setul de antrenare (scalat) pentru calibrarea int8."""
+    rng = np.random.default_rng(seed)
+    idx = rng.choice(len(X_train_scaled), size=min(n, len(X_train_scaled)), replace=False)
+    return np.asarray(X_train_scaled[idx], dtype=np.float32)
+
+
+# ------------------ Conversion ------------------
+def convert(model, variant, representative=None) -> bytes:
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if variant == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == "int8":
+        if representative is None:
+            raise ValueError("int8 export needs a representative dataset")
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = lambda: ([row[None, :]] for row in representative)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    elif variant != "float32":
+        raise ValueError(f"Unknown TFLite variant: {variant}")
+    return converter.convert()
+
+
+def variant_path(out_dir, variant):
+    return os.path.join(out_dir, f"airnalyzer_model_{variant}.tflite")
+
+
+# ------------------ Report ------------------
+def _latency_us(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    t = np.asarray(times) * 1e6
+    return {"p50": round(float(np.percentile(t, 50)), 2), "p99": round(float(np.percentile(t, 99)), 2)}
+
+
+def evaluate(predict, X_test, y_test, classes, reference=None, batch_rows=1024, repeat=200):
+    """Acuratețe (classification_report ca în train_model) + latență pe un rând și pe lot."""
+    from sklearn.metrics import classification_report
+
+    probs = predict(X_test)
+    y_pred = probs.argmax(axis=1)
+    result = {
+        "accuracy": round(float(np.mean(y_pred == y_test)), 6),
+        "report": classification_report(y_test, y_pred, target_names=classes, output_dict=True, zero_division=0),
+        "report_text": classification_report(y_test, y_pred, target_names=classes, zero_division=0),
+    }
+    if reference is not None:
+        result["max_abs_diff"] = float(np.max(np.abs(probs - reference)))
+        result["argmax_agreement"] = round(float(np.mean(y_pred == reference.argmax(axis=1))), 6)
+
+    row = X_test[:1]
+    batch = X_test[:batch_rows]
+    predict(row)  # încălzire
+    result["single_row_us"] = _latency_us(lambda: predict(row), repeat)
+    per_batch = _latency_us(lambda: predict(batch), max(5, repeat // 20))
+    result["batch_rows"] = len(batch)
+    result["batch_us_per_row"] = round(per_batch["p50"] / len(batch), 3)
+    return result, probs
+
+
+def export_all(model, scaler, representative, X_test, y_test, classes, out_dir, variants=VARIANTS, num_threads=None):
+    """Scrie fiecare variantă (.tflite + .bundle.json) și întoarce raportul comparativ.
+
+    `representative` e eșantionul scalat pentru int8; X_test are features brute.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    X_test = np.asarray(X_test, dtype=np.float32)
+    ref_probs = np.asarray(model.predict(scaler.transform(X_test), batch_size=4096, verbose=0))
+    keras_result, _ = evaluate(lambda X: np.asarray(model(scaler.transform(X).astype(np.float32), training=False)),
+                               X_test, y_test, classes, repeat=50)
+    report = {"rows_test": int(len(X_test)), "variants": {"keras": keras_result}}
+    print(f"[TFLite] keras: accuracy {keras_result['accuracy']:.4f}")
+
+    for variant in variants:
+        path = variant_path(out_dir, variant)
+        with open(path, "wb") as f:
+            f.write(convert(model, variant, representative))
+        bundle = manifest_path(path)
+        write_manifest(bundle, f"tflite-{variant}", "tflite", os.path.basename(path), FEATURE_COLUMNS, classes,
+                       scaler, options={"variant": variant, "num_threads": num_threads})
+        result, _ = evaluate(load_bundle(bundle).predict, X_test, y_test, classes, reference=ref_probs)
+        result["path"] = os.path.basename(path)
+        result["size_kb"] = round(os.path.getsize(path) / 1024, 1)
+        report["variants"][variant] = result
+        print(f"[TFLite] {variant}: {result['size_kb']} KB, accuracy {result['accuracy']:.4f} "
+              f"(agreement {result['argmax_agreement']:.4f}), single row p50 {result['single_row_us']['p50']} us, "
+              f"batch {result['batch_us_per_row']} us/row")
+    return report
+
+
+def write_report(report, path):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, default=float)
+
+
+def print_report(report):
+    for name, r in report["variants"].items():
+        print(f"\nClassification Report ({name}):")
+        print(r["report_text"])
+    print(f"{'variant':<10}{'size KB':>10}{'accuracy':>10}{'Δacc':>9}{'row p50 us':>12}{'row p99 us':>12}{'batch us/row':>14}")
+    base = report["variants"]["keras"]["accuracy"]
+    for name, r in report["variants"].items():
+        print(f"{name:<10}{r.get('size_kb', float('nan')):>10}{r['accuracy']:>10.4f}{r['accuracy'] - base:>+9.4f}"
+              f"{r['single_row_us']['p50']:>12}{r['single_row_us']['p99']:>12}{r['batch_us_per_row']:>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the Keras model to TFLite (float32/float16/int8) with an accuracy/latency report.")
+    parser.add_argument("--model", default=os.path.join(BASE_DIR, "airnalyzer_best_model.keras"))
+    parser.add_argument("--scaler", default=os.path.join(BASE_DIR, "scaler.save"))
+    parser.add_argument("--data", default=os.path.join(BASE_DIR, "airnalyzer_simulated_data_realistic_full_correlated.csv"),
+                        help="dataset for the representative sample and the test report")
+    parser.add_argument("--out-dir", default=BASE_DIR)
+    parser.add_argument("--variants", default=",".join(VARIANTS), help="comma-separated subset of float32,float16,int8")
+    parser.add_argument("--representative", type=int, default=500, help="training rows used to calibrate int8")
+    parser.add_argument("--limit", type=int, default=None, help="only read the first N dataset rows")
+    parser.add_argument("--threads", type=int, default=None, help="interpreter threads for the latency report")
+    parser.add_argument("--report", default=None, help="JSON report path (default: <out-dir>/tflite_report.json)")
+    args = parser.parse_args()
+
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(args.model)
+    scaler = joblib.load(args.scaler)
+    X_train, X_test, _, y_test, classes = load_split(args.data, args.limit)
+    variants = [v.strip() for v in args.variants.split(",") if v.strip()]
+    representative = representative_rows(scaler.transform(X_train), args.representative)
+    report = export_all(model, scaler, representative, X_test, y_test, classes, args.out_dir, variants, args.threads)
+    print_report(report)
+
+    report_path = args.report or os.path.join(args.out_dir, "tflite_report.json")
+    write_report(report, report_path)
+    print(f"\nReport written to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
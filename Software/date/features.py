@@ -0,0 +1,103 @@
+import numpy as np
+
+# Feature engineering comun pentru datagenerator.py, train_model.py și appserver.py.
+# Toate funcțiile lucrează pe vectori întregi (un rând = un pacient), deci același cod
+# servește și o singură predicție, și un lot de mii de înregistrări.
+
+EPS = 1e-6
+
+SENSOR_KEYS = ['Temperature', 'Humidity', 'Acetone', 'Ammonia', 'CO', 'CO2', 'H2S']
+GAS_KEYS = ['Acetone', 'Ammonia', 'CO', 'CO2', 'H2S']
+SYMPTOM_KEYS = ['Cough', 'Fatigue', 'Fever', 'Shortness_of_breath']
+DERIVED_KEYS = [
+    "Acetone_Ammonia_Ratio", "CO_CO2_Ratio", "H2S_Ammonia_Ratio",
+    "Total_VOC", "Mean_Gases", "Std_Gases",
+]
+
+# Ordinea exactă a coloanelor cu care a fost antrenat modelul
+FEATURE_COLUMNS = [
+    "Age", "Sex", "Smoker",
+    "Cough", "Fatigue", "Fever", "Shortness_of_breath",
+    "Temperature", "Humidity",
+    "Acetone", "Ammonia", "CO", "CO2", "H2S",
+    "Acetone_Ammonia_Ratio", "CO_CO2_Ratio", "H2S_Ammonia_Ratio",
+    "Total_VOC", "Mean_Gases", "Std_Gases",
+    "Hour_Of_Day"
+]
+RAW_COLUMNS = [c for c in FEATURE_COLUMNS if c not in DERIVED_KEYS]
+
+# Valori implicite pentru câmpurile pacientului lipsă din cerere (ca în /predict)
+PATIENT_DEFAULTS = {'Age': 0.0, 'Sex': 0.0, 'Smoker': 0.0, 'Hour_Of_Day': 12.0}
+
+
+# ------------------ Derived features ------------------
+def derived_features(acetone, ammonia, co, co2, h2s) -> dict:
+    """Rapoarte și statistici peste gaze, pe vectori (float64)."""
+    acetone, ammonia, co, co2, h2s = (np.asarray(v, dtype=np.float64) for v in (acetone, ammonia, co, co2, h2s))
+    gases = np.stack([acetone, ammonia, co, co2, h2s])
+    return {
+        "Acetone_Ammonia_Ratio": acetone / (ammonia + EPS),
+        "CO_CO2_Ratio": co / (co2 + EPS),
+        "H2S_Ammonia_Ratio": h2s / (ammonia + EPS),
+        "Total_VOC": acetone + ammonia + co + h2s,
+        "Mean_Gases": gases.mean(axis=0),
+        "Std_Gases": gases.std(axis=0),
+    }
+
+
+def add_derived_features(df):
+    """Recalculează coloanele derivate dintr-un DataFrame (sau dict de coloane) cu valorile brute."""
+    for k, v in derived_features(*(df[c] for c in GAS_KEYS)).items():
+        df[k] = v
+    return df
+
+
+def build_feature_matrix(columns) -> np.ndarray:
+    """Matrice (N, 21) float32 în ordinea FEATURE_COLUMNS; derivatele sunt mereu recalculate."""
+    cols = dict(columns)
+    cols.update(derived_features(*(cols[c] for c in GAS_KEYS)))
+    n = len(np.atleast_1d(cols[FEATURE_COLUMNS[0]]))
+    X = np.empty((n, len(FEATURE_COLUMNS)), dtype=np.float32)
+    for j, c in enumerate(FEATURE_COLUMNS):
+        X[:, j] = cols[c]
+    return X
+
+
+# ------------------ Records (JSON) ------------------
+def _to_float(v):
+    return np.nan if v is None else float(v)
+
+
+def patient_columns(records) -> dict:
+    """Coloanele pacientului din înregistrări JSON; simptomele devin 0/1 după valoarea de adevăr."""
+    cols = {k: np.array([_to_float(r.get(k, d)) for r in records], dtype=np.float64)
+            for k, d in PATIENT_DEFAULTS.items()}
+    for k in SYMPTOM_KEYS:
+        cols[k] = np.array([1.0 if r.get(k, False) else 0.0 for r in records], dtype=np.float64)
+    return cols
+
+
+def patient_key(record) -> tuple:
+    """Cheie hashable pentru o cerere /predict: câmpurile pacientului normalizate ca în
+    patient_columns, plus senzorii trimiși explicit în cerere (care îi înlocuiesc pe cei live)."""
+    key = tuple(_to_float(record.get(k, d)) for k, d in PATIENT_DEFAULTS.items())
+    key += tuple(1.0 if record.get(k, False) else 0.0 for k in SYMPTOM_KEYS)
+    return key + tuple((k, _to_float(record[k])) for k in SENSOR_KEYS if k in record)
+
+
+def sensor_columns(records, fallback=None) -> dict:
+    """Valorile senzorilor per înregistrare; cheile lipsă se iau din `fallback` (ex. senzorii live)."""
+    fallback = fallback or {}
+    return {k: np.array([_to_float(r.get(k, fallback.get(k))) for r in records], dtype=np.float64)
+            for k in SENSOR_KEYS}
+
+
+def invalid_sensor_mask(sensors: dict) -> np.ndarray:
+    """True pe rândurile care au cel puțin un senzor NaN/inf/lipsă."""
+    return ~np.all(np.isfinite(np.column_stack([sensors[k] for k in SENSOR_KEYS])), axis=1)
+
+
+def records_to_matrix(records, fallback_sensors=None) -> np.ndarray:
+    cols = patient_columns(records)
+    cols.update(sensor_columns(records, fallback_sensors))
+    return build_feature_matrix(cols)
@@ -0,0 +1,171 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from metrics import stage
+
+_QUEUE_WAIT = stage("queue_wait")
+
+
+# ------------------ Helpers ------------------
+def _percentile(samples, q):
+    if not samples:
+        return 0.0
+    return float(np.percentile(np.fromiter(samples, dtype=np.float64), q))
+
+
+class _Pending:
+    """O cerere din coadă: rândurile de intrare și locul unde vine rezultatul."""
+    __slots__ = ("rows", "enqueued_at", "done", "result", "error")
+
+    def __init__(self, rows: np.ndarray):
+        self.rows = rows
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# ------------------ Micro-batching Engine ------------------
+class BatchInferenceEngine:
+    """Adună cererile de predicție într-o fereastră scurtă și le rulează într-un singur forward pass.
+
+    `predict_fn` primește o matrice (N, n_features) float32 nescalată și întoarce
+    probabilitățile (N, n_classes). Fiecare apelant primește înapoi doar rândurile lui.
+    """
+
+    def __init__(self, predict_fn, max_batch: int = 64, window_ms: float = 5.0, stats_window: int = 2048):
+        self.predict_fn = predict_fn
+        self.max_batch = max(1, int(max_batch))
+        self.window_s = max(0.0, float(window_ms)) / 1000.0
+
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._rows = 0
+        self._requests = 0
+        self._errors = 0
+        self._batch_sizes = deque(maxlen=stats_window)
+        self._wait_ms = deque(maxlen=stats_window)
+        self._forward_ms = deque(maxlen=stats_window)
+
+    def start(self):
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name="inference-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, rows, timeout: float = None) -> np.ndarray:
+        """Pune rândurile în coadă și așteaptă probabilitățile corespunzătoare."""
+        rows = np.asarray(rows, dtype=np.float32)
+        if rows.ndim == 1:
+            rows = rows[None, :]
+        self.start()
+
+        item = _Pending(rows)
+        with self._cond:
+            self._pending.append(item)
+            self._cond.notify()
+
+        if not item.done.wait(timeout):
+            raise TimeoutError("Inference request timed out")
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    # ------------------ Worker ------------------
+    def _take_batch(self):
+        """Așteaptă prima cerere, apoi fereastra sau umplerea lotului; întoarce cererile luate."""
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+
+            deadline = self._pending[0].enqueued_at + self.window_s
+            while True:
+                queued_rows = sum(len(p.rows) for p in self._pending)
+                remaining = deadline - time.perf_counter()
+                if queued_rows >= self.max_batch or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = [self._pending.popleft()]
+            n_rows = len(batch[0].rows)
+            while self._pending and n_rows + len(self._pending[0].rows) <= self.max_batch:
+                item = self._pending.popleft()
+                batch.append(item)
+                n_rows += len(item.rows)
+            return batch
+
+    def _worker(self):
+        while True:
+            batch = self._take_batch()
+            started = time.perf_counter()
+            try:
+                X = batch[0].rows if len(batch) == 1 else np.concatenate([p.rows for p in batch], axis=0)
+                probs = np.asarray(self.predict_fn(X))
+                offset = 0
+                for p in batch:
+                    n = len(p.rows)
+                    p.result = probs[offset:offset + n]
+                    offset += n
+                failed = False
+            except Exception as e:
+                for p in batch:
+                    p.error = e
+                failed = True
+            finished = time.perf_counter()
+
+            with self._stats_lock:
+                self._batches += 1
+                self._requests += len(batch)
+                self._rows += sum(len(p.rows) for p in batch)
+                self._errors += int(failed)
+                self._batch_sizes.append(sum(len(p.rows) for p in batch))
+                self._forward_ms.append((finished - started) * 1000.0)
+                for p in batch:
+                    self._wait_ms.append((started - p.enqueued_at) * 1000.0)
+            for p in batch:
+                _QUEUE_WAIT.observe(started - p.enqueued_at)
+
+            for p in batch:
+                p.done.set()
+
+    # ------------------ Stats ------------------
+    def stats(self) -> dict:
+        with self._stats_lock:
+            sizes = list(self._batch_sizes)
+            waits = list(self._wait_ms)
+            forwards = list(self._forward_ms)
+            stats = {
+                "max_batch": self.max_batch,
+                "window_ms": self.window_s * 1000.0,
+                "batches": self._batches,
+                "requests": self._requests,
+                "rows": self._rows,
+                "errors": self._errors,
+            }
+        with self._cond:
+            stats["queued_requests"] = len(self._pending)
+
+        stats["batch_size"] = {
+            "mean": float(np.mean(sizes)) if sizes else 0.0,
+            "p50": _percentile(sizes, 50),
+            "p99": _percentile(sizes, 99),
+            "max": max(sizes) if sizes else 0,
+        }
+        stats["queue_wait_ms"] = {
+            "mean": float(np.mean(waits)) if waits else 0.0,
+            "p50": _percentile(waits, 50),
+            "p99": _percentile(waits, 99),
+        }
+        stats["forward_ms"] = {
+            "mean": float(np.mean(forwards)) if forwards else 0.0,
+            "p50": _percentile(forwards, 50),
+            "p99": _percentile(forwards, 99),
+        }
+        return stats
@@ -0,0 +1,624 @@
+import os
+import re
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from collections import deque
+
+import serial
+import serial.tools.list_ports
+
+from features import SENSOR_KEYS
+from protocol import FrameParser, BinaryFrameDecoder, BIN_FRAME_SIZE, looks_binary
+from logs import get_logger
+from metrics import stage
+
+log = get_logger("serial")
+line_log = get_logger("serial.lines")
+
+_READ = stage("serial_read")
+_PARSE = stage("parse")
+_PUBLISH = stage("publish")
+_DSP = stage("dsp")
+
+FRAMING_TEXT = "text"
+FRAMING_BINARY = "binary"
+FRAMING_AUTO = "auto"
+
+AUTO_DETECT_HINTS = ["Bluetooth", "Standard Serial over Bluetooth", "SPP", "RFCOMM", "BT"]
+
+
+# ------------------ Port Cache ------------------
+class PortCache:
+    """Porturile pe care s-au găsit date ultima dată (port + hwid), persistate într-un JSON.
+
+    La repornire sau după o cădere Bluetooth acestea sunt încercate primele; o intrare al cărei port
+    nu trimite nimic după redeschidere e uitată (forget), ca să nu blocheze sondarea altor porturi.
+    """
+
+    def __init__(self, path: str, max_entries: int = 16):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = []
+        try:
+            with open(path) as f:
+                self._entries = list(json.load(f).get("ports", []))
+        except (OSError, ValueError):
+            pass
+
+    def entries(self):
+        with self._lock:
+            return list(self._entries)
+
+    def remember(self, port: str, hwid: str, device_id: str):
+        with self._lock:
+            self._entries = [e for e in self._entries if e.get("port") != port and
+                             not (hwid and e.get("hwid") == hwid)]
+            self._entries.insert(0, {"port": port, "hwid": hwid, "device_id": device_id, "last_seen": time.time()})
+            del self._entries[self.max_entries:]
+            entries = list(self._entries)
+        self._save(entries)
+
+    def forget(self, port: str) -> bool:
+        with self._lock:
+            entries = [e for e in self._entries if e.get("port") != port]
+            if len(entries) == len(self._entries):
+                return False
+            self._entries = entries
+        self._save(entries)
+        return True
+
+    def _save(self, entries):
+        try:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump({"ports": entries}, f, indent=2)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            log.warning("[Detect] Could not save port cache %s: %s", self.path, e)
+
+    @staticmethod
+    def match(entry: dict, ports: dict):
+        """Portul curent pentru o intrare din cache: după hwid (numele COM se poate schimba), apoi după nume."""
+        hwid = entry.get("hwid")
+        if hwid:
+            for dev, p in ports.items():
+                if p.hwid == hwid:
+                    return dev
+        return entry.get("port") if entry.get("port") in ports else None
+
+
+def utc_now_iso() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+
+def device_id_for_port(port: str) -> str:
+    """ID stabil și sigur pentru URL din numele portului: COM5 -> COM5, /dev/rfcomm0 -> rfcomm0."""
+    name = port.replace("\\", "/").rstrip("/").split("/")[-1]
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", name) or "device"
+
+
+# ------------------ Device State ------------------
+RAW_TAIL = 100  # liniile brute incluse în /api/latest
+
+
+def iso_time(ts: float) -> str:
+    return datetime.utcfromtimestamp(ts).isoformat() + "Z" if ts else None
+
+
+class Snapshot:
+    """Starea publicată a unui dispozitiv la o versiune.
+
+    Copy-on-write: fiecare cadru construiește un Snapshot nou și doar înlocuiește referința,
+    iar obiectul (cu dict-urile lui) nu mai e modificat după publicare. Cititorii nu iau lock;
+    corpul JSON pentru /api/latest e serializat o singură dată per versiune.
+    """
+
+    __slots__ = ("device_id", "version", "time", "sensors", "fields", "raw", "_body")
+
+    def __init__(self, device_id: str, version: int = 0, time_s: float = 0.0, sensors: dict = None,
+                 fields: dict = None, raw: tuple = ()):
+        self.device_id = device_id
+        self.version = version
+        self.time = time_s
+        self.sensors = sensors if sensors is not None else dict.fromkeys(SENSOR_KEYS, 0.0)
+        self.fields = fields if fields is not None else {}
+        self.raw = raw
+        self._body = None
+
+    def body(self) -> bytes:
+        if self._body is None:
+            self._body = json.dumps({
+                "device_id": self.device_id,
+                "version": self.version,
+                "snapshot": self.fields,
+                "raw": list(self.raw),
+                "time": iso_time(self.time),
+            }).encode("utf-8")
+        return self._body
+
+
+class DeviceState:
+    """Starea unui analizor: senzori, snapshot, linii brute și canalul SSE propriu.
+
+    Scrie doar thread-ul cititorului serial (apply); restul codului citește `snapshot`.
+    """
+
+    def __init__(self, device_id: str, port: str, hub, calibration: dict = None, dsp=None):
+        self.device_id = device_id
+        self.port = port
+        self.hub = hub
+        self.parser = FrameParser(calibration)
+        self.dsp = dsp  # dsp.SignalProcessor opțional: sensor_data primește valorile filtrate / de platou
+        self.dsp_state = None
+        self.decoder = None  # BinaryFrameDecoder când dispozitivul trimite cadre binare
+        self.framing = None
+        self.lock = threading.Lock()  # serializează scriitorii; cititorii folosesc snapshot-ul
+        self.sensor_data = dict.fromkeys(SENSOR_KEYS, 0.0)
+        self.latest_raw_lines = deque(maxlen=300)
+        self.last_sensor_update = 0
+        self.snapshot = Snapshot(device_id, sensors=dict(self.sensor_data))
+        self.epoch = format(int(time.time() * 1000), "x")  # distinge versiunile între reporniri (ETag)
+        self._published = threading.Condition()
+        self.connected = False
+        self.lines_read = 0
+        self.frames_read = 0
+
+    @property
+    def version(self) -> int:
+        return self.snapshot.version
+
+    @property
+    def latest_snapshot(self) -> dict:
+        return self.snapshot.fields
+
+    def sensors(self) -> dict:
+        return dict(self.snapshot.sensors)
+
+    def versioned_sensors(self):
+        """(versiune, senzori) din același snapshot, ca cheie pentru cache-ul de predicții."""
+        snap = self.snapshot
+        return snap.version, dict(snap.sensors)
+
+    def wait_for(self, version: int, timeout: float) -> Snapshot:
+        """Long-poll: primul snapshot cu versiunea >= `version`, sau cel curent după `timeout` secunde."""
+        deadline = time.monotonic() + timeout
+        with self._published:
+            while self.snapshot.version < version:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._published.wait(remaining)
+        return self.snapshot
+
+    def apply(self, frame: dict):
+        """Publică un snapshot nou cu un cadru parsat și îl întoarce (dict-ul de câmpuri, imuabil).
+
+        Snapshot-ul păstrează valorile brute; sensor_data (intrarea modelului) trece prin DSP, dacă există.
+        """
+        sensors = frame["sensors"]
+        with self.lock:
+            values = sensors
+            if self.dsp is not None:
+                with _DSP.time():
+                    self.dsp_state = self.dsp.process({k: float(sensors[k]) for k in self.sensor_data if k in sensors})
+                values = self.dsp_state["values"]
+            now = time.time()
+            for k in self.sensor_data:
+                if k in values:
+                    self.sensor_data[k] = float(values[k])
+                    self.last_sensor_update = now
+            old = self.snapshot
+            fields = dict(old.fields)
+            fields.update(frame["fields"])
+            fields.update(sensors)
+            raw = tuple(self.latest_raw_lines)[-RAW_TAIL:]
+            self.snapshot = Snapshot(self.device_id, old.version + 1, now, dict(self.sensor_data), fields, raw)
+        with self._published:
+            self._published.notify_all()
+        return fields
+
+    def reset_plateau(self):
+        """Pacient nou: media platoului anterior nu mai ajunge la model; sensor_data revine la valorile
+        filtrate, publicate ca versiune nouă (predicția pentru noul profil nu folosește expirul vechi)."""
+        if self.dsp is None:
+            return
+        with self.lock:
+            self.dsp.reset_plateau()
+            filtered = (self.dsp_state or {}).get("filtered") or {}
+            if not filtered:
+                return
+            for k, v in filtered.items():
+                if k in self.sensor_data:
+                    self.sensor_data[k] = float(v)
+            old = self.snapshot
+            self.snapshot = Snapshot(self.device_id, old.version + 1, old.time, dict(self.sensor_data),
+                                     old.fields, old.raw)
+        with self._published:
+            self._published.notify_all()
+
+    def info(self) -> dict:
+        return {
+            "device_id": self.device_id,
+            "port": self.port,
+            "connected": self.connected,
+            "lines_read": self.lines_read,
+            "frames_read": self.frames_read,
+            "version": self.snapshot.version,
+            "unknown_lines": self.parser.unknown_lines,
+            "framing": self.framing,
+            "binary": self.decoder.stats() if self.decoder is not None else None,
+            "last_sensor_update": self.last_sensor_update,
+            "subscribers": self.hub.stats()["subscribers"],
+            "dsp": self.dsp.stats() if self.dsp is not None else None,
+        }
+
+
+# ------------------ Ingest Manager ------------------
+class IngestManager:
+    """Un cititor (thread) pentru fiecare ESP32 atașat; fiecare dispozitiv are starea lui.
+
+    Porturile fixe (`ports`) sunt citite mereu, cu reconectare. Fără porturi fixe,
+    porturile sunt descoperite automat până la `max_devices` dispozitive.
+    Toate mesajele ajung și în `all_hub` (canalul agregat /stream), cu câmpul device_id.
+    """
+
+    def __init__(self, baud_rate: int, hub_factory, ports=None, max_devices: int = 1,
+                 peek_seconds: float = 3.5, rescan_seconds: float = 1.0, full_rescan_seconds: float = 30.0,
+                 idle_timeout: float = 10.0, probe_workers: int = 16, port_cache: PortCache = None,
+                 calibration: dict = None, store=None, framing: str = FRAMING_AUTO, dsp_factory=None):
+        self.baud_rate = baud_rate
+        self.hub_factory = hub_factory
+        self.fixed_ports = dict(ports or {})  # device_id -> port
+        self.max_devices = max(1, int(max_devices))
+        self.peek_seconds = peek_seconds
+        self.rescan_seconds = rescan_seconds
+        self.full_rescan_seconds = full_rescan_seconds
+        self.idle_timeout = idle_timeout
+        self.probe_workers = probe_workers
+        self.port_cache = port_cache
+        self.calibration = calibration or {}
+        self.store = store  # TimeSeriesStore opțional: istoricul citirilor pe disc
+        if framing not in (FRAMING_TEXT, FRAMING_BINARY, FRAMING_AUTO):
+            raise ValueError(f"Unknown framing: {framing}")
+        self.framing = framing
+        self.dsp_factory = dsp_factory  # () -> dsp.SignalProcessor, câte unul per dispozitiv
+        self._wake = threading.Event()
+        self._rescan_all = False  # un port din cache s-a dovedit mut: resondare completă la următorul ciclu
+        self.frame_listeners = []
+
+        self.all_hub = hub_factory()
+        self._devices = {}
+        self._owned_ports = set()
+        self._lock = threading.Lock()
+        self._started = False
+        # Stare goală folosită cât timp nu e conectat niciun dispozitiv (senzori la 0, ca înainte)
+        self._placeholder = DeviceState("default", None, hub_factory())
+
+    # ------------------ Devices ------------------
+    def devices(self):
+        with self._lock:
+            return list(self._devices.values())
+
+    def get_device(self, device_id: str = None):
+        """Dispozitivul cerut, sau primul dispozitiv cunoscut dacă device_id lipsește; None dacă nu există."""
+        with self._lock:
+            if device_id:
+                return self._devices.get(device_id)
+            for dev in self._devices.values():
+                return dev
+            return self._placeholder
+
+    def _register(self, device_id: str, port: str) -> DeviceState:
+        with self._lock:
+            dev = self._devices.get(device_id)
+            if dev is None:
+                dsp = self.dsp_factory() if self.dsp_factory is not None else None
+                dev = DeviceState(device_id, port, self.hub_factory(), self.calibration, dsp)
+                self._devices[device_id] = dev
+            dev.port = port
+            self._owned_ports.add(port)
+            return dev
+
+    def _release(self, port: str, wake: bool = False, stale: bool = False):
+        """Eliberează portul; `stale` = n-a venit nimic de la deschidere (intrare de cache învechită sau alt
+        dispozitiv): portul e scos din cache și următoarea scanare sondează toate porturile libere."""
+        with self._lock:
+            self._owned_ports.discard(port)
+        if stale:
+            if self.port_cache is not None and self.port_cache.forget(port):
+                log.info("[Detect] Forgetting cached port %s: no data since it was opened", port)
+            self._rescan_all = True
+            wake = True
+        if wake:
+            self._wake.set()  # descoperirea reîncearcă imediat, fără să aștepte următorul ciclu
+
+    def connected_count(self) -> int:
+        with self._lock:
+            return sum(1 for d in self._devices.values() if d.connected)
+
+    # ------------------ Publish ------------------
+    def publish(self, dev: DeviceState, message: dict, event: str = None):
+        dev.hub.publish(message, event=event)
+        self.all_hub.publish(dict(message, device_id=dev.device_id), event=event)
+
+    def add_frame_listener(self, fn):
+        """fn(dev, frame) e apelat în thread-ul cititorului după fiecare cadru; trebuie să fie rapid."""
+        self.frame_listeners.append(fn)
+
+    def handle_line(self, dev: DeviceState, line: str):
+        """Adaugă linia la cadrul curent; publică un singur mesaj SSE când cadrul e complet."""
+        line_log.debug("[ESP32:%s] %s", dev.device_id, line)  # liniile brute doar cu LOG_LEVEL=DEBUG
+        dev.lines_read += 1
+        dev.latest_raw_lines.append(line)
+        t0 = time.perf_counter()
+        frame = dev.parser.feed_line(line)
+        _PARSE.observe(time.perf_counter() - t0)
+        if frame is not None:
+            self.handle_frame(dev, frame)
+
+    def handle_frame(self, dev: DeviceState, frame: dict):
+        dev.frames_read += 1
+        snapshot = dev.apply(frame)
+        if self.store is not None:
+            readings = {k: v for k, v in frame["sensors"].items() if k in dev.sensor_data}
+            if readings:
+                self.store.append(dev.device_id, time.time(), readings)
+        t0 = time.perf_counter()
+        message = {
+            "ts": utc_now_iso(),
+            "lines": frame["lines"],
+            "frame": frame["fields"],
+            "parsed": frame["sensors"],
+            "snapshot": snapshot,
+        }
+        if dev.dsp_state is not None:
+            message["dsp"] = {"filtered": dev.dsp_state["filtered"], "breath": dev.dsp_state["breath"]}
+        self.publish(dev, message)
+        _PUBLISH.observe(time.perf_counter() - t0)
+        for fn in self.frame_listeners:
+            fn(dev, frame)
+
+    # ------------------ Serial Reader ------------------
+    def detect_framing(self, ser):
+        """În modul auto, citește primii octeți: cadre binare valide -> binary, altfel text.
+
+        Întoarce (framing, octeții deja citiți), ca să nu se piardă nimic.
+        """
+        if self.framing != FRAMING_AUTO:
+            return self.framing, b""
+        sniff = bytearray()
+        for _ in range(3):
+            sniff += ser.read(2 * BIN_FRAME_SIZE - len(sniff))
+            if len(sniff) >= 2 * BIN_FRAME_SIZE or b"\n" in sniff:
+                break
+        return (FRAMING_BINARY if looks_binary(bytes(sniff)) else FRAMING_TEXT), bytes(sniff)
+
+    def _read_text(self, ser, dev: DeviceState, pending: bytes, idle):
+        while True:
+            if b"\n" in pending:
+                raw, _, pending = pending.partition(b"\n")
+            else:
+                t0 = time.perf_counter()
+                chunk = ser.readline()
+                if not chunk:
+                    idle()
+                    continue
+                _READ.observe(time.perf_counter() - t0)
+                if not chunk.endswith(b"\n"):
+                    pending += chunk  # linie incompletă (timeout); o completăm la următoarea citire
+                    continue
+                raw, pending = pending + chunk, b""
+            idle(True)
+            try:
+                line = raw.decode("utf-8", errors="ignore").strip()
+            except Exception:
+                line = str(raw).strip()
+            if not line:
+                continue
+            self.handle_line(dev, line)
+
+    def _read_binary(self, ser, dev: DeviceState, pending: bytes, idle):
+        decoder = dev.decoder = BinaryFrameDecoder()
+        decoder.prime(pending)
+        while True:
+            t0 = time.perf_counter()
+            frames = [{"fields": f, "sensors": dev.parser.map_sensors(f), "lines": []}
+                      for f in decoder.frames_available()]
+            if frames:
+                _PARSE.observe(time.perf_counter() - t0)
+            for frame in frames:
+                self.handle_frame(dev, frame)
+            t0 = time.perf_counter()
+            if decoder.read_from(ser):
+                _READ.observe(time.perf_counter() - t0)
+                idle(True)
+            else:
+                idle()
+
+    def serial_reader_forever(self, dev: DeviceState, reconnect: bool = True):
+        """Citește cadre de pe portul dispozitivului; la pierderea conexiunii reîncearcă sau eliberează portul.
+
+        Cititoarele pornite de descoperirea automată (reconnect=False) eliberează portul și dacă
+        nu vine nimic timp de `idle_timeout` secunde, ca să poată fi încercat alt port.
+        """
+        while True:
+            port = dev.port
+            state = {"last_data": None}
+            log.info("[Serial:%s] Connecting to %s @ %s", dev.device_id, port, self.baud_rate)
+            try:
+                with serial.Serial(port=port, baudrate=self.baud_rate, timeout=1) as ser:
+                    log.info("[Serial:%s] Connected to %s. Reading data...", dev.device_id, port)
+                    dev.connected = True
+                    opened = time.time()
+
+                    def idle(got_data=False):
+                        if got_data:
+                            state["last_data"] = time.time()
+                        elif (not reconnect and self.idle_timeout
+                                and time.time() - (state["last_data"] or opened) > self.idle_timeout):
+                            raise serial.SerialException(f"no data for {self.idle_timeout:.0f}s")
+
+                    framing, pending = self.detect_framing(ser)
+                    if pending:
+                        idle(True)
+                    dev.framing = framing
+                    log.info("[Serial:%s] Framing: %s", dev.device_id, framing)
+                    if framing == FRAMING_BINARY:
+                        self._read_binary(ser, dev, pending, idle)
+                    else:
+                        self._read_text(ser, dev, pending, idle)
+            except serial.SerialException as e:
+                log.warning("[Serial:%s] Lost connection on %s: %s. Reconnecting...", dev.device_id, port, e)
+            except Exception as e:
+                log.exception("[Serial:%s] Unexpected error on %s: %s. Reconnecting...", dev.device_id, port, e)
+            dev.connected = False
+            if not reconnect:
+                # Dacă au venit date până acum, dispozitivul tocmai a căzut: merită reîncercat imediat;
+                # altfel portul nu e al nostru și nu mai trebuie deschis direct din cache
+                self._release(port, wake=state["last_data"] is not None, stale=state["last_data"] is None)
+                return
+            time.sleep(1)
+
+    def _spawn_reader(self, dev: DeviceState, reconnect: bool):
+        t = threading.Thread(target=self.serial_reader_forever, args=(dev, reconnect),
+                             name=f"serial-{dev.device_id}", daemon=True)
+        t.start()
+
+    def _attach(self, port: str, hwid: str, device_id: str = None):
+        dev = self._register(device_id or device_id_for_port(port), port)
+        dev.connected = True
+        self._spawn_reader(dev, reconnect=False)
+        if self.port_cache is not None:
+            self.port_cache.remember(port, hwid, dev.device_id)
+        return dev
+
+    # ------------------ Serial Port Detection ------------------
+    def try_peek_data(self, port_name: str, stop: threading.Event = None) -> bool:
+        """True dacă portul trimite ceva în `peek_seconds`; se oprește devreme dacă `stop` e setat."""
+        try:
+            with serial.Serial(port=port_name, baudrate=self.baud_rate, timeout=0.25) as ser:
+                start = time.time()
+                while time.time() - start < self.peek_seconds:
+                    if stop is not None and stop.is_set():
+                        return False
+                    if ser.read(1):
+                        return True
+        except Exception:
+            return False
+        return False
+
+    def probe_parallel(self, ports, need: int = 1):
+        """Sondează porturile în paralel; primele `need` care trimit date câștigă, restul sunt anulate."""
+        if not ports:
+            return []
+        stop = threading.Event()
+        found = []
+        pool = ThreadPoolExecutor(max_workers=min(len(ports), self.probe_workers), thread_name_prefix="probe")
+        try:
+            futures = {pool.submit(self.try_peek_data, p, stop): p for p in ports}
+            for fut in as_completed(futures):
+                if fut.result():
+                    found.append(futures[fut])
+                    if len(found) >= need:
+                        break
+        finally:
+            stop.set()
+            pool.shutdown(wait=True, cancel_futures=True)
+        # Păstrăm ordinea de preferință (Bluetooth primele), nu ordinea sosirii
+        return [p for p in ports if p in found]
+
+    def candidate_ports(self, ports):
+        """Porturile libere, cele Bluetooth primele."""
+        with self._lock:
+            owned = set(self._owned_ports)
+        bt_ports = []
+        other_ports = []
+        for p in ports:
+            if p.device in owned:
+                continue
+            desc = f"{p.description or ''} {p.hwid or ''} {p.name or ''}"
+            if any(h.lower() in desc.lower() for h in AUTO_DETECT_HINTS):
+                bt_ports.append(p.device)
+            else:
+                other_ports.append(p.device)
+        return bt_ports + other_ports
+
+    def discover_forever(self):
+        """Caută ESP32-uri pe porturile libere și pornește câte un cititor pentru fiecare.
+
+        1. Porturile din cache (ultimul port bun, după hwid) sunt deschise direct, fără sondare; dacă nu
+           trimit nimic în `idle_timeout`, sunt scoase din cache și se face o resondare completă.
+        2. Doar porturile apărute/schimbate față de scanarea anterioară sunt sondate (în paralel).
+        3. O resondare completă a porturilor libere se face rar, la `full_rescan_seconds`.
+        """
+        known = {}
+        last_full = 0.0
+        while True:
+            need = self.max_devices - self.connected_count()
+            if need > 0:
+                ports = {p.device: p for p in list_all_ports()}
+                current = {dev: (p.hwid or "") for dev, p in ports.items()}
+                changed = {dev for dev, hwid in current.items() if known.get(dev) != hwid}
+                if changed and known:
+                    log.info("[Detect] Ports changed: %s", sorted(changed))
+                known = current
+                free = self.candidate_ports(ports.values())
+
+                # 1. Ultimele porturi bune: deschidere directă
+                for entry in (self.port_cache.entries() if self.port_cache is not None else []):
+                    if need <= 0:
+                        break
+                    port = PortCache.match(entry, ports)
+                    if port in free:
+                        log.info("[Detect] Reopening last known port %s", port)
+                        self._attach(port, current[port], entry.get("device_id"))
+                        free.remove(port)
+                        need -= 1
+
+                # 2. Sondare paralelă: porturi noi/schimbate, sau toate la resondarea completă
+                full = self._rescan_all or time.time() - last_full >= self.full_rescan_seconds
+                to_probe = free if full else [p for p in free if p in changed]
+                if full:
+                    last_full = time.time()
+                    self._rescan_all = False
+                if need > 0 and to_probe:
+                    log.info("[Detect] Probing in parallel: %s", to_probe)
+                    for port in self.probe_parallel(to_probe, need):
+                        log.info("[Detect] Found data on %s", port)
+                        self._attach(port, current[port])
+
+            self._wake.wait(self.rescan_seconds)
+            self._wake.clear()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        for device_id, port in self.fixed_ports.items():
+            self._spawn_reader(self._register(device_id, port), reconnect=True)
+        if not self.fixed_ports:
+            threading.Thread(target=self.discover_forever, name="serial-discovery", daemon=True).start()
+
+
+def list_all_ports():
+    return list(serial.tools.list_ports.comports())
+
+
+def parse_port_list(value: str) -> dict:
+    """'COM5,COM7' sau 'ward1=COM5,ward2=/dev/rfcomm1' -> {device_id: port}."""
+    ports = {}
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        device_id, sep, port = item.partition("=")
+        if not sep:
+            port, device_id = device_id, device_id_for_port(device_id)
+        ports[device_id.strip()] = port.strip()
+    return ports
@@ -0,0 +1,62 @@
+import os
+import time
+import logging
+import threading
+
+# Logging cu niveluri și limitare de rată: aceeași sursă de mesaje (logger + șablon) poate
+# scrie cel mult `burst` linii la fiecare `period_s` secunde; restul sunt numărate și
+# raportate o singură dată în următorul mesaj lăsat să treacă.
+
+
+class RateLimitFilter(logging.Filter):
+    def __init__(self, burst: int = 20, period_s: float = 10.0):
+        super().__init__()
+        self.burst = burst
+        self.period_s = period_s
+        self._lock = threading.Lock()
+        self._windows = {}  # (logger, șablon) -> [început fereastră, trimise, suprimate]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0 or record.levelno >= logging.ERROR:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            w = self._windows.get(key)
+            if w is None or now - w[0] >= self.period_s:
+                suppressed = w[2] if w is not None else 0
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+                return True
+            if w[1] < self.burst:
+                w[1] += 1
+                return True
+            w[2] += 1
+            return False
+
+
+_configured = False
+
+
+def setup_logging(level: str = None, burst: int = None, period_s: float = None):
+    """Configurează logger-ul `airnalyzer` o singură dată (LOG_LEVEL, LOG_RATE_BURST, LOG_RATE_PERIOD_S)."""
+    global _configured
+    if _configured:
+        return
+    _configured = True
+    level = (level or os.environ.get("LOG_LEVEL", "INFO")).upper()
+    burst = int(burst if burst is not None else os.environ.get("LOG_RATE_BURST", "20"))
+    period_s = float(period_s if period_s is not None else os.environ.get("LOG_RATE_PERIOD_S", "10"))
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(message)s"))
+    handler.addFilter(RateLimitFilter(burst, period_s))
+    root = logging.getLogger("airnalyzer")
+    root.addHandler(handler)
+    root.setLevel(level)
+    root.propagate = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"airnalyzer.{name}")
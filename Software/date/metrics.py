@@ -0,0 +1,159 @@
+import bisect
+import threading
+import time
+
+# Metrici în formatul text Prometheus, fără dependențe externe.
+# Histogramele au bucket-uri fixe: observe() = un bisect + câteva adunări sub un lock scurt.
+
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+                   0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels_text(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+# ------------------ Metric Types ------------------
+class _HistogramChild:
+    __slots__ = ("_lock", "buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    """with hist.time(): ... -> observă durata blocului."""
+    __slots__ = ("child", "t0")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.t0)
+        return False
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def labels(self, *values) -> _HistogramChild:
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, _HistogramChild(self.buckets))
+        return child
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for values, child in sorted(self._children.items()):
+            with child._lock:
+                counts, total, n = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket{_labels_text(self.labelnames + ('le',), values + (le,))} {cumulative}"
+            yield f"{self.name}_sum{_labels_text(self.labelnames, values)} {total}"
+            yield f"{self.name}_count{_labels_text(self.labelnames, values)} {n}"
+
+
+class Callback:
+    """Gauge/counter citit la fiecare scrape: fn() -> număr sau listă de (valori_etichete, număr)."""
+
+    def __init__(self, name: str, help_text: str, fn, kind: str = "gauge", labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        value = self.fn()
+        if not self.labelnames:
+            yield f"{self.name} {float(value)}"
+            return
+        for values, v in value:
+            yield f"{self.name}{_labels_text(self.labelnames, tuple(values))} {float(v)}"
+
+
+# ------------------ Registry ------------------
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name, help_text, fn, labelnames=()):
+        return self.register(Callback(name, help_text, fn, "gauge", labelnames))
+
+    def counter(self, name, help_text, fn, labelnames=()):
+        return self.register(Callback(name, help_text, fn, "counter", labelnames))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for m in metrics:
+            try:
+                lines.extend(m.render())
+            except Exception as e:  # o metrică stricată nu trebuie să strice tot scrape-ul
+                lines.append(f"# {m.name} unavailable: {type(e).__name__}: {e}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Latențele etapelor de pe calea fierbinte: serial_read, parse, publish, features, scale, forward, queue_wait
+STAGE_SECONDS = REGISTRY.histogram(
+    "airnalyzer_stage_seconds", "Latency of hot-path stages in seconds.", labelnames=("stage",))
+REQUEST_SECONDS = REGISTRY.histogram(
+    "airnalyzer_http_request_seconds", "HTTP request handling time in seconds.", labelnames=("route", "status"))
+
+
+def stage(name: str) -> _HistogramChild:
+    return STAGE_SECONDS.labels(name)
@@ -0,0 +1,324 @@
+import os
+import sys
+import json
+import glob
+import argparse
+
+import numpy as np
+
+from features import FEATURE_COLUMNS, add_derived_features
+from logs import get_logger
+from metrics import stage
+
+# Bundle-uri de model care se descriu singure: un manifest `<nume>.bundle.json` lângă artefact,
+#   {"format_version": 1, "name": "numpy", "backend": "numpy", "artifact": "airnalyzer_model.npz",
+#    "feature_columns": [...], "classes": [...], "scaler": {"mean": [...], "scale": [...]} | null,
+#    "options": {...}}
+# Serverul construiește mereu features în ordinea FEATURE_COLUMNS; bundle-ul își alege coloanele
+# după nume, aplică scaler-ul lui (dacă nu e deja împăturit în model) și întoarce probabilitățile
+# în ordinea din `classes`. Tipurile de backend sunt înregistrate în LOADERS (register_backend).
+
+BUNDLE_FORMAT_VERSION = 1
+BUNDLE_SUFFIX = ".bundle.json"
+
+# Nume vechi pentru MODEL_BACKEND
+ALIASES = {"tflite": "tflite-int8"}
+
+log = get_logger("model")
+
+_SCALE = stage("scale")
+_FORWARD = stage("forward")
+
+
+# ------------------ Manifests ------------------
+def manifest_path(artifact_path: str) -> str:
+    return os.path.splitext(artifact_path)[0] + BUNDLE_SUFFIX
+
+
+def write_manifest(path, name, backend, artifact, feature_columns, classes, scaler=None, options=None, **extra):
+    """Scrie manifestul; `scaler` e un StandardScaler (sau None dacă e împăturit în model)."""
+    manifest = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "name": name,
+        "backend": backend,
+        "artifact": artifact,
+        "feature_columns": list(feature_columns),
+        "classes": [str(c) for c in classes],
+        "scaler": None if scaler is None else {
+            "mean": np.asarray(scaler.mean_, dtype=np.float64).tolist(),
+            "scale": np.asarray(scaler.scale_, dtype=np.float64).tolist(),
+        },
+        "options": options or {},
+    }
+    manifest.update(extra)
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(path: str) -> dict:
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported bundle format in {path}")
+    return manifest
+
+
+def discover(directory: str) -> dict:
+    """nume -> calea manifestului, pentru toate bundle-urile din director."""
+    found = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*" + BUNDLE_SUFFIX))):
+        try:
+            found[read_manifest(path)["name"]] = path
+        except (OSError, ValueError, KeyError) as e:
+            log.warning("[Model] Ignoring bundle %s: %s", path, e)
+    return found
+
+
+# ------------------ Bundle ------------------
+class Bundle:
+    """Un model încărcat: selecția coloanelor + scaler + forward, pe features brute (N, 21)."""
+
+    def __init__(self, manifest: dict, forward):
+        self.manifest = manifest
+        self.name = manifest["name"]
+        self.backend = manifest["backend"]
+        self.feature_columns = manifest["feature_columns"]
+        self.classes = manifest["classes"]
+        missing = [c for c in self.feature_columns if c not in FEATURE_COLUMNS]
+        if missing:
+            raise ValueError(f"Bundle {self.name} needs unknown features: {missing}")
+        self._select = (None if self.feature_columns == FEATURE_COLUMNS
+                        else np.array([FEATURE_COLUMNS.index(c) for c in self.feature_columns]))
+        scaler = manifest.get("scaler")
+        self._mean = np.asarray(scaler["mean"], dtype=np.float32) if scaler else None
+        self._scale = np.asarray(scaler["scale"], dtype=np.float32) if scaler else None
+        self._forward = forward
+
+    def predict(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        if self._select is not None:
+            X = X[:, self._select]
+        if self._mean is not None:
+            with _SCALE.time():
+                X = (X - self._mean) / self._scale
+        with _FORWARD.time():
+            return np.asarray(self._forward(X), dtype=np.float32)
+
+    def info(self) -> dict:
+        return {
+            "name": self.name,
+            "backend": self.backend,
+            "artifact": self.manifest.get("artifact"),
+            "classes": self.classes,
+            "n_features": len(self.feature_columns),
+        }
+
+
+# ------------------ Validation ------------------
+def read_labelled(csv_path, limit=None):
+    """Features brute (N, 21) în ordinea FEATURE_COLUMNS + etichetele text dintr-un CSV generat."""
+    import pandas as pd
+
+    df = add_derived_features(pd.read_csv(csv_path, nrows=limit))
+    return df[FEATURE_COLUMNS].to_numpy(dtype=np.float32), df["Diagnosis"].astype(str).to_numpy()
+
+
+def score_predictions(pred, y_names) -> dict:
+    """Acuratețe și F1 macro, alături de ale unui model care prezice mereu clasa majoritară."""
+    from sklearn.metrics import f1_score
+
+    labels, counts = np.unique(y_names, return_counts=True)
+    majority = np.full(len(y_names), labels[counts.argmax()])
+    return {
+        "accuracy": round(float(np.mean(pred == y_names)), 6),
+        "f1_macro": round(float(f1_score(y_names, pred, average="macro", zero_division=0)), 6),
+        "baseline_accuracy": round(float(np.mean(majority == y_names)), 6),
+        "baseline_f1_macro": round(float(f1_score(y_names, majority, average="macro", zero_division=0)), 6),
+    }
+
+
+def check_class_order(bundle, X, y_names):
+    """Verifică un bundle pe date etichetate; ValueError dacă nu bate clasa majoritară.
+
+    Când nu o bate, mesajul propune ordinea de clase care s-ar potrivi cel mai bine cu ieșirile.
+    """
+    from scipy.optimize import linear_sum_assignment
+    from sklearn.metrics import confusion_matrix
+
+    names = np.asarray(bundle.classes)
+    outputs = bundle.predict(X).argmax(axis=1)
+    score = score_predictions(names[outputs], y_names)
+    if score["accuracy"] > score["baseline_accuracy"] and score["f1_macro"] > score["baseline_f1_macro"]:
+        return score
+    message = (f"Bundle {bundle.name} is no better than always predicting the majority class "
+               f"(accuracy {score['accuracy']:.4f} vs {score['baseline_accuracy']:.4f}, "
+               f"F1 macro {score['f1_macro']:.4f} vs {score['baseline_f1_macro']:.4f})")
+    # Cea mai bună potrivire ieșire -> etichetă, ca indiciu pentru o ordine de clase greșită
+    cm = confusion_matrix([bundle.classes.index(y) if y in bundle.classes else -1 for y in y_names],
+                          outputs, labels=range(len(names)))
+    rows, cols = linear_sum_assignment(-cm)
+    order = names.copy()
+    order[cols] = names[rows]
+    if list(order) != list(names):
+        best = score_predictions(order[outputs], y_names)
+        message += (f"; with --classes {','.join(order)} it would score accuracy {best['accuracy']:.4f}, "
+                    f"F1 macro {best['f1_macro']:.4f}")
+    raise ValueError(message)
+
+
+# ------------------ Backend Loaders ------------------
+# loader(manifest, artifact_path, base_dir) -> forward(X pregătit) -> probabilități
+def _load_numpy(manifest, artifact, base_dir):
+    from numpy_model import NumpyMLP
+    return NumpyMLP.load(artifact).predict
+
+
+def _load_keras(manifest, artifact, base_dir):
+    import tensorflow as tf  # import greu, făcut doar în thread-ul de încărcare
+    model = tf.keras.models.load_model(artifact)
+    return model.predict_on_batch
+
+
+def _load_tflite(manifest, artifact, base_dir):
+    from tflite_model import TFLiteModel
+    opts = manifest.get("options", {})
+    threads = int(os.environ.get("TFLITE_THREADS", "0")) or opts.get("num_threads")
+    return TFLiteModel(artifact, batch_size=opts.get("batch_size", 256), num_threads=threads).predict
+
+
+def _load_xgboost(manifest, artifact, base_dir):
+    """Booster nativ (.ubj/.json) sau XGBClassifier serializat (.pkl); inplace_predict pe tot lotul."""
+    import xgboost as xgb
+    if artifact.endswith(".pkl"):
+        import joblib
+        booster = joblib.load(artifact).get_booster()
+    else:
+        booster = xgb.Booster()
+        booster.load_model(artifact)
+    nthread = int(os.environ.get("XGB_NTHREAD", "0")) or manifest.get("options", {}).get("nthread", 0)
+    if nthread:
+        booster.set_param({"nthread": nthread})
+    booster.feature_names = None  # coloanele sunt deja în ordinea bundle-ului
+
+    def forward(X):
+        probs = booster.inplace_predict(X, validate_features=False)
+        return probs.reshape(len(X), -1)
+    return forward
+
+
+def _load_ensemble(manifest, artifact, base_dir):
+    """Media ponderată a probabilităților membrilor, aliniate după numele claselor."""
+    available = discover(base_dir)
+    missing = [m for m in manifest["members"] if m not in available]
+    if missing:
+        raise ValueError(f"Ensemble {manifest['name']} needs missing bundles: {missing}")
+    members = [load_bundle(available[m]) for m in manifest["members"]]
+    weights = np.asarray(manifest.get("weights") or [1.0] * len(members), dtype=np.float32)
+    weights /= weights.sum()
+    orders = []
+    for b in members:
+        missing = [c for c in manifest["classes"] if c not in b.classes]
+        if missing:
+            raise ValueError(f"Ensemble member {b.name} has no classes {missing}")
+        orders.append([b.classes.index(c) for c in manifest["classes"]])
+
+    def forward(X):
+        out = None
+        for b, w, order in zip(members, weights, orders):
+            p = b.predict(X)[:, order] * w
+            out = p if out is None else out + p
+        return out
+    return forward
+
+
+LOADERS = {
+    "numpy": _load_numpy,
+    "keras": _load_keras,
+    "tflite": _load_tflite,
+    "xgboost": _load_xgboost,
+    "ensemble": _load_ensemble,
+}
+
+
+def register_backend(kind: str, loader):
+    """Adaugă un tip nou de backend: loader(manifest, artifact_path, base_dir) -> forward."""
+    LOADERS[kind] = loader
+
+
+def load_bundle(path: str) -> Bundle:
+    manifest = read_manifest(path)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    kind = manifest["backend"]
+    if kind not in LOADERS:
+        raise ValueError(f"Unknown backend type {kind!r} in {path} (known: {sorted(LOADERS)})")
+    artifact = os.path.join(base_dir, manifest["artifact"]) if manifest.get("artifact") else None
+    return Bundle(manifest, LOADERS[kind](manifest, artifact, base_dir))
+
+
+# ------------------ CLI ------------------
+def import_xgboost(pkl_path, scaler_path, out_dir, labelled_csv, name="xgboost", classes=None):
+    """Convertește XGBClassifier-ul serializat în formatul nativ (.ubj, stabil între versiuni) + manifest.
+
+    Nu scrie nimic dacă modelul, cu ordinea de clase aleasă, nu trece check_class_order pe `labelled_csv`.
+    """
+    import joblib
+
+    model = joblib.load(pkl_path)
+    scaler = joblib.load(scaler_path)
+    feature_columns = [str(c) for c in getattr(scaler, "feature_names_in_", [])]
+    if len(feature_columns) != model.n_features_in_:
+        raise ValueError("The scaler must carry the XGBoost feature names (feature_names_in_)")
+    known = [str(c) for c in getattr(model, "classes_", [])]
+    if classes is None and known and not all(c.isdigit() for c in known):
+        classes = known
+    if classes is None:
+        # Etichetele 0..n-1 vin din LabelEncoder, adică în ordine alfabetică (ca în train_model)
+        classes = sorted(read_manifest(manifest_path(os.path.join(out_dir, "airnalyzer_model.npz")))["classes"])
+    if known and len(classes) != len(known):
+        raise ValueError(f"The model has {len(known)} outputs but {len(classes)} classes were given")
+    artifact = os.path.splitext(os.path.basename(pkl_path))[0] + ".ubj"
+    path = manifest_path(os.path.join(out_dir, artifact))
+    manifest = {"name": name, "backend": "xgboost", "feature_columns": feature_columns, "classes": list(classes),
+                "scaler": {"mean": np.asarray(scaler.mean_).tolist(), "scale": np.asarray(scaler.scale_).tolist()}}
+    score = check_class_order(Bundle(manifest, _load_xgboost(manifest, pkl_path, out_dir)),
+                              *read_labelled(labelled_csv))
+    model.get_booster().save_model(os.path.join(out_dir, artifact))
+    write_manifest(path, name, "xgboost", artifact, feature_columns, classes, scaler,
+                   validation={"data": os.path.basename(labelled_csv), **score})
+    return path
+
+
+def main():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="List model bundles or import the XGBoost model as a bundle.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    ls = sub.add_parser("list", help="show the bundles found in a directory")
+    ls.add_argument("--dir", default=base_dir)
+    xg = sub.add_parser("xgboost", help="convert a pickled XGBClassifier + scaler into a bundle")
+    xg.add_argument("--model", default=os.path.join(base_dir, "xgb_airnalyzer_model.pkl"))
+    xg.add_argument("--scaler", default=os.path.join(base_dir, "scaler.pkl"))
+    xg.add_argument("--out-dir", default=base_dir)
+    xg.add_argument("--classes", default=None, help="comma-separated labels for outputs 0..n-1")
+    xg.add_argument("--data", default=os.path.join(base_dir, "airnalyzer_sample_2k.csv"),
+                    help="labelled CSV the import must score better than the majority class on")
+    args = parser.parse_args()
+
+    if args.cmd == "list":
+        for name, path in discover(args.dir).items():
+            m = read_manifest(path)
+            print(f"{name:<16}{m['backend']:<10}{len(m['feature_columns']):>3} features  {m.get('artifact') or ''}")
+    elif args.cmd == "xgboost":
+        classes = args.classes.split(",") if args.classes else None
+        try:
+            path = import_xgboost(args.model, args.scaler, args.out_dir, args.data, classes=classes)
+        except ValueError as e:
+            print(f"[Model] Not importing {args.model}: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Bundle written to {path}")
+    else:
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import threading
+import time
+
+import numpy as np
+
+from logs import get_logger
+
+log = get_logger("model")
+
+
+class ModelNotReady(RuntimeError):
+    pass
+
+
+# ------------------ Model Registry ------------------
+class ModelRegistry:
+    """Încarcă modelul într-un thread de fundal, îl încălzește cu un lot fictiv și raportează starea.
+
+    `loader` nu primește argumente și întoarce o funcție predict_fn(X) -> probabilități,
+    unde X sunt features brute float32 de forma (N, n_features), sau un obiect cu metoda
+    predict (de ex. model_bundles.Bundle), disponibil apoi ca `model`.
+    După un eșec, următorul start() reîncearcă, dar nu mai des decât un interval care se dublează
+    (de la `retry_s` până la `max_retry_s`).
+    """
+
+    def __init__(self, loader, name: str, n_features: int = 21, warmup_batch: int = 64,
+                 retry_s: float = 2.0, max_retry_s: float = 60.0):
+        self.loader = loader
+        self.name = name
+        self.n_features = n_features
+        self.warmup_batch = warmup_batch
+        self.retry_s = retry_s
+        self.max_retry_s = max_retry_s
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._ready = threading.Event()
+        self._predict_fn = None
+        self.model = None
+        self.state = "idle"
+        self.error = None
+        self.failures = 0
+        self._retry_at = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+
+    def start(self):
+        """Pornește încărcarea o singură dată; după un eșec, din nou doar când a trecut intervalul de reîncercare."""
+        with self._lock:
+            if self._thread is not None and (self.state != "failed" or time.monotonic() < self._retry_at):
+                return
+            self.state = "loading"
+            self._thread = threading.Thread(target=self._load, name=f"model-loader-{self.name}", daemon=True)
+            self._thread.start()
+
+    def _load(self):
+        try:
+            t0 = time.perf_counter()
+            model = self.loader()
+            predict_fn = getattr(model, "predict", model)
+            t1 = time.perf_counter()
+            # Primul apel plătește trasarea grafului / alocările; îl facem acum, nu la primul pacient
+            predict_fn(np.zeros((self.warmup_batch, self.n_features), dtype=np.float32))
+            predict_fn(np.zeros((1, self.n_features), dtype=np.float32))
+            t2 = time.perf_counter()
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.failures += 1
+            delay = min(self.max_retry_s, self.retry_s * 2 ** (self.failures - 1))
+            self._retry_at = time.monotonic() + delay
+            self.state = "failed"
+            log.error("[Model] Failed to load %s (attempt %d, retry in %.1fs): %s",
+                      self.name, self.failures, delay, self.error, exc_info=True)
+            return
+
+        self._predict_fn = predict_fn
+        self.model = model
+        self.load_seconds = t1 - t0
+        self.warmup_seconds = t2 - t1
+        self.error = None
+        self.state = "ready"
+        self._ready.set()
+        log.info("[Model] %s ready (load %.2fs, warm-up %.2fs)", self.name, self.load_seconds, self.warmup_seconds)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def predict(self, X) -> np.ndarray:
+        if not self._ready.is_set():
+            raise ModelNotReady(f"Model {self.name} is {self.state}")
+        return self._predict_fn(X)
+
+    def retry_in(self) -> float:
+        """Secunde până la următoarea încercare de încărcare (0 dacă nu e în starea failed)."""
+        if self.state != "failed":
+            return 0.0
+        return max(0.0, self._retry_at - time.monotonic())
+
+    def status(self) -> dict:
+        return {
+            "backend": self.name,
+            "state": self.state,
+            "ready": self.ready,
+            "error": self.error,
+            "failures": self.failures,
+            "retry_in_s": round(self.retry_in(), 1),
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+        }
+
+
+# ------------------ Backend Pool ------------------
+class BackendPool:
+    """Câte un ModelRegistry + motor de inferență pentru fiecare backend, creat la prima folosire.
+
+    `loaders`: nume -> loader (ca pentru ModelRegistry); `engine_factory(predict_fn)` construiește
+    motorul de micro-batching al backend-ului.
+    """
+
+    def __init__(self, loaders: dict, engine_factory, n_features: int = 21):
+        self.loaders = dict(loaders)
+        self.engine_factory = engine_factory
+        self.n_features = n_features
+        self._lock = threading.Lock()
+        self._backends = {}  # nume -> (registry, engine)
+
+    def names(self):
+        return sorted(self.loaders)
+
+    def get(self, name: str):
+        """(registry, engine) pentru backend; KeyError dacă nu există."""
+        with self._lock:
+            backend = self._backends.get(name)
+            if backend is None:
+                registry = ModelRegistry(self.loaders[name], name=name, n_features=self.n_features)
+                backend = self._backends[name] = (registry, self.engine_factory(registry.predict))
+            return backend
+
+    def status(self) -> dict:
+        """Starea fiecărui backend; pentru cele încărcate și descrierea modelului (model.info())."""
+        with self._lock:
+            loaded = {name: registry for name, (registry, _) in self._backends.items()}
+        out = {}
+        for name in self.names():
+            registry = loaded.get(name)
+            out[name] = registry.status() if registry is not None else {"backend": name, "state": "idle", "ready": False}
+            if registry is not None and hasattr(registry.model, "info"):
+                out[name].update(registry.model.info())
+        return out
@@ -0,0 +1,113 @@
+import numpy as np
+
+# Runtime NumPy pentru rețeaua din train_model.build_model.
+# StandardScaler și fiecare BatchNormalization sunt împăturite în straturile Dense
+# vecine, așa că la inferență rămân doar înmulțiri de matrice, ReLU și softmax.
+# Modulul nu importă TensorFlow.
+
+NPZ_FORMAT_VERSION = 1
+
+
+# ------------------ Folding ------------------
+def _fold_scaler(W, b, scaler):
+    """(x - mean) / scale, urmat de x @ W + b, devine x @ W' + b'."""
+    mean = np.asarray(scaler.mean_, dtype=np.float64) if scaler.mean_ is not None else 0.0
+    scale = np.asarray(scaler.scale_, dtype=np.float64) if scaler.scale_ is not None else 1.0
+    W = W / np.broadcast_to(scale, (W.shape[0],))[:, None]
+    b = b - np.broadcast_to(mean, (W.shape[0],)) @ W
+    return W, b
+
+
+def _fold_batchnorm(W, b, gamma, beta, moving_mean, moving_var, epsilon):
+    k = gamma / np.sqrt(moving_var + epsilon)
+    return W * k[None, :], (b - moving_mean) * k + beta
+
+
+def fold_keras_model(model, scaler=None):
+    """Extrage straturile Dense (cu BN și scaler împăturite) dintr-un model Keras secvențial.
+
+    Întoarce o listă de (W, b, activation) în float64; activation e 'relu', 'softmax' sau 'linear'.
+    """
+    layers = []
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind == "Dense":
+            W, b = (np.asarray(w, dtype=np.float64) for w in layer.get_weights())
+            act = layer.get_config().get("activation", "linear")
+            layers.append([W, b, act])
+        elif kind == "BatchNormalization":
+            # BN se împăturește doar într-un Dense liniar: după o activare neliniară nu mai e o transformare afină
+            if not layers or layers[-1][2] != "linear":
+                prev = "no Dense" if not layers else f"a Dense with activation {layers[-1][2]!r}"
+                raise ValueError(f"Cannot fold {layer.name}: it follows {prev}, not a linear Dense")
+            cfg = layer.get_config()
+            weights = [np.asarray(w, dtype=np.float64) for w in layer.get_weights()]
+            n = layers[-1][0].shape[1]
+            gamma = weights.pop(0) if cfg.get("scale", True) else np.ones(n)
+            beta = weights.pop(0) if cfg.get("center", True) else np.zeros(n)
+            moving_mean, moving_var = weights
+            layers[-1][0], layers[-1][1] = _fold_batchnorm(
+                layers[-1][0], layers[-1][1], gamma, beta, moving_mean, moving_var, cfg["epsilon"]
+            )
+        elif kind in ("Activation", "ReLU"):
+            act = layer.get_config().get("activation", "relu")
+            if layers[-1][2] != "linear":
+                raise ValueError(f"Cannot fold activation {layer.name}: previous Dense already has one")
+            layers[-1][2] = act
+        elif kind in ("InputLayer", "Dropout"):
+            continue  # Dropout e inactiv la inferență
+        else:
+            raise ValueError(f"Unsupported layer for NumPy export: {layer.name} ({kind})")
+
+    if scaler is not None and layers:
+        layers[0][0], layers[0][1] = _fold_scaler(layers[0][0], layers[0][1], scaler)
+    return [tuple(l) for l in layers]
+
+
+def save_npz(path, layers, feature_columns=None):
+    arrays = {"format_version": np.int32(NPZ_FORMAT_VERSION), "n_layers": np.int32(len(layers))}
+    for i, (W, b, act) in enumerate(layers):
+        arrays[f"W{i}"] = W.astype(np.float32)
+        arrays[f"b{i}"] = b.astype(np.float32)
+        arrays[f"act{i}"] = np.array(act)
+    if feature_columns is not None:
+        arrays["feature_columns"] = np.array(list(feature_columns))
+    np.savez_compressed(path, **arrays)
+
+
+# ------------------ Runtime ------------------
+class NumpyMLP:
+    """Forward pass NumPy peste artefactul .npz; primește features brute (nescalate)."""
+
+    def __init__(self, layers, feature_columns=None):
+        self.layers = [(np.ascontiguousarray(W, dtype=np.float32), np.asarray(b, dtype=np.float32), act)
+                       for W, b, act in layers]
+        self.feature_columns = feature_columns
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as f:
+            if int(f["format_version"]) != NPZ_FORMAT_VERSION:
+                raise ValueError(f"Unsupported NumPy model format in {path}")
+            layers = [(f[f"W{i}"], f[f"b{i}"], str(f[f"act{i}"])) for i in range(int(f["n_layers"]))]
+            feature_columns = [str(c) for c in f["feature_columns"]] if "feature_columns" in f else None
+        return cls(layers, feature_columns)
+
+    @property
+    def n_features(self):
+        return self.layers[0][0].shape[0]
+
+    def predict(self, X) -> np.ndarray:
+        h = np.asarray(X, dtype=np.float32)
+        for W, b, act in self.layers:
+            h = h @ W
+            h += b
+            if act == "relu":
+                np.maximum(h, 0.0, out=h)
+            elif act == "softmax":
+                h -= h.max(axis=1, keepdims=True)
+                np.exp(h, out=h)
+                h /= h.sum(axis=1, keepdims=True)
+            elif act != "linear":
+                raise ValueError(f"Unsupported activation: {act}")
+        return h
@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+# ------------------ Prediction Cache ------------------
+class PredictionCache:
+    """Cache LRU cu TTL pentru rezultatele /predict.
+
+    Cheia e (device_id, versiunea cadrului de senzori, câmpurile pacientului normalizate).
+    Când un dispozitiv trimite un cadru nou, versiunea crește și intrările vechi ale
+    dispozitivului sunt șterse la prima cerere care vede versiunea nouă.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_s: float = 30.0):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # cheie -> (expiră_la, valoare)
+        self._versions = {}  # device_id -> ultima versiune văzută
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.invalidations = 0
+
+    def _see_version(self, device_id, version):
+        """Întoarce False dacă versiunea e deja depășită; la o versiune nouă șterge intrările vechi."""
+        current = self._versions.get(device_id)
+        if current is not None and version < current:
+            return False
+        if current is not None and version > current:
+            stale = [k for k in self._entries if k[0] == device_id]
+            for k in stale:
+                del self._entries[k]
+            self.invalidations += len(stale)
+        self._versions[device_id] = version
+        return True
+
+    def get(self, device_id, version, patient_key):
+        key = (device_id, version, patient_key)
+        with self._lock:
+            if not self._see_version(device_id, version):
+                self.misses += 1
+                return None
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, device_id, version, patient_key, value):
+        key = (device_id, version, patient_key)
+        with self._lock:
+            if not self._see_version(device_id, version):
+                return  # între timp a sosit un cadru nou; rezultatul e deja vechi
+            self._entries[key] = (time.monotonic() + self.ttl_s, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expired": self.expired,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,305 @@
+import re
+import json
+import struct
+import binascii
+
+# Parser pentru protocolul text trimis de firmware (SenzoriSoket_BT.ino și variantele):
+#
+#   SGP30 → eCO2: 412 ppm, TVOC: 35 ppb
+#   BME688 → Temp: 24.31 °C, Hum: 41.20 %, Press: 1008.12 hPa, Gas: 85.33 KΩ
+#   MQ-3 analog: 1320
+#   MQ-136 analog: 870
+#   MH-Z19B → CO2 raw: 455 ppm | avg: 448 ppm
+#   MQ-7: 512                                   (doar în unele variante)
+#   ----------------------------
+#
+# Liniile sunt adunate într-un singur cadru până la separator. Fiecare linie e clasificată
+# după prefix și citită cu un regex precompilat; liniile necunoscute sau invalide sunt doar
+# păstrate ca text, fără excepții pe calea normală.
+
+_NUM = r"(-?\d+(?:\.\d+)?)"
+
+_SGP30 = re.compile(r"eCO2:\s*" + _NUM + r"\s*ppm,\s*TVOC:\s*" + _NUM)
+_BME688 = re.compile(r"Temp:\s*" + _NUM + r".*?Hum:\s*" + _NUM + r".*?Press:\s*" + _NUM + r".*?Gas:\s*" + _NUM)
+_MQ = re.compile(r"^MQ-(\d+)(?:\s+analog)?:\s*" + _NUM)
+_MHZ19B = re.compile(r"CO2 raw:\s*" + _NUM + r"\s*ppm(?:\s*\|\s*avg:\s*" + _NUM + r")?")
+_SEPARATOR = re.compile(r"^(?:-{5,}|={5,})$")
+
+# Câmpuri citite direct în cheile sensor_data
+DIRECT_FIELDS = {
+    "Temperature": "temp_c",
+    "Humidity": "hum_pct",
+    "CO2": "co2_avg_ppm",
+}
+# Canalele analogice (ADC 0-4095) au nevoie de calibrare ca să devină ppm:
+# SENSOR_CALIBRATION='{"Acetone": [scale, offset], ...}' -> ppm = scale * raw + offset
+ANALOG_CHANNELS = {
+    "Acetone": "mq3_raw",
+    "H2S": "mq136_raw",
+    "Ammonia": "mq137_raw",
+    "CO": "mq7_raw",
+}
+
+MAX_FRAME_LINES = 64
+
+
+def parse_calibration(value: str) -> dict:
+    if not value:
+        return {}
+    data = json.loads(value)
+    return {k: (float(v[0]), float(v[1])) for k, v in data.items() if k in ANALOG_CHANNELS}
+
+
+# ------------------ Line Parsing ------------------
+def parse_line_fields(line: str, out: dict) -> bool:
+    """Adaugă în `out` câmpurile tipizate din linie; False dacă linia nu e o măsurătoare cunoscută."""
+    c = line[:1]
+    if c == "S" and line.startswith("SGP30"):
+        m = _SGP30.search(line)
+        if m:
+            out["eco2_ppm"] = float(m.group(1))
+            out["tvoc_ppb"] = float(m.group(2))
+            return True
+    elif c == "B" and line.startswith("BME688"):
+        m = _BME688.search(line)
+        if m:
+            out["temp_c"] = float(m.group(1))
+            out["hum_pct"] = float(m.group(2))
+            out["press_hpa"] = float(m.group(3))
+            out["gas_kohm"] = float(m.group(4))
+            return True
+    elif c == "M":
+        if line.startswith("MQ-"):
+            m = _MQ.match(line)
+            if m:
+                out[f"mq{m.group(1)}_raw"] = float(m.group(2))
+                return True
+        elif line.startswith("MH-Z19B"):
+            m = _MHZ19B.search(line)
+            if m:
+                raw = float(m.group(1))
+                out["co2_raw_ppm"] = raw
+                out["co2_avg_ppm"] = float(m.group(2)) if m.group(2) is not None else raw
+                return True
+            out["co2_error"] = True
+            return True
+    return False
+
+
+# ------------------ Frame Assembly ------------------
+class FrameParser:
+    """Adună liniile unui ciclu de firmware într-un cadru tipizat.
+
+    feed_line() întoarce cadrul complet la separator (sau pentru o linie JSON, care e
+    un cadru de sine stătător), altfel None. Un cadru e un dict:
+    {"fields": {...}, "sensors": {...chei sensor_data...}, "lines": [...]}.
+    """
+
+    def __init__(self, calibration: dict = None):
+        self.calibration = calibration or {}
+        self._fields = {}
+        self._lines = []
+        self.frames = 0
+        self.unknown_lines = 0
+
+    def _finish(self) -> dict:
+        fields, lines = self._fields, self._lines
+        self._fields, self._lines = {}, []
+        self.frames += 1
+        return {"fields": fields, "sensors": self.map_sensors(fields), "lines": lines}
+
+    def map_sensors(self, fields: dict) -> dict:
+        sensors = {k: fields[f] for k, f in DIRECT_FIELDS.items() if f in fields}
+        for k, (scale, offset) in self.calibration.items():
+            f = ANALOG_CHANNELS[k]
+            if f in fields:
+                sensors[k] = scale * fields[f] + offset
+        return sensors
+
+    def feed_line(self, line: str):
+        if not line:
+            return None
+        if _SEPARATOR.match(line):
+            return self._finish() if self._lines else None
+        if line[0] == "{":
+            # Firmware vechi / simulări: o linie JSON cu cheile sensor_data
+            try:
+                data = json.loads(line)
+            except ValueError:
+                data = None
+            if isinstance(data, dict):
+                # Cadru de sine stătător; un cadru text început rămâne deschis
+                self.frames += 1
+                sensors = {k: float(v) for k, v in data.items()
+                           if isinstance(v, (int, float)) and not isinstance(v, bool)}
+                return {"fields": data, "sensors": sensors, "lines": [line]}
+
+        self._lines.append(line)
+        if not parse_line_fields(line, self._fields):
+            self.unknown_lines += 1
+        if len(self._lines) >= MAX_FRAME_LINES:
+            return self._finish()  # separatorul lipsește; nu lăsăm cadrul să crească la nesfârșit
+        return None
+
+
+# ------------------ Binary Frames ------------------
+# Cadru binar de lungime fixă (little-endian), trimis de firmware cu BINARY_FRAMES=1:
+#
+#   0  magic    2B  A5 5A
+#   2  version  u8  1
+#   3  flags    u8  bit0 SGP30 valid, bit1 BME688 valid, bit2 CO2 valid
+#   4  seq      u32 număr de secvență (crește cu 1 la fiecare cadru)
+#   8  millis   u32 millis() pe ESP32
+#  12  eco2     u16 ppm     14 tvoc u16 ppb
+#  16  temp     f32 °C      20 hum  f32 %     24 press f32 hPa   28 gas f32 kΩ
+#  32  mq3      u16 ADC     34 mq136 u16 ADC
+#  36  co2_raw  u16 ppm     38 co2_avg u16 ppm
+#  40  crc      u16 CRC-16/CCITT-FALSE peste octeții 2..39
+BIN_MAGIC = b"\xa5\x5a"
+BIN_VERSION = 1
+BIN_FRAME = struct.Struct("<2sBBIIHHffffHHHHH")
+BIN_FRAME_SIZE = BIN_FRAME.size  # 42 octeți, față de ~250 în format text
+
+FLAG_SGP30 = 0x01
+FLAG_BME688 = 0x02
+FLAG_CO2 = 0x04
+
+
+def crc16_ccitt(data) -> int:
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def encode_binary_frame(seq: int, millis: int, fields: dict) -> bytes:
+    """Echivalentul Python al encoderului din firmware (pentru simulări și teste)."""
+    flags = 0
+    if "eco2_ppm" in fields:
+        flags |= FLAG_SGP30
+    if "temp_c" in fields:
+        flags |= FLAG_BME688
+    if "co2_raw_ppm" in fields:
+        flags |= FLAG_CO2
+    body = BIN_FRAME.pack(
+        BIN_MAGIC, BIN_VERSION, flags, seq & 0xFFFFFFFF, millis & 0xFFFFFFFF,
+        int(fields.get("eco2_ppm", 0)), int(fields.get("tvoc_ppb", 0)),
+        fields.get("temp_c", 0.0), fields.get("hum_pct", 0.0),
+        fields.get("press_hpa", 0.0), fields.get("gas_kohm", 0.0),
+        int(fields.get("mq3_raw", 0)), int(fields.get("mq136_raw", 0)),
+        int(fields.get("co2_raw_ppm", 0)), int(fields.get("co2_avg_ppm", 0)),
+        0,
+    )
+    return body[:-2] + struct.pack("<H", crc16_ccitt(body[2:-2]))
+
+
+class BinaryFrameDecoder:
+    """Decodează cadre binare citite direct cu readinto() într-un buffer prealocat.
+
+    Octeții sunt citiți în buffer fără copii intermediare; cadrele sunt validate cu CRC
+    și despachetate cu unpack_from. La un CRC greșit sau un octet pierdut decodorul se
+    resincronizează pe următorul magic. Secvențele sărite sunt numărate ca cadre pierdute.
+    """
+
+    def __init__(self, buffer_size: int = 4096):
+        self.buf = bytearray(max(buffer_size, 4 * BIN_FRAME_SIZE))
+        self.view = memoryview(self.buf)
+        self.start = 0
+        self.end = 0
+        self.last_seq = None
+        self.frames = 0
+        self.crc_errors = 0
+        self.dropped_frames = 0
+        self.resync_bytes = 0
+        self.bad_version = 0
+
+    def prime(self, data: bytes):
+        """Octeți deja citiți (ex. la detectarea formatului) sunt puși la începutul buffer-ului."""
+        self._compact()
+        n = min(len(data), len(self.buf) - self.end)
+        self.buf[self.end:self.end + n] = data[:n]
+        self.end += n
+
+    def _compact(self):
+        if self.start:
+            n = self.end - self.start
+            self.buf[:n] = self.view[self.start:self.end]
+            self.start, self.end = 0, n
+
+    def read_from(self, stream) -> int:
+        """Un apel readinto() pe spațiul liber din buffer; întoarce numărul de octeți citiți.
+
+        Cerem tot ce e deja în așteptare, dar cel puțin cât lipsește până la un cadru întreg,
+        ca readinto() să nu aștepte timeout-ul portului pentru un buffer plin.
+        """
+        if len(self.buf) - self.end < BIN_FRAME_SIZE:
+            self._compact()
+        missing = BIN_FRAME_SIZE - (self.end - self.start) % BIN_FRAME_SIZE
+        want = max(getattr(stream, "in_waiting", 0), missing)
+        n = stream.readinto(self.view[self.end:min(self.end + want, len(self.buf))]) or 0
+        self.end += n
+        return n
+
+    def frames_available(self):
+        """Generator de câmpuri decodate pentru toate cadrele complete din buffer."""
+        buf = self.buf
+        while self.end - self.start >= BIN_FRAME_SIZE:
+            s = self.start
+            if buf[s] != 0xA5 or buf[s + 1] != 0x5A:
+                nxt = buf.find(BIN_MAGIC, s + 1, self.end)
+                skip = (nxt if nxt >= 0 else self.end - 1) - s
+                self.resync_bytes += skip
+                self.start += skip
+                continue
+            frame = self.view[s:s + BIN_FRAME_SIZE]
+            (_, version, flags, seq, millis, eco2, tvoc, temp, hum, press, gas,
+             mq3, mq136, co2_raw, co2_avg, crc) = BIN_FRAME.unpack_from(buf, s)
+            if crc != crc16_ccitt(frame[2:-2]):
+                self.crc_errors += 1
+                self.start += 1  # poate magic-ul era în date; căutăm următorul
+                continue
+            self.start += BIN_FRAME_SIZE
+            if version != BIN_VERSION:
+                self.bad_version += 1
+                continue
+            if self.last_seq is not None:
+                gap = (seq - self.last_seq - 1) & 0xFFFFFFFF
+                if gap < 0x80000000:  # o secvență mai mică = firmware repornit, nu pierdere
+                    self.dropped_frames += gap
+            self.last_seq = seq
+            self.frames += 1
+
+            fields = {"seq": seq, "millis": millis, "mq3_raw": float(mq3), "mq136_raw": float(mq136)}
+            if flags & FLAG_SGP30:
+                fields["eco2_ppm"] = float(eco2)
+                fields["tvoc_ppb"] = float(tvoc)
+            if flags & FLAG_BME688:
+                fields["temp_c"] = temp
+                fields["hum_pct"] = hum
+                fields["press_hpa"] = press
+                fields["gas_kohm"] = gas
+            if flags & FLAG_CO2:
+                fields["co2_raw_ppm"] = float(co2_raw)
+                fields["co2_avg_ppm"] = float(co2_avg)
+            else:
+                fields["co2_error"] = True
+            yield fields
+        if self.start == self.end:
+            self.start = self.end = 0
+
+    def stats(self) -> dict:
+        return {
+            "frames": self.frames,
+            "crc_errors": self.crc_errors,
+            "dropped_frames": self.dropped_frames,
+            "resync_bytes": self.resync_bytes,
+            "bad_version": self.bad_version,
+        }
+
+
+def looks_binary(data: bytes) -> bool:
+    """True dacă în octeții citiți la conectare există un cadru binar valid."""
+    i = data.find(BIN_MAGIC)
+    while 0 <= i <= len(data) - BIN_FRAME_SIZE:
+        frame = data[i:i + BIN_FRAME_SIZE]
+        if struct.unpack_from("<H", frame, BIN_FRAME_SIZE - 2)[0] == crc16_ccitt(frame[2:-2]):
+            return True
+        i = data.find(BIN_MAGIC, i + 1)
+    return False
@@ -0,0 +1,66 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+# Profiler prin eșantionare, pornit la cerere: la fiecare `interval_s` citește stivele tuturor
+# thread-urilor cu sys._current_frames() și numără stivele identice. Rezultatul e în formatul
+# "collapsed" (thread;funcție;funcție... număr), direct utilizabil cu flamegraph.pl / speedscope.
+
+_running = threading.Lock()
+
+
+# Funcții în vârful stivei care înseamnă că thread-ul doar așteaptă (I/O, lock-uri, sleep)
+_IDLE_FUNCS = {"wait", "select", "poll", "accept", "readline", "read", "readinto", "recv_into",
+               "_wait_for_tstate_lock", "sleep"}
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+def _stack_key(frame, max_depth: int) -> str:
+    parts = []
+    while frame is not None and len(parts) < max_depth:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+def sample(seconds: float = 5.0, interval_s: float = 0.005, max_depth: int = 64, idle: bool = False) -> dict:
+    """Eșantionează stivele timp de `seconds`; un singur profil poate rula o dată.
+
+    Cu idle=False sunt ignorate thread-urile care doar așteaptă (wait/select/readline etc.
+    în vârful stivei), ca profilul să arate unde se consumă CPU.
+    """
+    if not _running.acquire(blocking=False):
+        raise ProfilerBusy("a profile is already running")
+    try:
+        me = threading.get_ident()
+        names = {}
+        stacks = Counter()
+        samples = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            frames = sys._current_frames()
+            if not names.keys() >= frames.keys():
+                # Thread-urile per cerere au nume numerotate (Thread-12 ...); le grupăm după rol
+                names = {t.ident: re.sub(r"-\d+", "", t.name) for t in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident == me:
+                    continue
+                if not idle and frame.f_code.co_name in _IDLE_FUNCS:
+                    continue
+                stacks[f"{names.get(ident, ident)};{_stack_key(frame, max_depth)}"] += 1
+            samples += 1
+            time.sleep(interval_s)
+        return {"samples": samples, "seconds": seconds, "interval_s": interval_s, "stacks": stacks}
+    finally:
+        _running.release()
+
+
+def collapsed(result: dict) -> str:
+    return "".join(f"{stack} {n}\n" for stack, n in result["stacks"].most_common())
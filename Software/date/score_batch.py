@@ -0,0 +1,300 @@
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing as mp
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import model_bundles
+from features import RAW_COLUMNS, PATIENT_DEFAULTS, build_feature_matrix
+
+# Scorare offline pe seturi mari (CSV sau Parquet), fără server:
+#   - intrarea e citită pe bucăți (`--chunksize` rânduri), derivatele calculate vectorizat ca în server;
+#   - bucățile sunt scalate și scorate de un pool de procese (fiecare își încarcă o dată bundle-ul);
+#     cel mult `2 * workers` bucăți sunt în lucru, deci memoria nu depinde de mărimea fișierului;
+#   - rezultatele se scriu în ordine, incremental: Parquet = director cu câte un part-NNNNN.parquet
+#     per bucată (scris în .tmp și redenumit), CSV = un singur fișier la care se adaugă;
+#   - `<out>.progress.json` ține evidența bucăților terminate; --resume continuă de unde s-a oprit
+#     (CSV-ul e trunchiat la ultimul punct de control, deci o bucată scrisă pe jumătate nu se dublează).
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# ------------------ Input ------------------
+def iter_chunks(path, chunksize, columns):
+    """DataFrame-uri de cel mult `chunksize` rânduri, doar cu coloanele cerute care există în fișier."""
+    import pandas as pd
+
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        pf = pq.ParquetFile(path)
+        present = [c for c in columns if c in pf.schema_arrow.names]
+        for batch in pf.iter_batches(batch_size=chunksize, columns=present):
+            yield batch.to_pandas()
+    else:
+        header = pd.read_csv(path, nrows=0).columns
+        present = [c for c in columns if c in header]
+        yield from pd.read_csv(path, usecols=present, chunksize=chunksize)
+
+
+def chunk_features(df) -> np.ndarray:
+    """Matricea (N, 21); câmpurile pacientului lipsă primesc valorile implicite din /predict."""
+    n = len(df)
+    cols = {}
+    for c in RAW_COLUMNS:
+        if c in df:
+            cols[c] = df[c].to_numpy(dtype=np.float64)
+        elif c in PATIENT_DEFAULTS:
+            cols[c] = np.full(n, PATIENT_DEFAULTS[c])
+        else:
+            raise ValueError(f"Input has no column {c!r}")
+    return build_feature_matrix(cols)
+
+
+def input_signature(path) -> dict:
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+# ------------------ Workers ------------------
+THREAD_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "XGB_NTHREAD", "TFLITE_THREADS")
+_BUNDLE = None
+
+
+def _init_worker(bundle_path, threads):
+    global _BUNDLE
+    # XGBoost/TFLite citesc variabilele la încărcarea bundle-ului; BLAS-ul lui NumPy e deja încărcat aici
+    # (workerii spawn îl au limitat din mediul moștenit), deci în proces limita se aplică cu threadpoolctl
+    for var in THREAD_VARS:
+        os.environ[var] = str(threads)
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(threads)
+    except ImportError:
+        pass
+    _BUNDLE = model_bundles.load_bundle(bundle_path)
+
+
+def _score(X) -> np.ndarray:
+    return _BUNDLE.predict(X).astype(np.float32)
+
+
+# ------------------ Output ------------------
+class ProgressFile:
+    """Punctul de control: bucăți terminate, rânduri scrise și (pentru CSV) lungimea fișierului."""
+
+    def __init__(self, out_path, key: dict):
+        self.path = out_path.rstrip("/") + ".progress.json"
+        self.key = key
+        self.chunks = 0
+        self.rows = 0
+        self.bytes = 0
+        self.correct = 0
+        self.labelled = 0
+
+    def load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            data = json.load(f)
+        if data.get("key") != self.key:
+            raise ValueError(f"{self.path} belongs to a different run (input, bundle or chunk size changed); "
+                             f"use --overwrite to start over")
+        for name in ("chunks", "rows", "bytes", "correct", "labelled"):
+            setattr(self, name, data.get(name, 0))
+        return True
+
+    def save(self, done: bool = False):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"key": self.key, "chunks": self.chunks, "rows": self.rows, "bytes": self.bytes,
+                       "correct": self.correct, "labelled": self.labelled, "done": done}, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+def result_frame(df, probs, classes, start_row, keep):
+    import pandas as pd
+
+    idx = probs.argmax(axis=1)
+    out = pd.DataFrame({"row": np.arange(start_row, start_row + len(df), dtype=np.int64)})
+    for c in keep:
+        out[c] = df[c].to_numpy()
+    out["diagnosis"] = np.asarray(classes, dtype=object)[idx]
+    out["confidence"] = probs[np.arange(len(idx)), idx]
+    for j, c in enumerate(classes):
+        out[f"prob_{c}"] = probs[:, j]
+    return out
+
+
+class CsvSink:
+    def __init__(self, path, progress: ProgressFile):
+        mode = "r+b" if progress.bytes and os.path.exists(path) else "wb"
+        self.f = open(path, mode)
+        self.f.truncate(progress.bytes)  # ce a trecut de ultimul punct de control e refăcut
+        self.f.seek(progress.bytes)
+        self.header = progress.bytes == 0
+
+    def write(self, index, frame) -> int:
+        frame.to_csv(self.f, header=self.header, index=False, float_format="%.6g")
+        self.header = False
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        return self.f.tell()
+
+    def close(self):
+        self.f.close()
+
+
+class ParquetSink:
+    def __init__(self, path, progress: ProgressFile):
+        self.dir = path
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            # Bucățile de după punctul de control (sau .tmp rămase) sunt rescrise
+            if name.endswith(".tmp") or (name.startswith("part-") and int(name[5:10]) >= progress.chunks):
+                os.remove(os.path.join(path, name))
+
+    def write(self, index, frame) -> int:
+        path = os.path.join(self.dir, f"part-{index:05d}.parquet")
+        frame.to_parquet(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+        return 0
+
+    def close(self):
+        pass
+
+
+# ------------------ Runner ------------------
+def score_file(data, out, bundle_path, chunksize=100_000, workers=None, threads=1, resume=False, keep=(),
+               label="Diagnosis", report_every=5.0):
+    manifest = model_bundles.read_manifest(bundle_path)
+    classes = manifest["classes"]
+    key = {"input": input_signature(data), "bundle": os.path.abspath(bundle_path), "chunksize": chunksize,
+           "keep": list(keep)}
+    progress = ProgressFile(out, key)
+    if resume and progress.load():
+        print(f"[Score] Resuming after {progress.rows} rows ({progress.chunks} chunks)")
+    elif os.path.exists(progress.path) and not resume:
+        raise FileExistsError(f"{progress.path} exists; pass --resume to continue or --overwrite to start over")
+    sink = (ParquetSink if out.endswith(".parquet") else CsvSink)(out, progress)
+
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    if workers > 0:
+        # spawn, nu fork: un proces nou importă NumPy/BLAS cu limitele de thread-uri deja în mediu
+        for var in THREAD_VARS:
+            os.environ[var] = str(threads)
+        pool = ProcessPoolExecutor(workers, mp_context=mp.get_context("spawn"), initializer=_init_worker,
+                                   initargs=(bundle_path, threads))
+    else:
+        pool = None
+    if pool is None:
+        _init_worker(bundle_path, threads)
+
+    columns = RAW_COLUMNS + [c for c in list(keep) + [label] if c not in RAW_COLUMNS]
+    t0 = time.perf_counter()
+    last_report = t0
+    rows_new = 0
+    inflight = deque()
+
+    def finish_one():
+        nonlocal rows_new, last_report
+        index, df, start_row, fut = inflight.popleft()
+        probs = fut.result() if pool is not None else fut
+        frame = result_frame(df, probs, classes, start_row, keep)
+        if label in df:
+            progress.correct += int(np.sum(frame["diagnosis"].to_numpy() == df[label].to_numpy()))
+            progress.labelled += len(df)
+        progress.bytes = sink.write(index, frame)
+        progress.chunks = index + 1
+        progress.rows = start_row + len(df)
+        progress.save()
+        rows_new += len(df)
+        now = time.perf_counter()
+        if now - last_report >= report_every:
+            print(f"[Score] {progress.rows} rows, {rows_new / (now - t0):,.0f} rows/s")
+            last_report = now
+
+    try:
+        start_row = 0
+        for index, df in enumerate(iter_chunks(data, chunksize, columns)):
+            if index < progress.chunks:
+                start_row += len(df)  # bucăți deja scorate: doar citite, ca să păstrăm numerotarea
+                continue
+            X = chunk_features(df)
+            fut = pool.submit(_score, X) if pool is not None else _score(X)
+            inflight.append((index, df, start_row, fut))
+            start_row += len(df)
+            while len(inflight) >= max(2, 2 * workers):
+                finish_one()
+        while inflight:
+            finish_one()
+        progress.save(done=True)
+    finally:
+        sink.close()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - t0
+    result = {
+        "rows": progress.rows,
+        "rows_scored": rows_new,
+        "seconds": round(elapsed, 2),
+        "rows_per_s": round(rows_new / elapsed, 1) if elapsed else 0.0,
+        "accuracy": round(progress.correct / progress.labelled, 6) if progress.labelled else None,
+    }
+    print(f"[Score] {rows_new} rows scored in {elapsed:.1f}s ({result['rows_per_s']:,.0f} rows/s), "
+          f"{progress.rows} rows in {out}" + (f", accuracy vs {label}: {result['accuracy']:.4f}"
+                                              if result["accuracy"] is not None else ""))
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Score a CSV/Parquet dataset offline with a model bundle.")
+    ap.add_argument("data", help="input CSV or Parquet file")
+    ap.add_argument("out", help="output .csv file or .parquet directory (one part file per chunk)")
+    ap.add_argument("--backend", default="numpy", help="bundle name (see model_bundles.py list)")
+    ap.add_argument("--dir", default=BASE_DIR, help="directory with *.bundle.json manifests")
+    ap.add_argument("--chunksize", type=int, default=100_000)
+    ap.add_argument("--workers", type=int, default=None, help="scoring processes (0 = in-process; default: CPUs)")
+    ap.add_argument("--threads", type=int, default=1, help="BLAS/XGBoost/TFLite threads per worker")
+    ap.add_argument("--keep", default="", help="comma-separated input columns copied to the output (e.g. an id)")
+    ap.add_argument("--label", default="Diagnosis", help="reference label column used for the accuracy report")
+    ap.add_argument("--resume", action="store_true", help="continue an interrupted run from its checkpoint")
+    ap.add_argument("--overwrite", action="store_true", help="discard a previous run's checkpoint and output")
+    ap.add_argument("--json", metavar="PATH", help="write the summary as JSON ('-' for stdout)")
+    args = ap.parse_args()
+
+    bundles = model_bundles.discover(args.dir)
+    name = model_bundles.ALIASES.get(args.backend, args.backend)
+    if name not in bundles:
+        print(f"Unknown bundle {args.backend!r} (available: {sorted(bundles)})", file=sys.stderr)
+        sys.exit(2)
+    if args.overwrite:
+        progress = args.out.rstrip("/") + ".progress.json"
+        for path in (progress, args.out):
+            if os.path.isdir(path):
+                import shutil
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+
+    keep = [c.strip() for c in args.keep.split(",") if c.strip()]
+    try:
+        result = score_file(args.data, args.out, bundles[name], args.chunksize, args.workers, args.threads,
+                            args.resume, keep, args.label)
+    except (FileExistsError, ValueError) as e:
+        print(f"[Score] {e}", file=sys.stderr)
+        sys.exit(2)
+    if args.json == "-":
+        print(json.dumps(result, indent=2))
+    elif args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+import signal
+import socket
+import argparse
+import multiprocessing
+
+import shared_state
+
+# Servire cu mai multe procese: un singur proces de ingest deține porturile seriale și scrie
+# ultima stare a fiecărui ESP32 în memoria partajată (shared_state.SharedState, protejată de
+# seqlock); N procese worker acceptă conexiuni pe același socket și servesc /predict,
+# /api/latest, /stream etc. citind din acea memorie. Fiecare worker are propriul model,
+# deci predicțiile scalează cu nucleele, iar cititorul serial nu concurează cu cererile HTTP
+# pentru GIL.
+#
+#   python serve.py --workers 4 --port 5000
+#
+# Configurarea (porturi, model, istoric, SSE) e aceeași ca pentru appserver.py, prin variabile de mediu.
+
+
+def _run_ingest(shm_name: str, queue):
+    shared_state.configure("ingest", shm_name, queue)
+    import appserver
+    appserver.start_background()
+    appserver.log.info("[Serve] Ingest process %d ready", os.getpid())
+    while True:
+        time.sleep(3600)
+
+
+def _run_worker(shm_name: str, queue, sock: socket.socket, host: str, port: int, index: int):
+    shared_state.configure("worker", shm_name, queue)
+    import appserver
+    from werkzeug.serving import make_server
+    appserver.start_background()
+    server = make_server(host, port, appserver.app, threaded=True, fd=sock.fileno())
+    appserver.log.info("[Serve] Worker %d (pid %d) serving on %s:%d", index, os.getpid(), host, port)
+    server.serve_forever()
+
+
+def listen_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(128)
+    sock.set_inheritable(True)
+    return sock
+
+
+def serve(host: str, port: int, workers: int, max_devices: int = 8, ring: int = 128):
+    # fork: copiii moștenesc socketul direct; pe Windows (spawn) socketul e duplicat de multiprocessing
+    ctx = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    state = shared_state.SharedState(create=True, max_devices=max_devices, ring=ring)
+    queue = ctx.Queue()
+    sock = listen_socket(host, port)
+
+    procs = [ctx.Process(target=_run_ingest, args=(state.name, queue), name="airnalyzer-ingest", daemon=True)]
+    for i in range(workers):
+        procs.append(ctx.Process(target=_run_worker, args=(state.name, queue, sock, host, port, i),
+                                 name=f"airnalyzer-worker-{i}", daemon=True))
+    for p in procs:
+        p.start()
+    print(f"[Serve] {workers} workers + 1 ingest process on http://{host}:{port} (shm {state.name})", flush=True)
+
+    def stop(*_):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        while all(p.is_alive() for p in procs):
+            time.sleep(0.5)
+        dead = [p.name for p in procs if not p.is_alive()]
+        print(f"[Serve] Process exited: {', '.join(dead)}; shutting down", file=sys.stderr, flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+        for p in procs:
+            p.join(5)
+        sock.close()
+        state.close(unlink=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Serve the Airnalyzer API with one ingest process and N HTTP workers.")
+    ap.add_argument("--host", default=os.environ.get("SERVE_HOST", "127.0.0.1"))
+    ap.add_argument("--port", type=int, default=int(os.environ.get("SERVE_PORT", "5000")))
+    ap.add_argument("--workers", type=int, default=int(os.environ.get("SERVE_WORKERS", "0")),
+                    help="HTTP worker processes (0 = one per CPU core)")
+    ap.add_argument("--max-devices", type=int, default=8, help="device slots in shared memory")
+    ap.add_argument("--ring", type=int, default=128, help="SSE messages kept per device for workers")
+    args = ap.parse_args()
+    workers = args.workers or os.cpu_count() or 1
+    serve(args.host, args.port, workers, args.max_devices, args.ring)
+
+
+if __name__ == "__main__":
+    main()
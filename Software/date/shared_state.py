@@ -0,0 +1,569 @@
+import json
+import time
+import zlib
+import struct
+import threading
+from multiprocessing import shared_memory
+
+from features import SENSOR_KEYS
+from ingest import IngestManager, DeviceState, Snapshot, RAW_TAIL
+
+# Starea dispozitivelor într-un bloc multiprocessing.shared_memory, pentru modul cu mai multe
+# procese (serve.py): procesul de ingest e singurul care scrie, procesele worker doar citesc.
+#
+# Blocul are un antet și câte un slot pentru fiecare dispozitiv:
+#   - structura slotului (contoare, senzori, snapshot JSON, ultimele linii, profilul pacientului)
+#     protejată de un seqlock: scriitorul face seq impar, scrie, apoi seq par; cititorul copiază
+#     și reîncearcă dacă seq era impar sau s-a schimbat între timp;
+#   - un ring de mesaje SSE; fiecare intrare are propriul seq (2n+2 = mesajul n complet scris),
+#     așa că un worker rămas în urmă vede exact ce mesaje a pierdut. Intrarea mai poartă și numărul
+#     global al mesajului (contorul din antet, comun tuturor dispozitivelor); numerele n și cel global
+#     devin id-urile SSE din /stream/<id> și /stream, identice în toți workerii.
+
+MAGIC = 0x41495253  # "AIRS"
+LAYOUT_VERSION = 2
+
+HEADER = struct.Struct("<IIIIIIQ")  # magic, layout, max_devices, ring, n_devices, rezervat, ultimul mesaj global
+ALL_MSG = HEADER.size - 8
+_SLOT_PREFIX = "<Q64s128sQQQQQQdB7x8s%dd" % len(SENSOR_KEYS)
+SLOT_HEAD = struct.Struct(_SLOT_PREFIX + "QIII4x")
+# Câmpurile de după seq: pack_into umple întâi zona cu zero, deci seq-ul nu e rescris niciodată cu
+# structura întreagă (un cititor ar vedea seq = 0, par, în mijlocul unei scrieri)
+_SLOT_FIELDS = struct.Struct("<" + SLOT_HEAD.format[2:])
+LAST_MSG = struct.calcsize(_SLOT_PREFIX)  # offset-ul contorului de mesaje în slot
+SNAPSHOT_SIZE = 8192
+RAW_SIZE = 16384
+PROFILE_SIZE = 1024
+ENTRY_HEAD = struct.Struct("<QI4xQ16s")  # seq, lungime, număr global, eveniment
+_ENTRY_FIELDS = struct.Struct("<" + ENTRY_HEAD.format[2:])
+MSG_SIZE = 8192
+RAW_LINES = 100
+
+_SEQ = struct.Struct("<Q")
+
+
+def _str(b: bytes) -> str:
+    return b.split(b"\0", 1)[0].decode("utf-8", errors="replace")
+
+
+class SharedState:
+    """Layout-ul blocului de memorie partajată și operațiile seqlock de citire/scriere."""
+
+    def __init__(self, name: str = None, create: bool = False, max_devices: int = 8, ring: int = 128):
+        if create:
+            self.max_devices, self.ring = max_devices, ring
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=self._total_size())
+            HEADER.pack_into(self.shm.buf, 0, MAGIC, LAYOUT_VERSION, max_devices, ring, 0, 0, 0)
+        else:
+            # Copiii lui serve.py folosesc resource_tracker-ul părintelui, care face unlink la final
+            self.shm = shared_memory.SharedMemory(name=name)
+            magic, layout, self.max_devices, self.ring = HEADER.unpack_from(self.shm.buf, 0)[:4]
+            if magic != MAGIC or layout != LAYOUT_VERSION:
+                raise ValueError(f"Shared memory {name} has an unknown layout")
+        self.name = self.shm.name
+        self.buf = self.shm.buf
+        self._write_locks = [threading.Lock() for _ in range(self.max_devices)]
+        self._register_lock = threading.Lock()
+        self._publish_lock = threading.Lock()  # numerele globale sunt date și scrise în ordine
+
+    # ------------------ Layout ------------------
+    def _entry_size(self):
+        return ENTRY_HEAD.size + MSG_SIZE
+
+    def _slot_size(self):
+        return SLOT_HEAD.size + SNAPSHOT_SIZE + RAW_SIZE + PROFILE_SIZE + self.ring * self._entry_size()
+
+    def _total_size(self):
+        return HEADER.size + self.max_devices * self._slot_size()
+
+    def _slot(self, idx: int) -> int:
+        return HEADER.size + idx * self._slot_size()
+
+    def _entry(self, idx: int, n: int) -> int:
+        return self._slot(idx) + SLOT_HEAD.size + SNAPSHOT_SIZE + RAW_SIZE + PROFILE_SIZE + (n % self.ring) * self._entry_size()
+
+    def n_devices(self) -> int:
+        return HEADER.unpack_from(self.buf, 0)[4]
+
+    def close(self, unlink: bool = False):
+        self.buf = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+    # ------------------ Seqlock ------------------
+    def _read_consistent(self, off: int, size: int) -> bytes:
+        """Copie consistentă a zonei [off, off+size) protejate de seq-ul de la `off`."""
+        buf = self.buf
+        spins = 0
+        while True:
+            s1 = _SEQ.unpack_from(buf, off)[0]
+            if not s1 & 1:
+                data = bytes(buf[off:off + size])
+                if _SEQ.unpack_from(buf, off)[0] == s1:
+                    return data
+            spins += 1
+            if spins % 64 == 0:
+                time.sleep(0)  # scriitorul e în mijlocul unei actualizări
+
+    # ------------------ Writer (procesul de ingest) ------------------
+    def register(self, device_id: str, port: str) -> int:
+        with self._register_lock:
+            n = self.n_devices()
+            for idx in range(n):
+                if self.read_head(idx)["device_id"] == device_id:
+                    return idx
+            if n >= self.max_devices:
+                raise RuntimeError(f"Shared state is full ({self.max_devices} devices)")
+            self.write_device(n, {"device_id": device_id, "port": port or ""})
+            struct.pack_into("<I", self.buf, 16, n + 1)
+            return n
+
+    def write_device(self, idx: int, info: dict, snapshot: dict = None, raw_lines=None, profile=None):
+        """Scrie starea dispozitivului în slot (sub seqlock). Zonele JSON omise rămân neschimbate."""
+        off = self._slot(idx)
+        blobs = {}
+        if snapshot is not None:
+            blobs["snapshot"] = json.dumps(snapshot).encode("utf-8")[:SNAPSHOT_SIZE]
+        if raw_lines is not None:
+            lines = list(raw_lines)[-RAW_LINES:]
+            data = json.dumps(lines).encode("utf-8")
+            while len(data) > RAW_SIZE and lines:
+                lines = lines[len(lines) // 4 + 1:]
+                data = json.dumps(lines).encode("utf-8")
+            blobs["raw"] = data
+        if profile is not None or "profile" in info:
+            blobs["profile"] = json.dumps(info.get("profile", profile)).encode("utf-8")[:PROFILE_SIZE]
+
+        with self._write_locks[idx]:
+            buf = self.buf
+            seq = _SEQ.unpack_from(buf, off)[0]
+            _SEQ.pack_into(buf, off, seq + 1)
+            old = SLOT_HEAD.unpack_from(buf, off)
+            head = list(old)
+            sensors = info.get("sensors")
+            binary = info.get("binary") or {}
+            updates = {
+                1: info.get("device_id", "").encode("utf-8")[:64] if "device_id" in info else None,
+                2: (info.get("port") or "").encode("utf-8")[:128] if "port" in info else None,
+                3: info.get("version"), 4: info.get("frames_read"), 5: info.get("lines_read"),
+                6: info.get("unknown_lines"), 7: binary.get("crc_errors"), 8: binary.get("dropped_frames"),
+                9: info.get("last_sensor_update"),
+                10: int(bool(info["connected"])) if "connected" in info else None,
+                11: (info.get("framing") or "").encode("utf-8")[:8] if "framing" in info else None,
+            }
+            for i, v in updates.items():
+                if v is not None:
+                    head[i] = v
+            if sensors is not None:
+                for j, k in enumerate(SENSOR_KEYS):
+                    head[12 + j] = float(sensors.get(k, 0.0))
+            base = 12 + len(SENSOR_KEYS)  # last_msg, snapshot_len, raw_len, profile_len
+            area = off + SLOT_HEAD.size
+            if "snapshot" in blobs:
+                buf[area:area + len(blobs["snapshot"])] = blobs["snapshot"]
+                head[base + 1] = len(blobs["snapshot"])
+            area += SNAPSHOT_SIZE
+            if "raw" in blobs:
+                buf[area:area + len(blobs["raw"])] = blobs["raw"]
+                head[base + 2] = len(blobs["raw"])
+            area += RAW_SIZE
+            if "profile" in blobs:
+                buf[area:area + len(blobs["profile"])] = blobs["profile"]
+                head[base + 3] = len(blobs["profile"])
+            _SLOT_FIELDS.pack_into(buf, off + _SEQ.size, *head[1:])
+            _SEQ.pack_into(buf, off, seq + 2)
+
+    def publish(self, idx: int, message: dict, event: str = None) -> int:
+        """Adaugă un mesaj în ring-ul dispozitivului; întoarce numărul mesajului (sau 0 dacă e prea mare)."""
+        data = json.dumps(message).encode("utf-8")
+        if len(data) > MSG_SIZE and "lines" in message:
+            data = json.dumps(dict(message, lines=[])).encode("utf-8")
+        if len(data) > MSG_SIZE:
+            return 0
+        last_off = self._slot(idx) + LAST_MSG
+        with self._publish_lock, self._write_locks[idx]:
+            buf = self.buf
+            n = _SEQ.unpack_from(buf, last_off)[0] + 1
+            g = _SEQ.unpack_from(buf, ALL_MSG)[0] + 1
+            e = self._entry(idx, n)
+            _SEQ.pack_into(buf, e, 2 * n + 1)
+            _ENTRY_FIELDS.pack_into(buf, e + _SEQ.size, len(data), g, (event or "").encode("utf-8")[:16])
+            start = e + ENTRY_HEAD.size
+            buf[start:start + len(data)] = data
+            _SEQ.pack_into(buf, e, 2 * n + 2)
+            _SEQ.pack_into(buf, last_off, n)
+            _SEQ.pack_into(buf, ALL_MSG, g)  # după intrare: mesajele cu număr global <= g sunt complete
+        return n
+
+    # ------------------ Reader (procesele worker) ------------------
+    def read_head(self, idx: int) -> dict:
+        off = self._slot(idx)
+        return self._head_dict(SLOT_HEAD.unpack(self._read_consistent(off, SLOT_HEAD.size)))
+
+    @staticmethod
+    def _head_dict(head) -> dict:
+        base = 12 + len(SENSOR_KEYS)
+        return {
+            "device_id": _str(head[1]),
+            "port": _str(head[2]) or None,
+            "version": head[3],
+            "frames_read": head[4],
+            "lines_read": head[5],
+            "unknown_lines": head[6],
+            "crc_errors": head[7],
+            "dropped_frames": head[8],
+            "last_sensor_update": head[9],
+            "connected": bool(head[10]),
+            "framing": _str(head[11]) or None,
+            "sensors": dict(zip(SENSOR_KEYS, head[12:base])),
+            "last_msg": head[base],
+        }
+
+    def read_slot(self, idx: int, which=("snapshot", "raw", "profile")):
+        """(antet, {zonă: JSON decodat sau None}) dintr-o singură copie consistentă a slotului.
+
+        Antetul și zonele provin din aceeași scriere, deci aparțin aceleiași versiuni.
+        """
+        off = self._slot(idx)
+        data = self._read_consistent(off, SLOT_HEAD.size + SNAPSHOT_SIZE + RAW_SIZE + PROFILE_SIZE)
+        head = SLOT_HEAD.unpack_from(data, 0)
+        base = 12 + len(SENSOR_KEYS)
+        blobs = {}
+        for name in which:
+            start = SLOT_HEAD.size + {"snapshot": 0, "raw": SNAPSHOT_SIZE, "profile": SNAPSHOT_SIZE + RAW_SIZE}[name]
+            length = head[base + {"snapshot": 1, "raw": 2, "profile": 3}[name]]
+            blobs[name] = json.loads(data[start:start + length]) if length else None
+        return self._head_dict(head), blobs
+
+    def read_blob(self, idx: int, which: str):
+        """Zona JSON `snapshot`, `raw` sau `profile`, decodată (None dacă e goală)."""
+        return self.read_slot(idx, (which,))[1][which]
+
+    def last_msg(self, idx: int) -> int:
+        return _SEQ.unpack_from(self.buf, self._slot(idx) + LAST_MSG)[0]
+
+    def last_all_msg(self) -> int:
+        """Numărul global al ultimului mesaj complet scris, pe oricare dispozitiv."""
+        return _SEQ.unpack_from(self.buf, ALL_MSG)[0]
+
+    def read_message(self, idx: int, n: int):
+        """("ok", event, date, număr global) / ("pending", ...) dacă încă nu e scris /
+        ("lost", ...) dacă a fost suprascris."""
+        e = self._entry(idx, n)
+        buf = self.buf
+        s1 = _SEQ.unpack_from(buf, e)[0]
+        if s1 < 2 * n + 2:
+            return "pending", None, None, None
+        if s1 > 2 * n + 2:
+            return "lost", None, None, None
+        _, length, g, event = ENTRY_HEAD.unpack_from(buf, e)
+        start = e + ENTRY_HEAD.size
+        data = bytes(buf[start:start + min(length, MSG_SIZE)])
+        if _SEQ.unpack_from(buf, e)[0] != s1:
+            return "lost", None, None, None
+        return "ok", _str(event) or None, data, g
+
+
+# ------------------ Ingest Process ------------------
+class SharedMemoryIngest(IngestManager):
+    """IngestManager care publică în memoria partajată în loc de hub-urile SSE locale."""
+
+    def __init__(self, state: SharedState, *args, sync_seconds: float = 0.5, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.state = state
+        self.sync_seconds = sync_seconds
+        self._slots = {}
+
+    def _register(self, device_id: str, port: str) -> DeviceState:
+        dev = super()._register(device_id, port)
+        if device_id not in self._slots:
+            self._slots[device_id] = self.state.register(device_id, port)
+        return dev
+
+    def sync(self, dev: DeviceState, frame: bool = False):
+        idx = self._slots.get(dev.device_id)
+        if idx is None:
+            return
+        info = dev.info()
+        if frame:
+            # Versiunea, senzorii, câmpurile și liniile brute vin din același Snapshot și sunt scrise
+            # într-o singură actualizare a slotului: un worker nu poate vedea versiunea N cu date din N+1
+            snap = dev.snapshot
+            info.update(version=snap.version, sensors=snap.sensors, last_sensor_update=snap.time)
+            self.state.write_device(idx, info, snapshot=snap.fields, raw_lines=snap.raw)
+        else:
+            # Sincronizarea periodică (alt thread) actualizează doar starea conexiunii și contoarele
+            for key in ("version", "sensors", "last_sensor_update"):
+                info.pop(key, None)
+            self.state.write_device(idx, info)
+
+    def publish(self, dev: DeviceState, message: dict, event: str = None):
+        idx = self._slots.get(dev.device_id)
+        if idx is not None:
+            self.state.publish(idx, message, event)
+
+    def handle_frame(self, dev: DeviceState, frame: dict):
+        super().handle_frame(dev, frame)
+        self.sync(dev, frame=True)
+
+    def set_profile(self, device_id: str, profile):
+        idx = self._slots.get(device_id)
+        if idx is not None:
+            self.state.write_device(idx, {"profile": profile})
+
+    def _sync_forever(self):
+        # Starea conexiunii și liniile fără cadru complet nu trec prin handle_frame
+        while True:
+            for dev in self.devices():
+                self.sync(dev)
+            time.sleep(self.sync_seconds)
+
+    def start(self):
+        super().start()
+        threading.Thread(target=self._sync_forever, name="shm-sync", daemon=True).start()
+
+
+def control_loop(queue, ingest: SharedMemoryIngest, streaming):
+    """Comenzile trimise de workeri (profilul pacientului) sunt aplicate în procesul de ingest."""
+    while True:
+        cmd, device_id, payload = queue.get()
+        dev = ingest.get_device(device_id)
+        if dev is None:
+            continue
+        if cmd == "set_profile":
+            ingest.set_profile(dev.device_id, streaming.set_profile(dev, payload))
+        elif cmd == "clear_profile":
+            streaming.clear_profile(dev.device_id)
+            ingest.set_profile(dev.device_id, None)
+
+
+# ------------------ Worker Processes ------------------
+class SharedDeviceView:
+    """Vederea unui worker asupra unui dispozitiv: aceleași metode ca DeviceState, citite din memorie.
+
+    Snapshot-ul e reconstruit doar când versiunea din slot se schimbă, deci /api/latest repetat
+    (și corpul lui JSON) costă o citire de antet între cadre.
+    """
+
+    def __init__(self, state: SharedState, idx: int, device_id: str, hub, poll_s: float = 0.01):
+        self.state = state
+        self.idx = idx
+        self.device_id = device_id
+        self.hub = hub
+        self.poll_s = poll_s
+        self.cursor = state.last_msg(idx)
+        self.lost_messages = 0
+        self.epoch = format(zlib.crc32(f"{state.name}/{device_id}".encode("utf-8")), "x")
+        self._snapshot = Snapshot(device_id, version=-1)
+
+    def sensors(self) -> dict:
+        return self.state.read_head(self.idx)["sensors"]
+
+    def versioned_sensors(self):
+        head = self.state.read_head(self.idx)
+        return head["version"], head["sensors"]
+
+    @property
+    def snapshot(self) -> Snapshot:
+        head = self.state.read_head(self.idx)
+        snap = self._snapshot
+        if snap.version != head["version"]:
+            # Antetul și zonele dintr-o singură citire: dacă între timp a venit alt cadru, e folosit acela
+            head, blobs = self.state.read_slot(self.idx, ("snapshot", "raw"))
+            raw = blobs["raw"] or []
+            snap = Snapshot(self.device_id, head["version"], head["last_sensor_update"], head["sensors"],
+                            blobs["snapshot"] or {}, tuple(raw[-RAW_TAIL:]))
+            self._snapshot = snap
+        return snap
+
+    def wait_for(self, version: int, timeout: float) -> Snapshot:
+        # Procesul de ingest nu poate notifica workerii: antetul slotului e citit la fiecare poll_s
+        deadline = time.monotonic() + timeout
+        while self.state.read_head(self.idx)["version"] < version and time.monotonic() < deadline:
+            time.sleep(self.poll_s)
+        return self.snapshot
+
+    @property
+    def latest_snapshot(self) -> dict:
+        return self.snapshot.fields
+
+    @property
+    def latest_raw_lines(self) -> list:
+        return self.state.read_blob(self.idx, "raw") or []
+
+    def info(self) -> dict:
+        head = self.state.read_head(self.idx)
+        return {
+            "device_id": self.device_id,
+            "port": head["port"],
+            "connected": head["connected"],
+            "lines_read": head["lines_read"],
+            "frames_read": head["frames_read"],
+            "version": head["version"],
+            "unknown_lines": head["unknown_lines"],
+            "framing": head["framing"],
+            "binary": ({"crc_errors": head["crc_errors"], "dropped_frames": head["dropped_frames"]}
+                       if head["framing"] == "binary" else None),
+            "last_sensor_update": head["last_sensor_update"],
+            "subscribers": self.hub.stats()["subscribers"],
+            "lost_messages": self.lost_messages,
+        }
+
+
+class _PlaceholderView:
+    device_id = "default"
+    epoch = "0"
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.latest_snapshot = {}
+        self.latest_raw_lines = []
+        self.snapshot = Snapshot(self.device_id)
+
+    def wait_for(self, version: int, timeout: float) -> Snapshot:
+        if version > self.snapshot.version:
+            time.sleep(timeout)
+        return self.snapshot
+
+    def sensors(self):
+        return dict.fromkeys(SENSOR_KEYS, 0.0)
+
+    def versioned_sensors(self):
+        return 0, self.sensors()
+
+
+class SharedIngestView:
+    """Înlocuiește IngestManager într-un worker: dispozitivele și mesajele SSE vin din memoria partajată.
+
+    Un thread citește ring-urile la fiecare `poll_s` și republică mesajele noi în hub-urile locale,
+    deci fiecare worker servește /stream din propriul BroadcastHub. Mesajele păstrează numerele din
+    memoria partajată ca id SSE, așa că un client se poate reconecta la alt worker cu Last-Event-ID.
+    """
+
+    def __init__(self, state: SharedState, hub_factory, poll_s: float = 0.005):
+        self.state = state
+        self.hub_factory = hub_factory
+        self.poll_s = poll_s
+        self.all_hub = hub_factory()
+        self._devices = {}
+        self._lock = threading.Lock()
+        self._started = False
+        self._placeholder = _PlaceholderView(hub_factory())
+        self.frame_listeners = []
+
+    def _refresh(self):
+        n = self.state.n_devices()
+        if n == len(self._devices):
+            return
+        with self._lock:
+            for idx in range(len(self._devices), n):
+                device_id = self.state.read_head(idx)["device_id"]
+                self._devices[device_id] = SharedDeviceView(self.state, idx, device_id, self.hub_factory())
+
+    def devices(self):
+        self._refresh()
+        with self._lock:
+            return list(self._devices.values())
+
+    def get_device(self, device_id: str = None):
+        self._refresh()
+        with self._lock:
+            if device_id:
+                return self._devices.get(device_id)
+            for dev in self._devices.values():
+                return dev
+            return self._placeholder
+
+    def connected_count(self) -> int:
+        return sum(1 for d in self.devices() if self.state.read_head(d.idx)["connected"])
+
+    def add_frame_listener(self, fn):
+        self.frame_listeners.append(fn)  # cadrele sunt procesate în procesul de ingest
+
+    def publish(self, dev, message: dict, event: str = None, seq: int = None, all_seq: int = None):
+        dev.hub.publish(message, event=event, seq=seq)
+        self.all_hub.publish(dict(message, device_id=dev.device_id), event=event, seq=all_seq)
+
+    def poll(self):
+        """Republică mesajele noi din ring-uri, în ordinea numărului global."""
+        # Doar până la contorul global citit acum: mesajele de până la el sunt toate complete, deci
+        # niciunul nu poate apărea mai târziu cu un număr mai mic decât cele deja trimise în all_hub
+        upto = self.state.last_all_msg()
+        batch = []
+        for dev in self.devices():
+            last = self.state.last_msg(dev.idx)
+            while dev.cursor < last:
+                status, event, data, g = self.state.read_message(dev.idx, dev.cursor + 1)
+                if status == "pending" or (status == "ok" and g > upto):
+                    break
+                dev.cursor += 1
+                if status == "lost":
+                    dev.lost_messages += 1
+                    continue
+                batch.append((g, dev, dev.cursor, event, data))
+        batch.sort(key=lambda m: m[0])
+        for g, dev, n, event, data in batch:
+            self.publish(dev, json.loads(data), event, seq=n, all_seq=g)
+
+    def _poll_forever(self):
+        while True:
+            self.poll()
+            time.sleep(self.poll_s)
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._poll_forever, name="shm-poll", daemon=True).start()
+
+
+class SessionProxy:
+    """Profilurile pacienților în modul multi-proces: trimise procesului de ingest, citite din memorie."""
+
+    def __init__(self, queue, normalize, view: SharedIngestView):
+        self.queue = queue
+        self.normalize = normalize
+        self.view = view
+        self.inferences = 0
+
+    def set_profile(self, device, profile: dict) -> dict:
+        profile = self.normalize(profile)
+        self.queue.put(("set_profile", device.device_id, profile))
+        return profile
+
+    def get_profile(self, device_id: str):
+        dev = self.view.get_device(device_id)
+        return dev.state.read_blob(dev.idx, "profile") if isinstance(dev, SharedDeviceView) else None
+
+    def clear_profile(self, device_id: str) -> bool:
+        self.queue.put(("clear_profile", device_id, None))
+        return True
+
+    def on_frame(self, device, frame):
+        pass
+
+    def stats(self) -> dict:
+        return {"mode": "ingest-process"}
+
+
+# ------------------ Process Role ------------------
+class _Role:
+    def __init__(self, role: str, state: SharedState, queue):
+        self.role = role
+        self.state = state
+        self.queue = queue
+
+
+_current = None
+
+
+def configure(role: str, shm_name: str, queue):
+    """Apelat de serve.py în fiecare proces copil, înainte de importul appserver."""
+    global _current
+    _current = _Role(role, SharedState(shm_name), queue)
+
+
+def current():
+    return _current
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import { BrowserRouter as Router, Routes, Route, useNavigate, useLocation } from 'react-router-dom';
 import { Stethoscope, User, AlertCircle, CheckCircle2, Loader2, Wind } from 'lucide-react';
 
@@ -19,6 +19,7 @@ interface FormErrors {
 interface ResultData {
   diagnosis: string;
   confidence: number;
+  device_id?: string;
 }
 
 // ----------------------------
@@ -76,20 +77,33 @@ function DiagnosticForm() {
       });
     }, 200);
 
+    const patient = JSON.stringify({
+      Age: parseFloat(formData.age),
+      Sex: parseInt(formData.sex),
+      Smoker: parseInt(formData.smoker),
+      Cough: formData.cough ? 1 : 0,
+      Fatigue: formData.fatigue ? 1 : 0,
+      Fever: formData.fever ? 1 : 0,
+      Shortness_of_breath: formData.shortness_of_breath ? 1 : 0,
+      Hour_Of_Day: new Date().getHours()
+    });
+
     try {
+      // Profilul rămâne înregistrat pe server: predicțiile următoare vin singure pe SSE,
+      // pe canalul dispozitivului pe care a fost înregistrat
+      const session = await fetch('http://127.0.0.1:5000/api/session/patient', {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/json' },
+        body: patient,
+      });
+      if (!session.ok) throw new Error(`Session error! status: ${session.status}`);
+      // device_id e null când niciun analizor nu e conectat: pagina de rezultat nu deschide stream-ul
+      const { device_id } = await session.json();
+
       const response = await fetch('http://127.0.0.1:5000/predict', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-          Age: parseFloat(formData.age),
-          Sex: parseInt(formData.sex),
-          Smoker: parseInt(formData.smoker),
-          Cough: formData.cough ? 1 : 0,
-          Fatigue: formData.fatigue ? 1 : 0,
-          Fever: formData.fever ? 1 : 0,
-          Shortness_of_breath: formData.shortness_of_breath ? 1 : 0,
-          Hour_Of_Day: new Date().getHours()
-        }),
+        body: patient,
       });
 
       if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
@@ -99,7 +113,7 @@ function DiagnosticForm() {
       setFeedbackMessage('');
       setIsSubmitting(false);
 
-      navigate('/result', { state: data });
+      navigate('/result', { state: { ...data, device_id: device_id ?? undefined } });
     } catch (err) {
       console.error(err);
       clearInterval(interval);
@@ -278,7 +292,21 @@ function DiagnosticForm() {
 // ----------------------------
 function ResultPage() {
   const location = useLocation();
-  const data = location.state as ResultData;
+  const [data, setData] = useState<ResultData | null>(location.state as ResultData);
+
+  const deviceId = data?.device_id;
+
+  // Rezultatul se actualizează la fiecare predicție publicată pentru cadrele noi ale acestui dispozitiv
+  // (canalul agregat /stream ar aduce și diagnosticele altor analizoare)
+  useEffect(() => {
+    if (!deviceId) return;
+    const source = new EventSource(`http://127.0.0.1:5000/stream/${encodeURIComponent(deviceId)}?mode=delta`);
+    source.addEventListener('prediction', (e: MessageEvent) => {
+      const msg = JSON.parse(e.data);
+      setData({ diagnosis: msg.diagnosis, confidence: msg.confidence, device_id: deviceId });
+    });
+    return () => source.close();
+  }, [deviceId]);
 
   if (!data) {
     return <div className="p-10 text-center">No data available</div>;
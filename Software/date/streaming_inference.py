@@ -0,0 +1,180 @@
+import threading
+import time
+
+import numpy as np
+
+import features
+from logs import get_logger
+from metrics import stage
+
+log = get_logger("stream")
+_FEATURES = stage("features")
+
+PROFILE_KEYS = list(features.PATIENT_DEFAULTS) + features.SYMPTOM_KEYS
+
+
+def normalize_profile(data: dict) -> dict:
+    """Doar câmpurile pacientului, ca float (aceleași reguli ca în patient_columns)."""
+    cols = features.patient_columns([data])
+    return {k: float(cols[k][0]) for k in PROFILE_KEYS}
+
+
+# ------------------ Streaming Inference ------------------
+class StreamingInference:
+    """Scorează fiecare dispozitiv o singură dată per cadru nou și publică rezultatul pe SSE.
+
+    Cititorul serial doar marchează dispozitivul ca modificat (on_frame nu blochează).
+    Un worker rulează predicția pentru profilul de pacient înregistrat pe sesiunea
+    dispozitivului, cel mult o dată la `min_interval_s`, după o fereastră de `debounce_s`
+    care adună rafalele de cadre, și doar dacă senzorii s-au schimbat semnificativ
+    (|Δ| > max(abs_tolerance, rel_tolerance·|valoare|)) sau s-a schimbat profilul.
+    """
+
+    def __init__(self, score_fn, publish_fn, min_interval_s: float = 1.0, debounce_s: float = 0.2,
+                 rel_tolerance: float = 0.01, abs_tolerance: float = 1e-6):
+        self.score_fn = score_fn      # X (1, n_features) -> probabilități (1, n_classes)
+        self.publish_fn = publish_fn  # (device, rezultat) -> None
+        self.min_interval_s = min_interval_s
+        self.debounce_s = debounce_s
+        self.rel_tolerance = rel_tolerance
+        self.abs_tolerance = abs_tolerance
+
+        self._cond = threading.Condition()
+        self._profiles = {}   # device_id -> profil normalizat
+        self._devices = {}    # device_id -> DeviceState
+        self._dirty = {}      # device_id -> momentul primului cadru neprocesat
+        self._last_run = {}   # device_id -> momentul ultimei predicții
+        self._last_inputs = {}  # device_id -> (profil, vector senzori) folosite ultima dată
+        self._failures = {}   # device_id -> eșecuri consecutive ale inferenței
+        self._thread = None
+
+        self.frames_seen = 0
+        self.inferences = 0
+        self.skipped_unchanged = 0
+        self.errors = 0
+
+    # ------------------ Sessions ------------------
+    def set_profile(self, device, profile: dict) -> dict:
+        profile = normalize_profile(profile)
+        if hasattr(device, "reset_plateau"):
+            device.reset_plateau()  # platoul DSP al pacientului anterior nu mai e folosit
+        with self._cond:
+            self._profiles[device.device_id] = profile
+            self._devices[device.device_id] = device
+            self._dirty.setdefault(device.device_id, time.monotonic())
+            self._cond.notify()
+        self.start()
+        return profile
+
+    def get_profile(self, device_id: str):
+        with self._cond:
+            return self._profiles.get(device_id)
+
+    def clear_profile(self, device_id: str) -> bool:
+        with self._cond:
+            device = self._devices.get(device_id)
+            self._dirty.pop(device_id, None)
+            self._last_inputs.pop(device_id, None)
+            self._failures.pop(device_id, None)
+            removed = self._profiles.pop(device_id, None) is not None
+        if hasattr(device, "reset_plateau"):
+            device.reset_plateau()
+        return removed
+
+    # ------------------ Frames ------------------
+    def on_frame(self, device, frame: dict):
+        """Apelat din cititorul serial după fiecare cadru; doar marchează dispozitivul."""
+        if not frame["sensors"]:
+            return
+        with self._cond:
+            self.frames_seen += 1
+            if device.device_id not in self._profiles:
+                return
+            self._devices[device.device_id] = device
+            if device.device_id not in self._dirty:
+                self._dirty[device.device_id] = time.monotonic()
+                self._cond.notify()
+
+    def _due(self, device_id: str) -> float:
+        return max(self._dirty[device_id] + self.debounce_s,
+                   self._last_run.get(device_id, 0.0) + self.min_interval_s)
+
+    def _changed(self, device_id: str, profile: dict, sensors: np.ndarray) -> bool:
+        last = self._last_inputs.get(device_id)
+        if last is None or last[0] != profile:
+            return True
+        old = last[1]
+        return bool(np.any(np.abs(sensors - old) > np.maximum(self.abs_tolerance, self.rel_tolerance * np.abs(old))))
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    ready = [d for d in self._dirty if self._due(d) <= now]
+                    if ready:
+                        break
+                    timeout = min((self._due(d) for d in self._dirty), default=None)
+                    self._cond.wait(None if timeout is None else max(0.0, timeout - now))
+                jobs = []
+                for device_id in ready:
+                    del self._dirty[device_id]
+                    profile = self._profiles.get(device_id)
+                    if profile is not None:
+                        jobs.append((self._devices[device_id], profile))
+
+            for device, profile in jobs:
+                self._run(device, profile)
+
+    def _run(self, device, profile: dict):
+        version, sensors = device.versioned_sensors()
+        vec = np.array([sensors[k] for k in features.SENSOR_KEYS], dtype=np.float64)
+        with self._cond:
+            if not self._changed(device.device_id, profile, vec):
+                self.skipped_unchanged += 1
+                return
+            self._last_run[device.device_id] = time.monotonic()
+        if not np.all(np.isfinite(vec)):
+            return
+        try:
+            with _FEATURES.time():
+                X = features.records_to_matrix([profile], sensors)
+            probs = np.asarray(self.score_fn(X))[0]
+        except Exception as e:
+            with self._cond:
+                self.errors += 1
+                failures = self._failures[device.device_id] = self._failures.get(device.device_id, 0) + 1
+            # Traceback doar la primul eșec; apoi un WARNING la 2, 4, 8, ... eșecuri consecutive
+            if failures == 1:
+                log.exception("[Stream] Inference failed for %s: %s", device.device_id, e)
+            elif failures & (failures - 1) == 0:
+                log.warning("[Stream] Inference still failing for %s (%d in a row): %s", device.device_id, failures, e)
+            return
+        with self._cond:
+            self._last_inputs[device.device_id] = (profile, vec)
+            self.inferences += 1
+            failures = self._failures.pop(device.device_id, 0)
+        if failures:
+            log.info("[Stream] Inference for %s recovered after %d failures", device.device_id, failures)
+        self.publish_fn(device, {"version": version, "profile": profile, "probabilities": probs})
+
+    def start(self):
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name="streaming-inference", daemon=True)
+                self._thread.start()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "sessions": len(self._profiles),
+                "pending": len(self._dirty),
+                "frames_seen": self.frames_seen,
+                "inferences": self.inferences,
+                "skipped_unchanged": self.skipped_unchanged,
+                "errors": self.errors,
+                "failing_devices": len(self._failures),
+                "min_interval_s": self.min_interval_s,
+                "debounce_s": self.debounce_s,
+                "rel_tolerance": self.rel_tolerance,
+            }
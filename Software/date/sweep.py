@@ -0,0 +1,381 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import itertools
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from features import FEATURE_COLUMNS
+
+# Căutare de hiperparametri pentru rețeaua din train_model.build_model.
+#   1. Datele se pregătesc o singură dată: split stratificat train/val/test + StandardScaler, scrise
+#      ca .npy într-un director numit după hash-ul conținutului CSV-ului și al parametrilor de split.
+#      Rulările următoare (și toți workerii) le deschid ca memmap, fără să mai citească CSV-ul.
+#   2. Fiecare trial rulează într-un proces separat (spawn, TensorFlow nu suportă fork), cu un număr
+#      fix de thread-uri per worker și, unde se poate, cu nuclee CPU dedicate.
+#   3. Trialurile slabe se opresc devreme (regula medianei): după `warmup` epoci, un trial a cărui
+#      cea mai bună val_accuracy e sub mediana celorlalte trialuri la aceeași epocă e abandonat.
+#   4. Fiecare trial (terminat, oprit sau eșuat) e scris imediat în results.jsonl, cu metrici,
+#      dimensiunea modelului, latența NumPy pe un rând și timpul de rulare.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_FORMAT_VERSION = 1
+SPLITS = ("train", "val", "test")
+
+# Configurația din train_model (trialul 0, referința)
+BASELINE = {"units": [256, 128, 64], "dropout": [0.4, 0.3, 0.2], "learning_rate": 1e-3, "batch_size": 128}
+
+SPACE = {
+    "units": [[256, 128, 64], [128, 64, 32], [128, 64], [64, 32], [32, 16], [64], [32], [16]],
+    "dropout": [0.0, 0.1, 0.2, 0.3],
+    "learning_rate": [3e-4, 1e-3, 3e-3],
+    "batch_size": [64, 128, 256, 512],
+}
+
+
+# ------------------ Dataset Cache ------------------
+def file_digest(path, block=1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(block)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_key(data_path, limit=None, test_size=0.2, val_size=0.15, seed=42) -> str:
+    """Hash-ul conținutului + al tuturor parametrilor care schimbă array-urile rezultate."""
+    params = {"format": CACHE_FORMAT_VERSION, "data": file_digest(data_path), "limit": limit,
+              "test_size": test_size, "val_size": val_size, "seed": seed, "features": FEATURE_COLUMNS}
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def build_cache(data_path, cache_dir, limit=None, test_size=0.2, val_size=0.15, seed=42) -> str:
+    """Întoarce directorul cu X_{split}.npy / y_{split}.npy; îl construiește doar dacă lipsește."""
+    key = cache_key(data_path, limit, test_size, val_size, seed)
+    path = os.path.join(cache_dir, key)
+    if os.path.exists(os.path.join(path, "meta.json")):
+        print(f"[Sweep] Reusing dataset cache {path}")
+        return path
+
+    import joblib
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+    from features import add_derived_features
+
+    t0 = time.perf_counter()
+    df = add_derived_features(pd.read_csv(data_path, nrows=limit))
+    le = LabelEncoder()
+    y = le.fit_transform(df["Diagnosis"]).astype(np.int32)
+    # Ca în train_model.load_in_memory: scaler pe tot setul, apoi split-ul de test cu aceeași sămânță
+    scaler = StandardScaler()
+    X = scaler.fit_transform(df[FEATURE_COLUMNS].to_numpy(dtype=np.float64)).astype(np.float32)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=seed, stratify=y)
+    X_train, X_val, y_train, y_val = train_test_split(X_train, y_train, test_size=val_size,
+                                                      random_state=seed, stratify=y_train)
+
+    # Scriere într-un director temporar + rename, ca un worker să nu vadă un cache pe jumătate scris
+    tmp = f"{path}.tmp{os.getpid()}"
+    os.makedirs(tmp, exist_ok=True)
+    arrays = {"train": (X_train, y_train), "val": (X_val, y_val), "test": (X_test, y_test)}
+    for name, (Xs, ys) in arrays.items():
+        np.save(os.path.join(tmp, f"X_{name}.npy"), np.ascontiguousarray(Xs))
+        np.save(os.path.join(tmp, f"y_{name}.npy"), ys)
+    joblib.dump(scaler, os.path.join(tmp, "scaler.save"))
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump({"key": key, "source": os.path.abspath(data_path), "limit": limit, "classes": list(le.classes_),
+                   "counts": {name: int(len(a[1])) for name, a in arrays.items()}}, f, indent=2)
+    try:
+        os.replace(tmp, path)
+    except OSError:
+        # Alt proces a terminat primul; cache-ul lui e identic
+        import shutil
+        shutil.rmtree(tmp, ignore_errors=True)
+    print(f"[Sweep] Dataset cache {path} built in {time.perf_counter() - t0:.1f}s")
+    return path
+
+
+def open_cache(path):
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    data = {}
+    for name in SPLITS:
+        data[name] = (np.load(os.path.join(path, f"X_{name}.npy"), mmap_mode="r"),
+                      np.load(os.path.join(path, f"y_{name}.npy"), mmap_mode="r"))
+    return data, meta
+
+
+# ------------------ Search Space ------------------
+def normalize_config(config) -> dict:
+    """Dropout scalar -> unul per strat; cheile lipsă vin din BASELINE."""
+    cfg = dict(BASELINE, **config)
+    units = [int(u) for u in cfg["units"]]
+    dropout = cfg["dropout"]
+    if not isinstance(dropout, (list, tuple)):
+        dropout = [dropout] * len(units)
+    if len(dropout) != len(units):
+        raise ValueError(f"dropout {dropout} does not match units {units}")
+    return {"units": units, "dropout": [float(d) for d in dropout],
+            "learning_rate": float(cfg["learning_rate"]), "batch_size": int(cfg["batch_size"])}
+
+
+def sample_configs(space, n, seed=42, include_baseline=True):
+    """Trialul 0 e configurația din train_model; restul sunt eșantionate fără repetiție din spațiu."""
+    grid = [dict(zip(space, values)) for values in itertools.product(*space.values())]
+    rng = np.random.default_rng(seed)
+    configs = [normalize_config(BASELINE)] if include_baseline else []
+    for i in rng.permutation(len(grid)):
+        if len(configs) >= n:
+            break
+        cfg = normalize_config(grid[i])
+        if cfg not in configs:
+            configs.append(cfg)
+    return configs
+
+
+def n_params(units, n_features, n_classes) -> int:
+    """Parametrii după împăturirea BatchNorm (cei din modelul NumPy servit)."""
+    dims = [n_features] + list(units) + [n_classes]
+    return sum(a * b + b for a, b in zip(dims, dims[1:]))
+
+
+# ------------------ Pruning ------------------
+class MedianPruner:
+    """Regula medianei peste curbele val_accuracy partajate între procese (dict de la Manager)."""
+
+    def __init__(self, curves, warmup=5, min_trials=3):
+        self.curves = curves
+        self.warmup = warmup
+        self.min_trials = min_trials
+
+    def report(self, trial, epoch, value) -> bool:
+        """Înregistrează val_accuracy după `epoch` și întoarce True dacă trialul trebuie oprit."""
+        curve = list(self.curves.get(trial, [])) + [float(value)]
+        self.curves[trial] = curve
+        if epoch < self.warmup:
+            return False
+        others = [max(c[:epoch + 1]) for t, c in self.curves.items() if t != trial and len(c) > epoch]
+        if len(others) < self.min_trials:
+            return False
+        return max(curve) < float(np.median(others))
+
+
+# ------------------ Worker ------------------
+_WORKER = {}
+
+
+def _init_worker(cache_path, threads, curves, cores, warmup, min_trials):
+    # Limitele de thread-uri trebuie setate înainte de primul import TensorFlow/BLAS
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "TF_NUM_INTRAOP_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+    if cores is not None and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, cores.get_nowait())
+        except Exception:
+            pass  # mai mulți workeri decât grupuri de nuclee: rămâne afinitatea moștenită
+
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    tf.get_logger().setLevel("ERROR")
+
+    data, meta = open_cache(cache_path)
+    _WORKER.update(data=data, meta=meta, threads=threads, cache_path=cache_path,
+                   pruner=MedianPruner(curves, warmup, min_trials))
+
+
+def _numpy_latency_us(layers, row, repeat=200):
+    from numpy_model import NumpyMLP
+    model = NumpyMLP(layers)
+    model.predict(row)
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        model.predict(row)
+        times.append(time.perf_counter() - t0)
+    return round(float(np.percentile(np.asarray(times) * 1e6, 50)), 2)
+
+
+def run_trial(trial, config, epochs, patience, out_dir=None):
+    """Antrenează un trial în worker; întoarce un dict cu metrici (nu aruncă excepții)."""
+    t_start = time.perf_counter()
+    result = {"trial": trial, "config": config, "pid": os.getpid(), "threads": _WORKER.get("threads")}
+    try:
+        import tensorflow as tf
+        from sklearn.metrics import f1_score
+        from train_model import compile_model, make_callbacks
+        from numpy_model import fold_keras_model, save_npz
+
+        tf.keras.utils.set_random_seed(42 + trial)
+        data, meta = _WORKER["data"], _WORKER["meta"]
+        pruner = _WORKER["pruner"]
+        (X_train, y_train), (X_val, y_val), (X_test, y_test) = (data[s] for s in SPLITS)
+        classes = meta["classes"]
+
+        model = compile_model(X_train.shape[1], len(classes), config["units"], config["dropout"],
+                              config["learning_rate"])
+        pruned = []
+
+        def on_epoch_end(epoch, logs):
+            if pruner.report(trial, epoch, logs.get("val_accuracy", 0.0)):
+                pruned.append(epoch + 1)
+                model.stop_training = True
+
+        t_fit = time.perf_counter()
+        history = model.fit(X_train, y_train, validation_data=(X_val, y_val), epochs=epochs,
+                            batch_size=config["batch_size"], verbose=0,
+                            callbacks=make_callbacks(patience) + [tf.keras.callbacks.LambdaCallback(on_epoch_end=on_epoch_end)])
+        result["fit_s"] = round(time.perf_counter() - t_fit, 2)
+        result["epochs"] = len(history.history["loss"])
+        result["best_val_accuracy"] = round(float(max(history.history["val_accuracy"])), 6)
+        result["n_params"] = n_params(config["units"], X_train.shape[1], len(classes))
+        if pruned:
+            result["status"] = "pruned"
+            result["pruned_at_epoch"] = pruned[0]
+            return result
+
+        probs = model.predict(X_test, batch_size=4096, verbose=0)
+        y_pred = probs.argmax(axis=1)
+        result["status"] = "complete"
+        result["test_accuracy"] = round(float(np.mean(y_pred == y_test)), 6)
+        result["test_f1_macro"] = round(float(f1_score(y_test, y_pred, average="macro")), 6)
+        layers = fold_keras_model(model)  # datele sunt deja scalate: scaler-ul se împăturește la export
+        result["numpy_row_us"] = _numpy_latency_us(layers, np.asarray(X_test[:1]))
+        if out_dir:
+            import joblib
+            from model_bundles import write_manifest
+            scaler = joblib.load(os.path.join(_WORKER["cache_path"], "scaler.save"))
+            artifact = f"trial_{trial:03d}.npz"
+            save_npz(os.path.join(out_dir, artifact), fold_keras_model(model, scaler), FEATURE_COLUMNS)
+            write_manifest(os.path.join(out_dir, f"trial_{trial:03d}.bundle.json"), f"sweep-{trial:03d}", "numpy",
+                           artifact, FEATURE_COLUMNS, classes, sweep_config=config)
+            result["artifact"] = artifact
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {str(e)[:300]}"
+    finally:
+        result["wall_s"] = round(time.perf_counter() - t_start, 2)
+        try:
+            import tensorflow as tf
+            tf.keras.backend.clear_session()
+        except Exception:
+            pass
+    return result
+
+
+# ------------------ Runner ------------------
+def core_groups(threads):
+    """Grupuri disjuncte de `threads` nuclee din afinitatea curentă (None dacă nu se poate)."""
+    if not hasattr(os, "sched_getaffinity"):
+        return []
+    cores = sorted(os.sched_getaffinity(0))
+    return [set(cores[i:i + threads]) for i in range(0, len(cores) - threads + 1, threads)]
+
+
+def run_sweep(configs, cache_path, workers, threads, epochs, patience, warmup, min_trials, results_path, out_dir=None):
+    ctx = mp.get_context("spawn")
+    manager = ctx.Manager()
+    curves = manager.dict()
+    groups = core_groups(threads)
+    cores = None
+    if len(groups) >= workers:
+        cores = ctx.Queue()
+        for g in groups[:workers]:
+            cores.put(g)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    results = []
+    t0 = time.perf_counter()
+    with open(results_path, "a") as out, ProcessPoolExecutor(
+            max_workers=workers, mp_context=ctx, initializer=_init_worker,
+            initargs=(cache_path, threads, curves, cores, warmup, min_trials)) as pool:
+        futures = {pool.submit(run_trial, i, cfg, epochs, patience, out_dir): i for i, cfg in enumerate(configs)}
+        for fut in as_completed(futures):
+            r = fut.result()
+            r["cache"] = os.path.basename(cache_path)
+            results.append(r)
+            out.write(json.dumps(r) + "\n")
+            out.flush()
+            print(f"[Sweep] trial {r['trial']:>3} {r['status']:<8} units={r['config']['units']} "
+                  f"lr={r['config']['learning_rate']} bs={r['config']['batch_size']} "
+                  f"val={r.get('best_val_accuracy', float('nan')):.4f} test={r.get('test_accuracy', float('nan')):.4f} "
+                  f"epochs={r.get('epochs', 0)} {r['wall_s']}s ({len(results)}/{len(configs)})")
+    manager.shutdown()
+    print(f"[Sweep] {len(results)} trials in {time.perf_counter() - t0:.1f}s with {workers} worker(s) x {threads} thread(s)")
+    return results
+
+
+def summarize(results, tolerance=0.002):
+    """Clasament după acuratețea pe test, plus cel mai mic model aflat la `tolerance` de cel mai bun."""
+    done = sorted((r for r in results if r["status"] == "complete"),
+                  key=lambda r: (-r["test_accuracy"], r["n_params"]))
+    counts = {s: sum(1 for r in results if r["status"] == s) for s in ("complete", "pruned", "failed")}
+    print(f"\n{counts['complete']} complete, {counts['pruned']} pruned, {counts['failed']} failed")
+    if not done:
+        return None
+    print(f"{'trial':<7}{'units':<18}{'dropout':<18}{'lr':>8}{'batch':>7}{'params':>9}{'test acc':>10}"
+          f"{'F1':>8}{'row us':>9}{'epochs':>8}{'wall s':>8}")
+    for r in done:
+        c = r["config"]
+        print(f"{r['trial']:<7}{'-'.join(map(str, c['units'])):<18}{'/'.join(map(str, c['dropout'])):<18}"
+              f"{c['learning_rate']:>8}{c['batch_size']:>7}{r['n_params']:>9}{r['test_accuracy']:>10.4f}"
+              f"{r['test_f1_macro']:>8.4f}{r['numpy_row_us']:>9}{r['epochs']:>8}{r['wall_s']:>8}")
+    best = done[0]["test_accuracy"]
+    smallest = min((r for r in done if r["test_accuracy"] >= best - tolerance), key=lambda r: r["n_params"])
+    print(f"\nSmallest model within {tolerance} of the best accuracy: trial {smallest['trial']} "
+          f"({smallest['n_params']} params, accuracy {smallest['test_accuracy']:.4f}, {smallest['numpy_row_us']} us/row)")
+    return smallest
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Parallel hyperparameter sweep over the diagnosis MLP.")
+    ap.add_argument("--data", default=os.path.join(BASE_DIR, "airnalyzer_simulated_data_realistic_full_correlated.csv"))
+    ap.add_argument("--cache-dir", default=os.path.join(BASE_DIR, "sweep_cache"))
+    ap.add_argument("--out-dir", default=os.path.join(BASE_DIR, "sweep_runs"),
+                    help="results.jsonl and a NumPy bundle per completed trial")
+    ap.add_argument("--limit", type=int, default=None, help="only read the first N dataset rows")
+    ap.add_argument("--trials", type=int, default=16, help="number of configurations (trial 0 is the current model)")
+    ap.add_argument("--space", default=None, help="JSON file overriding the search space")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--threads", type=int, default=1, help="TensorFlow/BLAS threads per worker")
+    ap.add_argument("--workers", type=int, default=None, help="worker processes (default: CPUs / threads)")
+    ap.add_argument("--epochs", type=int, default=200, help="epoch cap per trial (early stopping still applies)")
+    ap.add_argument("--patience", type=int, default=10, help="early-stopping patience on val_loss")
+    ap.add_argument("--warmup", type=int, default=5, help="epochs before a trial can be pruned")
+    ap.add_argument("--min-trials", type=int, default=3, help="trials needed at an epoch before pruning applies")
+    ap.add_argument("--tolerance", type=float, default=0.002, help="accuracy slack when picking the smallest model")
+    ap.add_argument("--no-save", action="store_true", help="do not write per-trial model bundles")
+    args = ap.parse_args()
+
+    space = SPACE
+    if args.space:
+        with open(args.space) as f:
+            space = dict(SPACE, **json.load(f))
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    workers = args.workers or max(1, cpus // args.threads)
+
+    cache_path = build_cache(args.data, args.cache_dir, args.limit, seed=args.seed)
+    configs = sample_configs(space, args.trials, args.seed)
+    os.makedirs(args.out_dir, exist_ok=True)
+    results_path = os.path.join(args.out_dir, "results.jsonl")
+    print(f"[Sweep] {len(configs)} trials, {workers} worker(s) x {args.threads} thread(s), results -> {results_path}")
+
+    results = run_sweep(configs, cache_path, workers, args.threads, args.epochs, args.patience,
+                        args.warmup, args.min_trials, results_path, None if args.no_save else args.out_dir)
+    if summarize(results, args.tolerance) is None:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
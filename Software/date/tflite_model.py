@@ -0,0 +1,84 @@
+import threading
+
+import numpy as np
+
+# Runtime TFLite pentru modelele scrise de export_tflite.py.
+# Interpretorul vine din tflite_runtime (pachetul mic, fără TensorFlow), ai_edge_litert sau,
+# ca ultimă variantă, din tf.lite. Scaler-ul nu e în graf: modelul int8 își cuantizează
+# intrarea per tensor, ceea ce merge pentru features standardizate dar nu pentru cele brute
+# (Age ~ 50, CO2 ~ 1000), așa că standardizarea o face bundle-ul (model_bundles.Bundle).
+
+SMALL_BATCH = 16  # sub atâtea rânduri, invocările pe un rând sunt mai ieftine decât un batch fix plin
+
+
+def load_interpreter(path: str, num_threads: int = None):
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=path, num_threads=num_threads)
+
+
+class _Runner:
+    """Un interpretor cu batch fix; intrările/ieșirile cuantizate sunt convertite automat."""
+
+    def __init__(self, path: str, batch: int, num_threads: int = None):
+        self.interpreter = load_interpreter(path, num_threads)
+        inp = self.interpreter.get_input_details()[0]
+        if inp["shape"][0] != batch:
+            self.interpreter.resize_tensor_input(inp["index"], [batch, int(inp["shape"][1])])
+        self.interpreter.allocate_tensors()
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.batch = batch
+
+    def run(self, X: np.ndarray) -> np.ndarray:
+        dtype = self.input["dtype"]
+        if dtype != np.float32:
+            scale, zero = self.input["quantization"]
+            info = np.iinfo(dtype)
+            X = np.clip(np.round(X / scale + zero), info.min, info.max).astype(dtype)
+        self.interpreter.set_tensor(self.input["index"], X)
+        self.interpreter.invoke()
+        out = self.interpreter.get_tensor(self.output["index"])
+        if out.dtype != np.float32:
+            scale, zero = self.output["quantization"]
+            out = (out.astype(np.float32) - zero) * scale
+        return out.copy()
+
+
+class TFLiteModel:
+    """Forward pass pe features deja standardizate.
+
+    Un interpretor pentru un singur rând (cazul /predict) și unul cu batch fix pentru loturi;
+    redimensionarea tensorilor la fiecare cerere ar realoca tot graful. Interpretoarele nu sunt
+    thread-safe, deci apelurile sunt serializate.
+    """
+
+    def __init__(self, path: str, batch_size: int = 256, num_threads: int = None):
+        self.path = path
+        self._single = _Runner(path, 1, num_threads)
+        self._batch = _Runner(path, batch_size, num_threads) if batch_size > 1 else None
+        self._lock = threading.Lock()
+
+    def predict(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        n = len(X)
+        with self._lock:
+            if n == 0:
+                return np.zeros((0, int(self._single.output["shape"][1])), np.float32)
+            if n < SMALL_BATCH or self._batch is None:
+                return np.concatenate([self._single.run(X[i:i + 1]) for i in range(n)])
+            b = self._batch.batch
+            out = []
+            for start in range(0, n, b):
+                chunk = X[start:start + b]
+                if len(chunk) < b:
+                    # Ultima bucată: completare cu zero până la batch-ul fix
+                    chunk = np.concatenate([chunk, np.zeros((b - len(chunk), X.shape[1]), np.float32)])
+                out.append(self._batch.run(chunk)[:min(b, n - start)])
+            return np.concatenate(out)
@@ -0,0 +1,342 @@
+import os
+import json
+import threading
+
+import numpy as np
+
+# Stocare pe disc pentru istoricul senzorilor, append-only, memory-mapped și pe coloane:
+#
+#   <root>/<device_id>/raw/000000/ts.f64, CO2.f32, ...     citirile brute
+#   <root>/<device_id>/1s/000000/ts.f64, count.f32, CO2.min.f32, CO2.max.f32, CO2.mean.f32, ...
+#   <root>/<device_id>/1m/...   <root>/<device_id>/1h/...   agregări precalculate
+#
+# Fiecare segment are un număr fix de rânduri, prealocat; rândurile ocupate se recunosc
+# după ts > 0. Interogările pe un interval folosesc căutare binară pe ts, deci nu
+# scanează rândurile brute, iar pentru intervale lungi se citesc doar agregările.
+
+ROLLUPS = [("1s", 1), ("1m", 60), ("1h", 3600)]
+ROLLUP_STATS = ("min", "max", "mean")
+
+
+# ------------------ Segmented Columns ------------------
+class _Segment:
+    def __init__(self, path: str, columns: dict, rows: int, create: bool):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        mode = "w+" if create else "r+"
+        self.cols = {name: np.memmap(os.path.join(path, f"{name}.{np.dtype(dt).str[1:]}"),
+                                     dtype=dt, mode=mode, shape=(rows,))
+                     for name, dt in columns.items()}
+        self.count = 0
+        self.first_ts = self.last_ts = None
+        self.sync_count()
+
+    def sync_count(self) -> int:
+        """Rândurile ocupate, căutate doar după cele deja știute (scrise de alt proces); întoarce câte sunt noi."""
+        ts = self.cols["ts"]
+        tail = ts[self.count:]
+        new = len(tail) if not len(tail) or tail[-1] > 0 else int(np.argmin(tail > 0))
+        if new:
+            self.count += new
+            self.first_ts = float(ts[0])
+            self.last_ts = float(ts[self.count - 1])
+        return new
+
+    def flush(self):
+        for mm in self.cols.values():
+            mm.flush()
+
+
+class ColumnSeries:
+    """O serie de rânduri cu coloane de lățime fixă, împărțită în segmente memory-mapped."""
+
+    def __init__(self, path: str, columns: dict, segment_rows: int = 65536):
+        self.path = path
+        self.columns = {"ts": np.float64, **columns}
+        self.segment_rows = int(segment_rows)
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+        meta_path = os.path.join(path, "meta.json")
+        meta = {"columns": list(self.columns), "segment_rows": self.segment_rows}
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                old = json.load(f)
+            if old != meta:
+                raise ValueError(f"{path}: layout changed ({old} != {meta}); move the old history away")
+        else:
+            with open(meta_path, "w") as f:
+                json.dump(meta, f)
+
+        names = sorted(d for d in os.listdir(path) if d.isdigit())
+        self.segments = [_Segment(os.path.join(path, d), self.columns, self.segment_rows, create=False)
+                         for d in names]
+
+    @property
+    def last_ts(self):
+        return self.segments[-1].last_ts if self.segments and self.segments[-1].count else None
+
+    def append(self, row: dict):
+        """Adaugă un rând (dict coloană -> valoare; coloanele lipsă devin NaN)."""
+        with self.lock:
+            seg = self.segments[-1] if self.segments else None
+            if seg is None or seg.count >= self.segment_rows:
+                if seg is not None:
+                    seg.flush()
+                seg = _Segment(os.path.join(self.path, f"{len(self.segments):06d}"),
+                               self.columns, self.segment_rows, create=True)
+                self.segments.append(seg)
+            i = seg.count
+            for name, mm in seg.cols.items():
+                if name != "ts":
+                    mm[i] = row.get(name, np.nan)
+            seg.cols["ts"][i] = row["ts"]  # ultimul: ts > 0 marchează un rând complet pentru cititori
+            seg.count = i + 1
+            if seg.first_ts is None:
+                seg.first_ts = float(row["ts"])
+            seg.last_ts = float(row["ts"])
+
+    def read(self, t0: float, t1: float, columns=None) -> dict:
+        """Rândurile cu t0 <= ts < t1, ca array-uri copiate (sigure după eliberarea lock-ului)."""
+        names = ["ts"] + [c for c in (columns or self.columns) if c != "ts"]
+        parts = {n: [] for n in names}
+        with self.lock:
+            for seg in self.segments:
+                if not seg.count or seg.last_ts < t0 or seg.first_ts >= t1:
+                    continue
+                ts = seg.cols["ts"][:seg.count]
+                a, b = np.searchsorted(ts, [t0, t1], side="left")
+                if a < b:
+                    for n in names:
+                        parts[n].append(np.array(seg.cols[n][a:b]))
+        return {n: (np.concatenate(p) if p else np.empty(0, dtype=self.columns[n])) for n, p in parts.items()}
+
+    def tail(self, since: int, columns=None) -> dict:
+        """Rândurile cu indicele global >= `since` (cele apărute după o numărare anterioară)."""
+        names = ["ts"] + [c for c in (columns or self.columns) if c != "ts"]
+        parts = {n: [] for n in names}
+        with self.lock:
+            offset = 0
+            for seg in self.segments:
+                if offset + seg.count > since:
+                    a = max(since - offset, 0)
+                    for n in names:
+                        parts[n].append(np.array(seg.cols[n][a:seg.count]))
+                offset += seg.count
+        return {n: (np.concatenate(p) if p else np.empty(0, dtype=self.columns[n])) for n, p in parts.items()}
+
+    def refresh(self):
+        """Pentru cititori din alt proces: rândurile noi din ultimul segment și segmentele create între timp."""
+        with self.lock:
+            if self.segments and self.segments[-1].count < self.segment_rows:
+                self.segments[-1].sync_count()
+            names = sorted(d for d in os.listdir(self.path) if d.isdigit())
+            for d in names[len(self.segments):]:
+                try:
+                    seg = _Segment(os.path.join(self.path, d), self.columns, self.segment_rows, create=False)
+                except (OSError, ValueError):
+                    break  # scriitorul tocmai îl creează; apare la următoarea reîmprospătare
+                if self.segments and self.segments[-1].count < self.segment_rows:
+                    self.segments[-1].sync_count()
+                self.segments.append(seg)
+
+    def count(self) -> int:
+        with self.lock:
+            return sum(s.count for s in self.segments)
+
+    def flush(self):
+        with self.lock:
+            for seg in self.segments:
+                seg.flush()
+
+
+# ------------------ Rollups ------------------
+class _Bucket:
+    """Agregarea în curs pentru un interval (min/max/sumă/număr pe coloană, ignorând NaN)."""
+
+    def __init__(self, start: float, n_cols: int):
+        self.start = start
+        self.count = 0
+        self.min = np.full(n_cols, np.inf)
+        self.max = np.full(n_cols, -np.inf)
+        self.sum = np.zeros(n_cols)
+        self.n = np.zeros(n_cols)
+
+    def add(self, values: np.ndarray):
+        ok = ~np.isnan(values)
+        v = np.where(ok, values, 0.0)
+        self.count += 1
+        self.min = np.where(ok, np.minimum(self.min, values), self.min)
+        self.max = np.where(ok, np.maximum(self.max, values), self.max)
+        self.sum += v
+        self.n += ok
+
+    def add_rows(self, values: np.ndarray):
+        """Aceeași agregare pentru o matrice (rânduri, coloane), cu reduceri pe coloane."""
+        if not len(values):
+            return
+        ok = ~np.isnan(values)
+        self.count += len(values)
+        self.min = np.minimum(self.min, np.where(ok, values, np.inf).min(axis=0))
+        self.max = np.maximum(self.max, np.where(ok, values, -np.inf).max(axis=0))
+        self.sum += np.where(ok, values, 0.0).sum(axis=0)
+        self.n += ok.sum(axis=0)
+
+    def row(self, keys) -> dict:
+        has = self.n > 0
+        mean = np.divide(self.sum, self.n, out=np.full_like(self.sum, np.nan), where=has)
+        row = {"ts": self.start, "count": self.count}
+        for i, k in enumerate(keys):
+            row[f"{k}.min"] = self.min[i] if has[i] else np.nan
+            row[f"{k}.max"] = self.max[i] if has[i] else np.nan
+            row[f"{k}.mean"] = mean[i]
+        return row
+
+
+class DeviceHistory:
+    """Istoricul unui dispozitiv: citirile brute plus agregările 1s/1min/1h actualizate la fiecare citire.
+
+    reader=True: instanța doar citește ce scrie alt proces; refresh() aduce rândurile noi și
+    actualizează incremental intervalele deschise.
+    """
+
+    def __init__(self, path: str, keys, segment_rows: int = 65536, reader: bool = False):
+        self.keys = list(keys)
+        self.reader = reader
+        self.raw = ColumnSeries(os.path.join(path, "raw"), {k: np.float32 for k in self.keys}, segment_rows)
+        rollup_cols = {"count": np.float32}
+        for k in self.keys:
+            for stat in ROLLUP_STATS:
+                rollup_cols[f"{k}.{stat}"] = np.float32
+        self.levels = {name: ColumnSeries(os.path.join(path, name), rollup_cols, segment_rows)
+                       for name, _ in ROLLUPS}
+        self.seconds = dict(ROLLUPS)
+        self._open = {}  # nivel -> _Bucket în curs (încă nescris pe disc)
+        self._lock = threading.Lock()
+        self._last_ts = self.raw.last_ts or 0.0
+        self._seen = self.raw.count()
+        self._replay_open_buckets()
+
+    def _replay_open_buckets(self):
+        """După repornire, intervalele deschise (nescrise încă) se refac din citirile brute."""
+        if not self._last_ts:
+            return
+        start = min(self._last_ts - self._last_ts % seconds for _, seconds in ROLLUPS)
+        self._add_to_open_buckets(self.raw.read(start, np.inf, self.keys))
+
+    def _add_to_open_buckets(self, rows: dict):
+        """Rânduri brute noi (sortate după ts) adăugate vectorizat la intervalul deschis al fiecărui nivel."""
+        ts = rows["ts"]
+        if not len(ts):
+            return
+        values = np.column_stack([rows[k] for k in self.keys]).astype(np.float64)
+        last = float(ts[-1])
+        for name, seconds in ROLLUPS:
+            start = last - last % seconds
+            bucket = self._open.get(name)
+            if bucket is None or bucket.start != start:
+                # Intervalul anterior e deja pe disc (scris de proces-ul scriitor)
+                bucket = self._open[name] = _Bucket(start, len(self.keys))
+            bucket.add_rows(values[int(np.searchsorted(ts, start, side="left")):])
+        self._last_ts = last
+
+    def refresh(self):
+        if not self.reader:
+            return
+        with self._lock:
+            # Brutele întâi: scriitorul pune intervalul închis în agregări înaintea rândului care îl închide
+            self.raw.refresh()
+            for series in self.levels.values():
+                series.refresh()
+            total = self.raw.count()
+            if total > self._seen:
+                self._add_to_open_buckets(self.raw.tail(self._seen, self.keys))
+                self._seen = total
+
+    def append(self, ts: float, values: dict):
+        with self._lock:
+            ts = max(float(ts), self._last_ts)  # ceasul poate sări înapoi; seria rămâne sortată
+            self._last_ts = ts
+            vec = np.array([values.get(k, np.nan) for k in self.keys], dtype=np.float64)
+            for name, seconds in ROLLUPS:
+                start = ts - ts % seconds
+                bucket = self._open.get(name)
+                if bucket is not None and bucket.start != start:
+                    self.levels[name].append(bucket.row(self.keys))
+                    bucket = None
+                if bucket is None:
+                    bucket = self._open[name] = _Bucket(start, len(self.keys))
+                bucket.add(vec)
+            # După agregări: un cititor care vede rândul vede și intervalele închise de el
+            self.raw.append({"ts": ts, **values})
+
+    def query(self, level: str, t0: float, t1: float, keys=None) -> dict:
+        keys = [k for k in (keys or self.keys) if k in self.keys]
+        if level == "raw":
+            return self.raw.read(t0, t1, keys)
+        cols = ["count"] + [f"{k}.{s}" for k in keys for s in ROLLUP_STATS]
+        data = self.levels[level].read(t0, t1, cols)
+        with self._lock:
+            bucket = self._open.get(level)
+            row = bucket.row(self.keys) if bucket is not None and t0 <= bucket.start < t1 else None
+        if row is not None and len(data["ts"]) and data["ts"][-1] >= row["ts"]:
+            row = None  # un cititor poate vedea intervalul deja închis pe disc înaintea rândului următor
+        if row is not None:
+            # Intervalul curent, încă deschis, e adăugat la sfârșit ca să nu lipsească ultimele secunde
+            data = {n: np.append(a, row[n]) for n, a in data.items()}
+        return data
+
+    def flush(self):
+        self.raw.flush()
+        for series in self.levels.values():
+            series.flush()
+
+
+class TimeSeriesStore:
+    """Istoricul tuturor dispozitivelor, câte un director pentru fiecare device_id."""
+
+    def __init__(self, root: str, keys, segment_rows: int = 65536, reader: bool = False):
+        self.root = root
+        self.keys = list(keys)
+        self.segment_rows = segment_rows
+        # reader=True (workerii): un DeviceHistory per dispozitiv, ținut deschis și reîmprospătat la fiecare
+        # device() cu segmentele și rândurile noi scrise de procesul de ingest
+        self.reader = reader
+        self._devices = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def device(self, device_id: str, create: bool = True):
+        with self._lock:
+            hist = self._devices.get(device_id)
+            if hist is None:
+                path = os.path.join(self.root, device_id)
+                if not create and not os.path.isdir(path):
+                    return None
+                hist = DeviceHistory(path, self.keys, self.segment_rows, reader=self.reader)
+                self._devices[device_id] = hist
+        hist.refresh()
+        return hist
+
+    def append(self, device_id: str, ts: float, values: dict):
+        self.device(device_id).append(ts, values)
+
+    def device_ids(self):
+        with self._lock:
+            known = set(self._devices)
+        return sorted(known | {d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d))})
+
+    def flush(self):
+        with self._lock:
+            devices = list(self._devices.values())
+        for hist in devices:
+            hist.flush()
+
+
+def pick_resolution(t0: float, t1: float, max_points: int = 2000) -> str:
+    """Cea mai fină agregare care dă cel mult `max_points` puncte pe interval."""
+    span = max(t1 - t0, 0.0)
+    for name, seconds in ROLLUPS:
+        if span / seconds <= max_points:
+            return name
+    return ROLLUPS[-1][0]
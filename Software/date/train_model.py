@@ -1,3 +1,7 @@
+import os
+import json
+import argparse
+import itertools
 import pandas as pd
 import numpy as np
 import tensorflow as tf
@@ -7,131 +11,345 @@ from sklearn.metrics import classification_report, confusion_matrix
 import matplotlib.pyplot as plt
 import seaborn as sns
 import joblib
+from features import FEATURE_COLUMNS, RAW_COLUMNS, add_derived_features
+from numpy_model import fold_keras_model, save_npz
+from model_bundles import manifest_path, write_manifest
 
-# 1. Încarcă datele generate realist
-df = pd.read_csv("airnalyzer_simulated_data_realistic_full_correlated.csv")
+DATA_PATH = "airnalyzer_simulated_data_realistic_full_correlated.csv"
 
-# 2. Pregătește datele
-# Toate simptomele
-symptoms_columns = ["Cough", "Fatigue", "Fever", "Shortness_of_breath"]
+# ------------------ In-memory ------------------
+def load_in_memory(path):
+    """Citește tot CSV-ul, scalează și împarte stratificat (modul clasic)."""
+    # 1. Încarcă datele generate realist
+    df = pd.read_csv(path)
 
-# Feature columns: include VOC-uri, feature-engineered și demografie
-feature_columns = [
-    "Age", "Sex", "Smoker",
-    "Cough", "Fatigue", "Fever", "Shortness_of_breath",
-    "Temperature", "Humidity",
-    "Acetone", "Ammonia", "CO", "CO2", "H2S",
-    "Acetone_Ammonia_Ratio", "CO_CO2_Ratio", "H2S_Ammonia_Ratio",
-    "Total_VOC", "Mean_Gases", "Std_Gases",
-    "Hour_Of_Day"
-]
+    # 2. Pregătește datele; derivatele se recalculează la fel ca în server
+    add_derived_features(df)
+    X = df[FEATURE_COLUMNS]
+    y = df["Diagnosis"]
 
-X = df[feature_columns]
-y = df["Diagnosis"]
+    # Encodează label-urile
+    le = LabelEncoder()
+    y_encoded = le.fit_transform(y)
 
-# Encodează label-urile
-le = LabelEncoder()
-y_encoded = le.fit_transform(y)
+    # Scalează toate valorile numerice
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
 
-# Scalează toate valorile numerice
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
+    # Imparte în seturi de antrenare și testare
+    X_train, X_test, y_train, y_test = train_test_split(
+        X_scaled, y_encoded, test_size=0.2, random_state=42, stratify=y_encoded
+    )
+    return X_train, X_test, y_train, y_test, scaler, le
 
-# Imparte în seturi de antrenare și testare
-X_train, X_test, y_train, y_test = train_test_split(
-    X_scaled, y_encoded, test_size=0.2, random_state=42, stratify=y_encoded
-)
 
+# ------------------ Streaming (out-of-core) ------------------
+SPLITS = ("train", "val", "test")
+
+
+def iter_chunks(path, chunksize):
+    """Parcurge CSV sau Parquet pe bucăți, fără să încarce tot fișierul."""
+    columns = RAW_COLUMNS + ["Diagnosis"]
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        chunks = (b.to_pandas() for b in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns))
+    else:
+        chunks = pd.read_csv(path, usecols=columns, chunksize=chunksize)
+    for chunk in chunks:
+        yield add_derived_features(chunk)
+
+
+def _assign_splits(chunk_index, n, seed, test_size, val_split):
+    """Împărțire aleatoare dar reproductibilă: același chunk primește mereu aceleași split-uri."""
+    u = np.random.default_rng([seed, chunk_index]).random(n)
+    split = np.zeros(n, dtype=np.int8)                    # 0 = train
+    split[u < test_size + (1 - test_size) * val_split] = 1  # 1 = val
+    split[u < test_size] = 2                              # 2 = test
+    return split
+
+
+def build_stream_cache(path, cache_dir, chunksize=200_000, test_size=0.2, val_split=0.15, seed=42):
+    """Două treceri peste date: partial_fit pentru scaler, apoi features scalate float32 în memmap-uri .npy.
+
+    Cache-ul e refolosit dacă fișierul sursă și parametrii nu s-au schimbat.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    meta_path = os.path.join(cache_dir, "meta.json")
+    stat = os.stat(path)
+    key = {"source": os.path.abspath(path), "size": stat.st_size, "mtime": stat.st_mtime,
+           "chunksize": chunksize, "test_size": test_size, "val_split": val_split, "seed": seed,
+           "features": FEATURE_COLUMNS}
+
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("key") == key:
+            print(f"[Cache] Reusing {cache_dir}")
+            le = LabelEncoder()
+            le.classes_ = np.array(meta["classes"], dtype=object)
+            return joblib.load(os.path.join(cache_dir, "scaler.save")), le, meta["counts"]
+
+    # Trecerea 1: scaler incremental, etichete și numărul de rânduri pe split
+    scaler = StandardScaler()
+    labels = set()
+    counts = dict.fromkeys(SPLITS, 0)
+    for i, chunk in enumerate(iter_chunks(path, chunksize)):
+        scaler.partial_fit(chunk[FEATURE_COLUMNS].to_numpy(dtype=np.float64))
+        labels.update(chunk["Diagnosis"].unique())
+        split = _assign_splits(i, len(chunk), seed, test_size, val_split)
+        for s, name in enumerate(SPLITS):
+            counts[name] += int(np.count_nonzero(split == s))
+        print(f"[Cache] pass 1: {sum(counts.values())} rows", end="\r")
+    print()
+
+    le = LabelEncoder()
+    le.fit(sorted(labels))
+
+    # Trecerea 2: transform + scriere în memmap-uri prealocate
+    X_mm, y_mm, pos = {}, {}, dict.fromkeys(SPLITS, 0)
+    for name in SPLITS:
+        X_mm[name] = np.lib.format.open_memmap(os.path.join(cache_dir, f"X_{name}.npy"), mode="w+",
+                                               dtype=np.float32, shape=(counts[name], len(FEATURE_COLUMNS)))
+        y_mm[name] = np.lib.format.open_memmap(os.path.join(cache_dir, f"y_{name}.npy"), mode="w+",
+                                               dtype=np.int32, shape=(counts[name],))
+    for i, chunk in enumerate(iter_chunks(path, chunksize)):
+        X = scaler.transform(chunk[FEATURE_COLUMNS].to_numpy(dtype=np.float64)).astype(np.float32)
+        y = le.transform(chunk["Diagnosis"]).astype(np.int32)
+        split = _assign_splits(i, len(chunk), seed, test_size, val_split)
+        for s, name in enumerate(SPLITS):
+            mask = split == s
+            n = int(np.count_nonzero(mask))
+            X_mm[name][pos[name]:pos[name] + n] = X[mask]
+            y_mm[name][pos[name]:pos[name] + n] = y[mask]
+            pos[name] += n
+        print(f"[Cache] pass 2: {sum(pos.values())} rows", end="\r")
+    print()
+    for name in SPLITS:
+        X_mm[name].flush()
+        y_mm[name].flush()
+
+    joblib.dump(scaler, os.path.join(cache_dir, "scaler.save"))
+    with open(meta_path, "w") as f:
+        json.dump({"key": key, "classes": list(le.classes_), "counts": counts}, f, indent=2)
+    return scaler, le, counts
+
+
+def open_split(cache_dir, name):
+    X = np.load(os.path.join(cache_dir, f"X_{name}.npy"), mmap_mode="r")
+    y = np.load(os.path.join(cache_dir, f"y_{name}.npy"), mmap_mode="r")
+    return X, y
+
+
+def make_dataset(X, y, batch_size, shuffle=False, seed=42, block_batches=16):
+    """tf.data peste memmap: citește blocuri contigue, amestecă în bloc, grupează în loturi, prefetch."""
+    n = len(y)
+    block_rows = batch_size * block_batches
+    n_blocks = -(-n // block_rows)
+    n_features = X.shape[1]
+    draws = itertools.count()
+
+    def load_block(b):
+        start = int(b) * block_rows
+        xb = np.asarray(X[start:start + block_rows])
+        yb = np.asarray(y[start:start + block_rows])
+        if shuffle:
+            perm = np.random.default_rng([seed, int(b), next(draws)]).permutation(len(yb))
+            xb, yb = xb[perm], yb[perm]
+        return xb, yb
+
+    def tf_load_block(b):
+        xb, yb = tf.numpy_function(load_block, [b], (tf.float32, tf.int32))
+        xb.set_shape((None, n_features))
+        yb.set_shape((None,))
+        return xb, yb
+
+    ds = tf.data.Dataset.range(n_blocks)
+    if shuffle:
+        ds = ds.shuffle(n_blocks, seed=seed, reshuffle_each_iteration=True)
+    ds = ds.map(tf_load_block, num_parallel_calls=tf.data.AUTOTUNE, deterministic=not shuffle)
+    ds = ds.flat_map(lambda xb, yb: tf.data.Dataset.from_tensor_slices((xb, yb)).batch(batch_size))
+    ds = ds.apply(tf.data.experimental.assert_cardinality(-(-n // batch_size)))
+    return ds.prefetch(tf.data.AUTOTUNE)
+
+
+# ------------------ Model ------------------
 # 3. Construiește modelul
-def build_model(input_dim, num_classes):
+def build_model(input_dim, num_classes, units=(256, 128, 64), dropouts=(0.4, 0.3, 0.2)):
+    """Dense -> BatchNorm -> ReLU -> Dropout pentru fiecare strat ascuns (forma cerută de numpy_model)."""
     inputs = tf.keras.Input(shape=(input_dim,))
-    x = tf.keras.layers.Dense(256)(inputs)
-    x = tf.keras.layers.BatchNormalization()(x)
-    x = tf.keras.layers.Activation('relu')(x)
-    x = tf.keras.layers.Dropout(0.4)(x)
-    x = tf.keras.layers.Dense(128)(x)
-    x = tf.keras.layers.BatchNormalization()(x)
-    x = tf.keras.layers.Activation('relu')(x)
-    x = tf.keras.layers.Dropout(0.3)(x)
-    x = tf.keras.layers.Dense(64)(x)
-    x = tf.keras.layers.BatchNormalization()(x)
-    x = tf.keras.layers.Activation('relu')(x)
-    x = tf.keras.layers.Dropout(0.2)(x)
+    x = inputs
+    for n, rate in zip(units, dropouts):
+        x = tf.keras.layers.Dense(n)(x)
+        x = tf.keras.layers.BatchNormalization()(x)
+        x = tf.keras.layers.Activation('relu')(x)
+        if rate:
+            x = tf.keras.layers.Dropout(rate)(x)
     outputs = tf.keras.layers.Dense(num_classes, activation='softmax')(x)
     return tf.keras.Model(inputs=inputs, outputs=outputs)
 
-model = build_model(X_train.shape[1], len(le.classes_))
-model.compile(
-    optimizer=tf.keras.optimizers.Adam(learning_rate=0.001),
-    loss='sparse_categorical_crossentropy',
-    metrics=['accuracy']
-)
-
-# Callbacks
-early_stop = tf.keras.callbacks.EarlyStopping(
-    monitor='val_loss', patience=10, restore_best_weights=True
-)
-reduce_lr = tf.keras.callbacks.ReduceLROnPlateau(
-    monitor='val_loss', factor=0.5, patience=5, min_lr=1e-6
-)
-
-# 4. Antrenează modelul
-history = model.fit(
-    X_train, y_train,
-    validation_split=0.15,
-    epochs=2000,
-    batch_size=128,
-    callbacks=[early_stop, reduce_lr],
-    verbose=2
-)
-
-# 5. Evaluează modelul
-test_loss, test_acc = model.evaluate(X_test, y_test, verbose=2)
-print(f"\nTest Accuracy: {test_acc:.4f}")
-
-# 6. Predicții și rapoarte
-y_pred_probs = model.predict(X_test)
-y_pred = np.argmax(y_pred_probs, axis=1)
-
-print("\nConfusion Matrix:")
-print(confusion_matrix(y_test, y_pred))
-
-print("\nClassification Report:")
-print(classification_report(y_test, y_pred, target_names=le.classes_))
-
-# 7. Salvează modelul și scaler-ul
-model.save("airnalyzer_best_model.keras")
-joblib.dump(scaler, "scaler.save")
-print("\nModel and scaler saved!")
-
-# 8. Plot training history
-plt.figure(figsize=(12,5))
-plt.subplot(1,2,1)
-plt.plot(history.history['accuracy'], label='Train Accuracy')
-plt.plot(history.history['val_accuracy'], label='Validation Accuracy')
-plt.title('Model Accuracy over Epochs')
-plt.xlabel('Epoch')
-plt.ylabel('Accuracy')
-plt.legend()
-plt.subplot(1,2,2)
-plt.plot(history.history['loss'], label='Train Loss')
-plt.plot(history.history['val_loss'], label='Validation Loss')
-plt.title('Model Loss over Epochs')
-plt.xlabel('Epoch')
-plt.ylabel('Loss')
-plt.legend()
-plt.tight_layout()
-plt.savefig("training_history.png")
-plt.show()
-
-# 9. Matrice confuzie
-cm = confusion_matrix(y_test, y_pred)
-class_names = le.classes_
-plt.figure(figsize=(8, 6))
-sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', xticklabels=class_names, yticklabels=class_names)
-plt.title('Confusion Matrix')
-plt.xlabel('Predicted Label')
-plt.ylabel('True Label')
-plt.tight_layout()
-plt.savefig("confusion_matrix.png")
-plt.show()
+
+def compile_model(input_dim, num_classes, units=(256, 128, 64), dropouts=(0.4, 0.3, 0.2), learning_rate=0.001):
+    model = build_model(input_dim, num_classes, units, dropouts)
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+        loss='sparse_categorical_crossentropy',
+        metrics=['accuracy']
+    )
+    return model
+
+
+def make_callbacks(patience=10):
+    early_stop = tf.keras.callbacks.EarlyStopping(
+        monitor='val_loss', patience=patience, restore_best_weights=True
+    )
+    reduce_lr = tf.keras.callbacks.ReduceLROnPlateau(
+        monitor='val_loss', factor=0.5, patience=max(1, patience // 2), min_lr=1e-6
+    )
+    return [early_stop, reduce_lr]
+
+
+# ------------------ Rapoarte și artefacte ------------------
+def report_and_save(model, history, scaler, le, y_test, y_pred_probs, test_acc):
+    print(f"\nTest Accuracy: {test_acc:.4f}")
+
+    # 6. Predicții și rapoarte
+    y_pred = np.argmax(y_pred_probs, axis=1)
+
+    print("\nConfusion Matrix:")
+    print(confusion_matrix(y_test, y_pred))
+
+    print("\nClassification Report:")
+    print(classification_report(y_test, y_pred, target_names=le.classes_))
+
+    # 7. Salvează modelul și scaler-ul
+    model.save("airnalyzer_best_model.keras")
+    joblib.dump(scaler, "scaler.save")
+    print("\nModel and scaler saved!")
+
+    # Export NumPy (scaler + BatchNorm împăturite în Dense) pentru MODEL_BACKEND=numpy
+    save_npz("airnalyzer_model.npz", fold_keras_model(model, scaler), FEATURE_COLUMNS)
+    print("NumPy model exported to airnalyzer_model.npz")
+
+    # Manifestele bundle-urilor: etichetele în ordinea LabelEncoder, adică ordinea ieșirilor modelului
+    write_manifest(manifest_path("airnalyzer_best_model.keras"), "keras", "keras", "airnalyzer_best_model.keras",
+                   FEATURE_COLUMNS, le.classes_, scaler)
+    write_manifest(manifest_path("airnalyzer_model.npz"), "numpy", "numpy", "airnalyzer_model.npz",
+                   FEATURE_COLUMNS, le.classes_)
+
+    # 8. Plot training history
+    plt.figure(figsize=(12,5))
+    plt.subplot(1,2,1)
+    plt.plot(history.history['accuracy'], label='Train Accuracy')
+    plt.plot(history.history['val_accuracy'], label='Validation Accuracy')
+    plt.title('Model Accuracy over Epochs')
+    plt.xlabel('Epoch')
+    plt.ylabel('Accuracy')
+    plt.legend()
+    plt.subplot(1,2,2)
+    plt.plot(history.history['loss'], label='Train Loss')
+    plt.plot(history.history['val_loss'], label='Validation Loss')
+    plt.title('Model Loss over Epochs')
+    plt.xlabel('Epoch')
+    plt.ylabel('Loss')
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig("training_history.png")
+    plt.show()
+
+    # 9. Matrice confuzie
+    cm = confusion_matrix(y_test, y_pred)
+    class_names = le.classes_
+    plt.figure(figsize=(8, 6))
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', xticklabels=class_names, yticklabels=class_names)
+    plt.title('Confusion Matrix')
+    plt.xlabel('Predicted Label')
+    plt.ylabel('True Label')
+    plt.tight_layout()
+    plt.savefig("confusion_matrix.png")
+    plt.show()
+
+
+def export_tflite_stage(model, scaler, le, X_train_scaled, X_test_scaled, y_test):
+    """Variantele TFLite float32/float16/int8 + raportul de acuratețe și latență (tflite_report.json)."""
+    import export_tflite
+
+    representative = export_tflite.representative_rows(X_train_scaled)
+    X_test = scaler.inverse_transform(np.asarray(X_test_scaled))
+    report = export_tflite.export_all(model, scaler, representative, X_test, np.asarray(y_test), le.classes_, ".")
+    export_tflite.print_report(report)
+    export_tflite.write_report(report, "tflite_report.json")
+
+
+def train_in_memory(args):
+    X_train, X_test, y_train, y_test, scaler, le = load_in_memory(args.data)
+    model = compile_model(X_train.shape[1], len(le.classes_))
+
+    # 4. Antrenează modelul
+    history = model.fit(
+        X_train, y_train,
+        validation_split=0.15,
+        epochs=args.epochs,
+        batch_size=args.batch_size,
+        callbacks=make_callbacks(),
+        verbose=2
+    )
+
+    # 5. Evaluează modelul
+    test_loss, test_acc = model.evaluate(X_test, y_test, verbose=2)
+    y_pred_probs = model.predict(X_test)
+    report_and_save(model, history, scaler, le, y_test, y_pred_probs, test_acc)
+    if args.tflite:
+        export_tflite_stage(model, scaler, le, X_train, X_test, y_test)
+
+
+def train_streaming(args):
+    scaler, le, counts = build_stream_cache(args.data, args.cache_dir, chunksize=args.chunksize)
+    print(f"[Cache] rows per split: {counts}")
+    X_train, y_train = open_split(args.cache_dir, "train")
+    X_val, y_val = open_split(args.cache_dir, "val")
+    X_test, y_test = open_split(args.cache_dir, "test")
+
+    train_ds = make_dataset(X_train, y_train, args.batch_size, shuffle=True)
+    val_ds = make_dataset(X_val, y_val, args.batch_size)
+    test_ds = make_dataset(X_test, y_test, args.batch_size)
+
+    model = compile_model(X_train.shape[1], len(le.classes_))
+
+    # 4. Antrenează modelul
+    history = model.fit(
+        train_ds,
+        validation_data=val_ds,
+        epochs=args.epochs,
+        callbacks=make_callbacks(),
+        verbose=2
+    )
+
+    # 5. Evaluează modelul
+    test_loss, test_acc = model.evaluate(test_ds, verbose=2)
+    y_pred_probs = model.predict(test_ds)
+    report_and_save(model, history, scaler, le, np.asarray(y_test), y_pred_probs, test_acc)
+    if args.tflite:
+        export_tflite_stage(model, scaler, le, X_train, X_test, y_test)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the Airnalyzer diagnosis model.")
+    parser.add_argument("--data", default=DATA_PATH, help="CSV or Parquet dataset")
+    parser.add_argument("--stream", action="store_true",
+                        help="out-of-core mode: incremental scaler + memmap cache + tf.data pipeline")
+    parser.add_argument("--cache-dir", default="train_cache")
+    parser.add_argument("--chunksize", type=int, default=200_000)
+    parser.add_argument("--epochs", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--tflite", action="store_true",
+                        help="also export TFLite float32/float16/int8 models with an accuracy/latency report")
+    args = parser.parse_args()
+
+    if args.stream:
+        train_streaming(args)
+    else:
+        train_in_memory(args)
+
+
+if __name__ == "__main__":
+    main()